@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
 from dotenv import load_dotenv
 load_dotenv()
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'qualidade.middleware.ContextoUsuarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -101,10 +103,38 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # BEGIN IMMEDIATE: transações concorrentes esperam a vez em vez de falhar com "database is locked".
+            # Vale para todo atomic(), inclusive os só de leitura: no SQLite (desenvolvimento) cada
+            # transação segura o lock de escrita do arquivo até o fim. Em produção (PostgreSQL) não se aplica.
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+            # Banco de testes em arquivo (os testes de concorrência abrem uma conexão por thread),
+            # fora do repositório
+            'TEST': {'NAME': os.path.join(tempfile.gettempdir(), 'gestorproducao_test_db.sqlite3')},
         }
     }
 
 
+# Cache da aplicação (qualidade/cache.py)
+# locmem: um cache por processo (desenvolvimento). Com vários workers do gunicorn
+# use CACHE_BACKEND=file (diretório compartilhado) ou CACHE_BACKEND=db (tabela
+# criada por "manage.py createcachetable"), para que uma invalidação valha para todos.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+_CACHES_DISPONIVEIS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'qualidade'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.path.join(BASE_DIR, 'cache_app')),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'qualidade_cache'),
+}
+_backend_cache, _local_cache = _CACHES_DISPONIVEIS[CACHE_BACKEND]
+CACHES = {
+    'default': {
+        'BACKEND': _backend_cache,
+        'LOCATION': os.getenv('CACHE_LOCATION', _local_cache),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -145,6 +175,19 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Arquivos gerados (PDFs dos relatórios em segundo plano) - volume /app/media no docker-compose
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Cache em disco dos PDFs de relatório (evicção LRU acima do limite)
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', os.path.join(MEDIA_ROOT, 'cache_pdf'))
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_MB', '200')) * 1024 * 1024
+
+# Segundos que perfil e grupos do usuário ficam guardados na sessão (0 = reler a cada requisição).
+# Desligado por padrão: as permissões vêm daí. Ligado, a mudança de perfil/grupos invalida a cópia
+# pelo cache, então use um CACHE_BACKEND compartilhado entre os workers (file ou db).
+QUALIDADE_CTX_TTL = int(os.getenv('QUALIDADE_CTX_TTL', '0'))
+
 ## USAR ESSE STATIC ROOT SOMENTE SE FOR HOSPEDAR EM RENDER,NGINX ETC
 ## STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
@@ -153,6 +196,9 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Telão ao vivo (WSGI): segundos que a tela espera entre uma consulta de eventos e outra
+TELAO_RETRY_AFTER = int(os.getenv('TELAO_RETRY_AFTER', '2'))
+
 # Configurações CSRF
 CSRF_COOKIE_HTTPONLY = False  # Permite JavaScript acessar o cookie CSRF
 CSRF_COOKIE_SAMESITE = 'Lax'
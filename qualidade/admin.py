@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Ficha, RegistroParte, PerfilUsuario
+from .models import Ficha, LancamentoQuantidade, RegistroParte, PerfilUsuario, RelatorioJob
 
 
 # Removemos ParteCalcado do admin, agora é gerenciado pela interface da qualidade
@@ -7,38 +7,59 @@ from .models import Ficha, RegistroParte, PerfilUsuario
 class RegistroParteInline(admin.TabularInline):
     model = RegistroParte
     extra = 0
-    readonly_fields = ['total']
+    # A coluna quantidades é a lista antiga (backfill); a exibida vem dos lançamentos
+    exclude = ['quantidades']
+    readonly_fields = ['quantidades_lancadas', 'total', 'contagem']
 
-    def total(self, obj):
-        return obj.total()
-
-    total.short_description = 'Total'
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('lancamentos')
 
 
 @admin.register(Ficha)
 class FichaAdmin(admin.ModelAdmin):
-    list_display = ['nome_ficha', 'data', 'operador', 'criada_em']
+    list_display = ['nome_ficha', 'data', 'operador', 'total_geral', 'criada_em']
     list_filter = ['data', 'operador']
     search_fields = ['nome_ficha', 'operador__username']
     date_hierarchy = 'data'
     inlines = [RegistroParteInline]
-    readonly_fields = ['criada_em', 'atualizada_em']
+    readonly_fields = ['criada_em', 'atualizada_em', 'total_geral']
+
+
+class LancamentoQuantidadeInline(admin.TabularInline):
+    model = LancamentoQuantidade
+    extra = 0
+    fields = ['quantidade', 'criado_em', 'criado_por']
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(RegistroParte)
 class RegistroParteAdmin(admin.ModelAdmin):
-    list_display = ['ficha', 'parte', 'total', 'quantidades']
+    list_display = ['ficha', 'parte', 'total', 'contagem', 'quantidades_lancadas']
     list_filter = ['parte', 'ficha__data']
     search_fields = ['ficha__nome_ficha', 'parte__nome']
+    inlines = [LancamentoQuantidadeInline]
+    # A lista é projeção dos lançamentos: edite pela ficha, não pelo admin
+    exclude = ['quantidades']
+    readonly_fields = ['quantidades_lancadas', 'total', 'contagem']
 
-    def total(self, obj):
-        return obj.total()
-
-    total.short_description = 'Total'
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('lancamentos')
 
 
 @admin.register(PerfilUsuario)
 class PerfilUsuarioAdmin(admin.ModelAdmin):
     list_display = ['user', 'tipo']
     list_filter = ['tipo']
-    search_fields = ['user__username', 'user__first_name', 'user__last_name']
\ No newline at end of file
+    search_fields = ['user__username', 'user__first_name', 'user__last_name']
+
+@admin.register(RelatorioJob)
+class RelatorioJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'status', 'solicitado_por', 'criado_em', 'concluido_em']
+    list_filter = ['status', 'tipo']
+    search_fields = ['solicitado_por__username', 'nome_arquivo']
+    # O traceback dos jobs com erro fica só aqui (a tela recebe uma mensagem genérica)
+    readonly_fields = ['tipo', 'parametros', 'status', 'arquivo', 'nome_arquivo', 'erro', 'solicitado_por', 'criado_em', 'iniciado_em', 'concluido_em']
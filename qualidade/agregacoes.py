@@ -0,0 +1,80 @@
+# qualidade/agregacoes.py
+"""
+Agregações de produção feitas no banco (relatórios por período)
+
+A árvore operador → ficha → parte → total sai de uma única consulta agrupada
+sobre o rollup ProducaoDiaria, em vez de uma consulta por ficha: o custo de um
+relatório de 12 meses é o de algumas linhas por dia, não o de cada registro.
+"""
+from django.db.models import Count, Max, Sum
+
+from .models import Ficha, ProducaoDiaria
+
+
+def nome_operador(linha):
+    nome_completo = f"{linha['operador__first_name']} {linha['operador__last_name']}".strip()
+    return nome_completo or linha['operador__username']
+
+
+def linhas_producao(data_inicio, data_fim, operador_id=None, nome_ficha=None, parte_id=None):
+    """Totais agrupados por (operador, nome da ficha, parte) no período, lidos do rollup diário"""
+    linhas = ProducaoDiaria.objects.filter(data__gte=data_inicio, data__lte=data_fim)
+
+    if nome_ficha:
+        linhas = linhas.filter(nome_ficha=nome_ficha)
+    if operador_id:
+        linhas = linhas.filter(operador_id=operador_id)
+    if parte_id:
+        linhas = linhas.filter(parte_id=parte_id)
+
+    return (
+        linhas
+        .values(
+            'operador_id',
+            'operador__username',
+            'operador__first_name',
+            'operador__last_name',
+            'nome_ficha',
+            'parte__nome',
+        )
+        .annotate(quantidade=Sum('quantidade'))
+        .order_by('operador__username', 'nome_ficha', 'parte__nome')
+    )
+
+
+def dados_por_operador(data_inicio, data_fim, operador_id=None, nome_ficha=None, parte_id=None):
+    """Monta {operador: {'fichas': {ficha: {parte: qtd}}, 'totais_partes': {...}}} e o total geral"""
+    dados = {}
+    total_geral = 0
+
+    for linha in linhas_producao(data_inicio, data_fim, operador_id, nome_ficha, parte_id):
+        operador = dados.setdefault(nome_operador(linha), {
+            'fichas': {},  # nome da ficha -> partes
+            'totais_partes': {},  # total geral por parte do operador
+        })
+
+        parte_nome = linha['parte__nome']
+        valor = linha['quantidade'] or 0
+        partes_ficha = operador['fichas'].setdefault(linha['nome_ficha'], {})
+        partes_ficha[parte_nome] = partes_ficha.get(parte_nome, 0) + valor
+        operador['totais_partes'][parte_nome] = operador['totais_partes'].get(parte_nome, 0) + valor
+        total_geral += valor
+
+    return dados, total_geral
+
+
+def versao_periodo(data_inicio, data_fim, operador_id=None, nome_ficha=None):
+    """
+    Versão dos dados do período: (última atualização, número de fichas).
+
+    Inclui as fichas na lixeira, para que excluir/restaurar também mude a
+    versão; a contagem cobre as exclusões definitivas.
+    """
+    fichas = Ficha.objects.filter(data__gte=data_inicio, data__lte=data_fim)
+    if nome_ficha:
+        fichas = fichas.filter(nome_ficha=nome_ficha)
+    if operador_id:
+        fichas = fichas.filter(operador_id=operador_id)
+
+    versao = fichas.aggregate(ultima=Max('atualizada_em'), fichas=Count('id'))
+    return versao['ultima'], versao['fichas']
@@ -0,0 +1,88 @@
+# qualidade/cache.py
+"""
+Fachada do cache da aplicação (backend definido em settings.CACHES)
+
+Cada chave pertence a um namespace ('catalogo', 'filtros_relatorio', ...) e
+carrega a versão atual dele. Invalidar um namespace só troca a versão: as
+entradas antigas deixam de ser encontradas e expiram sozinhas, o que funciona
+igual em locmem, arquivo ou banco. Os signals (signals.py) chamam invalidar()
+quando os modelos de cada namespace mudam.
+
+obter() evita a debandada: quando a entrada falta, só um processo recalcula
+(trava com cache.add) e os demais esperam o resultado por alguns instantes.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIXO = 'qualidade'
+# Tempo máximo de um recálculo; passado isso a trava expira e outro processo assume
+TEMPO_TRAVA = 30
+# Intervalo entre verificações de quem espera o recálculo de outro processo
+INTERVALO_ESPERA = 0.05
+
+_AUSENTE = object()
+
+
+def _chave_versao(namespace):
+    return f'{PREFIXO}:versao:{namespace}'
+
+
+def versao(namespace):
+    """Versão atual do namespace; começa num valor único para não reaproveitar entradas antigas"""
+    return cache.get_or_set(_chave_versao(namespace), time.time_ns, None)
+
+
+def invalidar(namespace):
+    """Descarta todas as entradas do namespace (troca a versão)"""
+    try:
+        cache.incr(_chave_versao(namespace))
+    except ValueError:
+        # Versão ausente (cache reiniciado ou evicção): a próxima leitura cria uma nova
+        pass
+
+
+def invalidar_apos_commit(*namespaces):
+    """Invalida quando a transação confirmar: antes disso outra requisição recalcularia com os dados antigos"""
+    for namespace in namespaces:
+        transaction.on_commit(lambda namespace=namespace: invalidar(namespace))
+
+
+def chave(namespace, *partes):
+    """Chave completa: prefixo, namespace, versão e o hash das partes"""
+    resumo = hashlib.sha256(json.dumps(partes, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:32]
+    return f'{PREFIXO}:{namespace}:{versao(namespace)}:{resumo}'
+
+
+def obter(namespace, partes, calcular, timeout=300):
+    """
+    Valor em cache para (namespace, partes), ou calcular() guardado por `timeout` segundos.
+
+    Enquanto um processo recalcula, os outros aguardam até TEMPO_TRAVA pelo
+    resultado; se ele não aparecer, calculam por conta própria.
+    """
+    chave_valor = chave(namespace, *partes)
+    valor = cache.get(chave_valor, _AUSENTE)
+    if valor is not _AUSENTE:
+        return valor
+
+    chave_trava = f'{chave_valor}:calculando'
+    if not cache.add(chave_trava, 1, TEMPO_TRAVA):
+        limite = time.monotonic() + TEMPO_TRAVA
+        while time.monotonic() < limite:
+            time.sleep(INTERVALO_ESPERA)
+            valor = cache.get(chave_valor, _AUSENTE)
+            if valor is not _AUSENTE:
+                return valor
+            if cache.get(chave_trava) is None:
+                break  # quem calculava falhou: segue e calcula aqui
+
+    try:
+        valor = calcular()
+        cache.set(chave_valor, valor, timeout)
+    finally:
+        cache.delete(chave_trava)
+    return valor
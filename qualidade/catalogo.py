@@ -0,0 +1,68 @@
+# qualidade/catalogo.py
+"""
+Catálogo do inventário (modelo → cor → tamanho) num único documento JSON
+
+O formulário de inventário baixa a árvore inteira uma vez e resolve as
+cascatas no navegador. O documento fica no namespace 'catalogo' do cache até
+algum modelo, cor ou tamanho mudar (ver signals.py); a versão é o hash do
+próprio conteúdo, então serve de ETag e de parâmetro de URL para o navegador.
+"""
+import hashlib
+import json
+from collections import defaultdict
+
+from . import cache
+from .models import Cor, ModeloCalcado, TamanhoModelo
+
+NAMESPACE = 'catalogo'
+# Rede de segurança para processos que não receberam o signal (cache local por worker)
+TEMPO_CACHE = 300
+
+
+def montar():
+    """Lê o catálogo do banco (4 consultas) e devolve {'versao', 'conteudo'}"""
+    cores = {
+        cor_id: nome
+        for cor_id, nome in Cor.objects.filter(excluido=False).order_by('ordem', 'nome').values_list('id', 'nome')
+    }
+
+    cores_por_modelo = defaultdict(list)
+    ligacoes = ModeloCalcado.cores.through.objects.filter(
+        modelocalcado__excluido=False, cor__excluido=False
+    ).values_list('modelocalcado_id', 'cor_id')
+    for modelo_id, cor_id in ligacoes:
+        cores_por_modelo[modelo_id].append(cor_id)
+
+    tamanhos = defaultdict(lambda: defaultdict(list))
+    for tamanho_id, modelo_id, cor_id, numero in (
+        TamanhoModelo.objects.filter(ativo=True, excluido=False, modelo__excluido=False)
+        .order_by('numero')
+        .values_list('id', 'modelo_id', 'cor_id', 'numero')
+    ):
+        tamanhos[modelo_id][cor_id].append([tamanho_id, numero])
+
+    ordem_cores = list(cores)
+    modelos = [
+        {
+            'id': modelo_id,
+            'nome': nome,
+            'cores': sorted(cores_por_modelo[modelo_id], key=ordem_cores.index),
+            'tamanhos': {str(cor_id): lista for cor_id, lista in tamanhos[modelo_id].items()},
+        }
+        for modelo_id, nome in ModeloCalcado.objects.filter(excluido=False).order_by('nome').values_list('id', 'nome')
+    ]
+
+    dados = {'cores': {str(cor_id): nome for cor_id, nome in cores.items()}, 'modelos': modelos}
+    corpo = json.dumps(dados, ensure_ascii=False, separators=(',', ':'))
+    versao = hashlib.sha256(corpo.encode('utf-8')).hexdigest()[:16]
+    conteudo = json.dumps({'versao': versao, **dados}, ensure_ascii=False, separators=(',', ':'))
+    return {'versao': versao, 'conteudo': conteudo}
+
+
+def obter():
+    """Documento do cache, montado de novo se tiver sido invalidado"""
+    return cache.obter(NAMESPACE, (), montar, TEMPO_CACHE)
+
+
+def versao():
+    return obter()['versao']
@@ -0,0 +1,127 @@
+# qualidade/comparacao.py
+"""
+Comparação entre duas fichas de inventário (ex.: contagem de segunda × sexta)
+
+Os itens das duas fichas são agrupados por (modelo, cor, número) numa única
+consulta, com agregações condicionais por ficha (Sum(... filter=ficha A/B)):
+o resultado é o de um FULL OUTER JOIN das duas fichas, mas funciona em
+qualquer banco e usa o índice único (ficha, modelo, cor, tamanho). A
+situação de cada linha (adicionado, removido, alterado, igual) também é
+calculada no banco, então filtrar por ela e paginar continuam sendo a mesma
+consulta.
+"""
+from django.db.models import Case, CharField, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Abs, Coalesce, Least
+
+from . import facetas
+from .models import FichaInventario, ItemInventario
+
+ADICIONADO = 'adicionado'
+REMOVIDO = 'removido'
+ALTERADO = 'alterado'
+IGUAL = 'igual'
+# Filtros de situação da tela: só diferenças (padrão), cada situação, avulsos ou tudo
+SITUACOES = {
+    'diferencas': 'Todas as diferenças',
+    ADICIONADO: 'Só na segunda ficha',
+    REMOVIDO: 'Só na primeira ficha',
+    ALTERADO: 'Quantidade alterada',
+    'avulsos': 'Com pés sem par',
+    'todos': 'Todos os itens',
+}
+# Modelo, cor e número (nome antes do id: a ordem da tela; o id desempata nomes repetidos)
+ORDEM = ('modelo__nome', 'modelo_id', 'cor__nome', 'cor_id', 'tamanho__numero')
+
+
+def segunda_ficha(ficha_a, parametros):
+    """Ficha escolhida em ?com= para comparar com `ficha_a`, ou None"""
+    ficha_id = parametros.get('com') or ''
+    if not ficha_id.isdigit() or int(ficha_id) == ficha_a.id:
+        return None
+    return FichaInventario.objects.filter(id=ficha_id).first()
+
+
+def fichas_para_comparar(ficha_a, limite=50):
+    """Fichas mais recentes do mesmo setor, para o select da tela"""
+    return list(
+        FichaInventario.ativos.filter(setor=ficha_a.setor)
+        .exclude(id=ficha_a.id)
+        .order_by('-data', '-criada_em')
+        .values('id', 'nome_ficha', 'data')[:limite]
+    )
+
+
+def ler_situacao(parametros):
+    situacao = parametros.get('situacao')
+    return situacao if situacao in SITUACOES else 'diferencas'
+
+
+def _soma(expressao, ficha_id):
+    return Coalesce(Sum(expressao, filter=Q(ficha_id=ficha_id)), 0)
+
+
+def linhas(ficha_a, ficha_b, filtros=None, situacao='diferencas'):
+    """
+    Uma linha por (modelo, cor, número) presente em alguma das fichas, com
+    PD/PE/pares e pés sem par (|PD - PE|) de cada uma, as diferenças (B - A)
+    e a situação. `filtros` são os mesmos da tela da ficha (facetas).
+    """
+    itens = ItemInventario.objects.filter(ficha_id__in=[ficha_a.id, ficha_b.id])
+    if filtros:
+        itens = facetas.filtrar_itens(itens, filtros)
+
+    pares = Least('quantidade_pe_direito', 'quantidade_pe_esquerdo')
+    avulsos = Abs(F('quantidade_pe_direito') - F('quantidade_pe_esquerdo'))
+    diferencas = (
+        itens
+        .values('modelo_id', 'modelo__nome', 'cor_id', 'cor__nome', 'tamanho__numero')
+        .annotate(
+            em_a=Count('id', filter=Q(ficha_id=ficha_a.id)),
+            em_b=Count('id', filter=Q(ficha_id=ficha_b.id)),
+            pd_a=_soma('quantidade_pe_direito', ficha_a.id),
+            pe_a=_soma('quantidade_pe_esquerdo', ficha_a.id),
+            pares_a=_soma(pares, ficha_a.id),
+            avulsos_a=_soma(avulsos, ficha_a.id),
+            pd_b=_soma('quantidade_pe_direito', ficha_b.id),
+            pe_b=_soma('quantidade_pe_esquerdo', ficha_b.id),
+            pares_b=_soma(pares, ficha_b.id),
+            avulsos_b=_soma(avulsos, ficha_b.id),
+        )
+        .annotate(
+            delta_pd=F('pd_b') - F('pd_a'),
+            delta_pe=F('pe_b') - F('pe_a'),
+            delta_pares=F('pares_b') - F('pares_a'),
+            delta_avulsos=F('avulsos_b') - F('avulsos_a'),
+            situacao=Case(
+                When(em_a=0, then=Value(ADICIONADO)),
+                When(em_b=0, then=Value(REMOVIDO)),
+                When(Q(delta_pd=0, delta_pe=0), then=Value(IGUAL)),
+                default=Value(ALTERADO),
+                output_field=CharField(),
+            ),
+        )
+        .order_by(*ORDEM)
+    )
+
+    if situacao == 'diferencas':
+        diferencas = diferencas.exclude(situacao=IGUAL)
+    elif situacao == 'avulsos':
+        diferencas = diferencas.filter(Q(avulsos_a__gt=0) | Q(avulsos_b__gt=0))
+    elif situacao != 'todos':
+        diferencas = diferencas.filter(situacao=situacao)
+    return diferencas
+
+
+def opcoes_filtros(ficha_a, ficha_b, filtros):
+    """Opções de modelo/cor/número das duas fichas juntas (facetas em cache de cada uma)"""
+    resumos = [facetas.calcular(ficha, filtros) for ficha in (ficha_a, ficha_b)]
+
+    def juntar(chave):
+        nomes = {opcao['id']: opcao['nome'] for resumo in resumos for opcao in resumo[chave]}
+        return [{'id': id_, 'nome': nome} for id_, nome in sorted(nomes.items(), key=lambda par: par[1])]
+
+    return {
+        'modelos': juntar('modelos'),
+        'cores': juntar('cores'),
+        'numeros': sorted({numero for resumo in resumos for numero in resumo['numeros']}),
+    }
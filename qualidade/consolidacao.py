@@ -0,0 +1,129 @@
+# qualidade/consolidacao.py
+"""
+Inventário consolidado de várias fichas (modelo → cor → tamanho)
+
+Uma única consulta agrupada soma PD, PE e pares (Sum(Least(PD, PE))) dos
+itens de todas as fichas de inventário do período e do setor. No modo
+"última contagem", cada (modelo, cor, tamanho) entra só com o item da ficha
+mais recente que o contou: um NOT EXISTS correlacionado descarta os itens
+que têm uma contagem posterior, dentro da mesma consulta.
+"""
+from datetime import date, timedelta
+
+from django.db.models import Count, Exists, Max, OuterRef, Q, Sum
+from django.db.models.functions import Least
+
+from .models import FichaInventario, ItemInventario
+
+SOMA = 'soma'
+ULTIMA = 'ultima'
+MODOS = {SOMA: 'Somar todas as contagens', ULTIMA: 'Última contagem de cada item'}
+# Sem período informado: últimos 30 dias
+PERIODO_PADRAO = timedelta(days=30)
+
+
+def _data(valor, padrao):
+    try:
+        return date.fromisoformat(valor) if valor else padrao
+    except ValueError:
+        return padrao
+
+
+def ler_parametros(parametros):
+    """Período, setor e modo da query string; valores ausentes ou inválidos viram o padrão"""
+    data_fim = _data(parametros.get('data_fim'), date.today())
+    data_inicio = _data(parametros.get('data_inicio'), data_fim - PERIODO_PADRAO)
+    modo = parametros.get('modo')
+    return {
+        'data_inicio': min(data_inicio, data_fim),
+        'data_fim': data_fim,
+        'setor': parametros.get('setor') or None,
+        'modo': modo if modo in MODOS else SOMA,
+    }
+
+
+def setores():
+    return list(
+        FichaInventario.ativos.exclude(setor='').order_by('setor').values_list('setor', flat=True).distinct()
+    )
+
+
+def _itens(data_inicio, data_fim, setor):
+    itens = ItemInventario.objects.filter(
+        ficha__excluido=False, ficha__data__gte=data_inicio, ficha__data__lte=data_fim
+    )
+    if setor:
+        itens = itens.filter(ficha__setor=setor)
+    return itens
+
+
+def linhas(data_inicio, data_fim, setor=None, modo=SOMA):
+    """
+    Totais por (modelo, cor, número), ordenados por modelo, cor e número.
+
+    Cada linha traz modelo_id, modelo__nome, cor_id, cor__nome,
+    tamanho__numero, fichas (quantas fichas contaram o item), ultima_data,
+    pd, pe e pares.
+    """
+    itens = _itens(data_inicio, data_fim, setor)
+    if modo == ULTIMA:
+        # Mesma ordem das listagens de fichas: data, criação e id desempatam
+        posteriores = _itens(data_inicio, data_fim, setor).filter(
+            Q(ficha__data__gt=OuterRef('ficha__data'))
+            | Q(ficha__data=OuterRef('ficha__data'), ficha__criada_em__gt=OuterRef('ficha__criada_em'))
+            | Q(
+                ficha__data=OuterRef('ficha__data'),
+                ficha__criada_em=OuterRef('ficha__criada_em'),
+                ficha_id__gt=OuterRef('ficha_id'),
+            ),
+            modelo_id=OuterRef('modelo_id'),
+            cor_id=OuterRef('cor_id'),
+            tamanho_id=OuterRef('tamanho_id'),
+        )
+        itens = itens.filter(~Exists(posteriores))
+
+    return (
+        itens
+        .values('modelo_id', 'modelo__nome', 'cor_id', 'cor__nome', 'tamanho__numero')
+        .annotate(
+            fichas=Count('ficha_id', distinct=True),
+            ultima_data=Max('ficha__data'),
+            pd=Sum('quantidade_pe_direito'),
+            pe=Sum('quantidade_pe_esquerdo'),
+            pares=Sum(Least('quantidade_pe_direito', 'quantidade_pe_esquerdo')),
+        )
+        .order_by('modelo__nome', 'cor__nome', 'tamanho__numero')
+    )
+
+
+def _somar(destino, linha):
+    for campo in ('pd', 'pe', 'pares'):
+        destino[campo] += linha[campo] or 0
+
+
+def arvore(linhas_consolidadas):
+    """
+    Linhas agrupadas em modelo → cores → tamanhos, com os subtotais de cada
+    nível; devolve (modelos, totais gerais).
+    """
+    modelos = []
+    totais = {'pd': 0, 'pe': 0, 'pares': 0, 'itens': 0}
+    for linha in linhas_consolidadas:
+        if not modelos or modelos[-1]['id'] != linha['modelo_id']:
+            modelos.append({'id': linha['modelo_id'], 'nome': linha['modelo__nome'], 'pd': 0, 'pe': 0, 'pares': 0, 'cores': []})
+        modelo = modelos[-1]
+        if not modelo['cores'] or modelo['cores'][-1]['id'] != linha['cor_id']:
+            modelo['cores'].append({'id': linha['cor_id'], 'nome': linha['cor__nome'], 'pd': 0, 'pe': 0, 'pares': 0, 'tamanhos': []})
+        cor = modelo['cores'][-1]
+        cor['tamanhos'].append({
+            'numero': linha['tamanho__numero'],
+            'fichas': linha['fichas'],
+            'ultima_data': linha['ultima_data'],
+            'pd': linha['pd'] or 0,
+            'pe': linha['pe'] or 0,
+            'pares': linha['pares'] or 0,
+        })
+        for destino in (cor, modelo, totais):
+            _somar(destino, linha)
+        totais['itens'] += 1
+    return modelos, totais
@@ -0,0 +1,102 @@
+# qualidade/facetas.py
+"""
+Facetas das fichas de inventário (opções de filtro e totais)
+
+Uma única consulta agrupada por (modelo, cor, número) traz tudo o que as
+telas de inventário e o PDF mostram além dos itens da página: as opções dos
+selects de modelo/cor/número, a quantidade de itens, os totais de PD/PE e o
+total de pares (Sum(Least(PD, PE))). Os grupos ficam em cache pela versão da
+ficha (atualizada_em, que avança a cada alteração de item); cada combinação
+de filtros é derivada deles em Python, sem nova consulta.
+"""
+from django.db.models import Count, Sum
+from django.db.models.functions import Least
+
+from . import cache
+from .models import ItemInventario
+
+NAMESPACE = 'inventario'
+TEMPO_CACHE = 300
+FILTROS = ('modelo', 'cor', 'numero')
+
+
+def ler_filtros(parametros):
+    """Filtros da query string como vieram (para os selects); ids inválidos são ignorados"""
+    filtros = {nome: parametros.get(nome) or None for nome in FILTROS}
+    for nome in ('modelo', 'cor'):
+        if filtros[nome] and not filtros[nome].isdigit():
+            filtros[nome] = None
+    return filtros
+
+
+def filtrar_itens(itens, filtros):
+    if filtros['modelo']:
+        itens = itens.filter(modelo_id=filtros['modelo'])
+    if filtros['cor']:
+        itens = itens.filter(cor_id=filtros['cor'])
+    if filtros['numero']:
+        itens = itens.filter(tamanho__numero=filtros['numero'])
+    return itens
+
+
+def _consultar_grupos(ficha_id):
+    return list(
+        ItemInventario.objects.filter(ficha_id=ficha_id)
+        .order_by()
+        .values_list('modelo_id', 'modelo__nome', 'cor_id', 'cor__nome', 'tamanho__numero')
+        .annotate(
+            itens=Count('id'),
+            pd=Sum('quantidade_pe_direito'),
+            pe=Sum('quantidade_pe_esquerdo'),
+            pares=Sum(Least('quantidade_pe_direito', 'quantidade_pe_esquerdo')),
+        )
+    )
+
+
+def grupos(ficha):
+    """Linhas (modelo_id, modelo, cor_id, cor, número, itens, PD, PE, pares) da ficha, em cache"""
+    versao = ficha.atualizada_em.isoformat() if ficha.atualizada_em else None
+    return cache.obter(NAMESPACE, (ficha.id, versao), lambda: _consultar_grupos(ficha.id), TEMPO_CACHE)
+
+
+def calcular(ficha, filtros=None):
+    """
+    Opções e totais da ficha para os filtros dados.
+
+    Como nas telas: modelos listam a ficha inteira, cores respeitam o modelo
+    escolhido, números respeitam modelo e cor; os totais respeitam os três.
+    """
+    filtros = filtros or dict.fromkeys(FILTROS)
+    modelo = int(filtros['modelo']) if filtros['modelo'] else None
+    cor = int(filtros['cor']) if filtros['cor'] else None
+    numero = filtros['numero']
+
+    modelos, cores, numeros = {}, {}, set()
+    totais = {'total_itens': 0, 'total_pd': 0, 'total_pe': 0, 'total_pares': 0}
+    modelos_selecionados = set()
+    for modelo_id, modelo_nome, cor_id, cor_nome, tamanho, itens, pd, pe, pares in grupos(ficha):
+        modelos[modelo_id] = modelo_nome
+        if modelo is not None and modelo_id != modelo:
+            continue
+        cores[cor_id] = cor_nome
+        if cor is not None and cor_id != cor:
+            continue
+        numeros.add(tamanho)
+        if numero is not None and tamanho != numero:
+            continue
+        totais['total_itens'] += itens
+        totais['total_pd'] += pd or 0
+        totais['total_pe'] += pe or 0
+        totais['total_pares'] += pares or 0
+        modelos_selecionados.add(modelo_id)
+
+    def opcoes(nomes):
+        return [{'id': id_, 'nome': nome} for id_, nome in sorted(nomes.items(), key=lambda par: par[1])]
+
+    return {
+        'modelos': opcoes(modelos),
+        'cores': opcoes(cores),
+        'numeros': sorted(numeros),
+        'modelos_diferentes': len(modelos_selecionados),
+        **totais,
+    }
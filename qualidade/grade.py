@@ -0,0 +1,145 @@
+# qualidade/grade.py
+"""
+Grade de tamanhos dos modelos (combinações modelo × cor × número)
+
+Criar um modelo, ligar cores novas ou acrescentar números geram a grade
+inteira de uma vez: uma consulta lê o que já existe, um bulk_create insere o
+que falta e um UPDATE devolve o que estava excluído. bulk_create e update()
+não disparam signals, então o catálogo é invalidado aqui.
+
+lancar_inventario() faz o mesmo com a contagem de uma prateleira: todos os
+números de um (modelo, cor) entram na ficha de inventário num único upsert.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidar_apos_commit
+from .models import FichaInventario, ItemInventario, TamanhoModelo
+
+
+class GradeInvalida(ValueError):
+    """Linha da grade que não corresponde ao catálogo ou com quantidade inválida"""
+
+
+def provisionar(modelo, cores_ids, numeros):
+    """
+    Garante um TamanhoModelo ativo para cada (cor, número) de `modelo`.
+
+    Devolve {'adicionados', 'reativados', 'existentes'}, cada um um conjunto
+    de pares (cor_id, número): criados agora, tirados da lixeira e que já
+    estavam ativos.
+    """
+    grade = {(int(cor_id), str(numero)) for cor_id in cores_ids for numero in numeros}
+    if not grade:
+        return {'adicionados': set(), 'reativados': set(), 'existentes': set()}
+
+    with transaction.atomic():
+        atuais = {
+            (cor_id, numero): (tamanho_id, excluido)
+            for tamanho_id, cor_id, numero, excluido in TamanhoModelo.objects.filter(
+                modelo=modelo,
+                cor_id__in={cor_id for cor_id, _ in grade},
+                numero__in={numero for _, numero in grade},
+            ).values_list('id', 'cor_id', 'numero', 'excluido')
+        }
+        # O filtro por cor e número separados traz combinações fora da grade pedida
+        atuais = {par: estado for par, estado in atuais.items() if par in grade}
+
+        adicionados = grade - atuais.keys()
+        reativados = {par for par, (_, excluido) in atuais.items() if excluido}
+        existentes = atuais.keys() - reativados
+
+        if adicionados:
+            # ignore_conflicts: outra requisição pode ter criado a mesma combinação
+            TamanhoModelo.objects.bulk_create(
+                [TamanhoModelo(modelo=modelo, cor_id=cor_id, numero=numero) for cor_id, numero in sorted(adicionados)],
+                ignore_conflicts=True,
+            )
+        if reativados:
+            TamanhoModelo.objects.filter(id__in=[atuais[par][0] for par in reativados]).update(excluido=False, ativo=True)
+        if adicionados or reativados:
+            invalidar_apos_commit('catalogo')
+
+    return {'adicionados': adicionados, 'reativados': reativados, 'existentes': existentes}
+
+
+def _quantidade(linha, campo):
+    try:
+        valor = int(linha.get(campo) or 0)
+    except (TypeError, ValueError):
+        raise GradeInvalida(f'Campo "{campo}" inválido')
+    if valor < 0:
+        raise GradeInvalida('Quantidade inválida. Use apenas números positivos.')
+    return valor
+
+
+def lancar_inventario(ficha, modelo_id, cor_id, linhas):
+    """
+    Grava na ficha as quantidades de vários números de um (modelo, cor).
+
+    Cada linha traz `tamanho_id` ou `numero`, mais quantidade_pe_direito e
+    quantidade_pe_esquerdo; o item é criado ou tem as quantidades
+    substituídas (upsert pelo unique_together). Devolve {'criados',
+    'atualizados', 'itens'}; GradeInvalida se alguma linha não servir.
+    """
+    # Uma consulta valida modelo, cor e todos os números enviados
+    numeros = dict(
+        TamanhoModelo.ativos.filter(modelo_id=modelo_id, cor_id=cor_id, ativo=True, modelo__excluido=False)
+        .values_list('numero', 'id')
+    )
+    if not numeros:
+        raise GradeInvalida('Modelo, cor ou tamanho não encontrado')
+    validos = {tamanho_id: numero for numero, tamanho_id in numeros.items()}
+
+    quantidades = {}
+    for linha in linhas:
+        if not isinstance(linha, dict):
+            raise GradeInvalida('Linha inválida')
+        if linha.get('tamanho_id') is not None:
+            tamanho_id = _quantidade(linha, 'tamanho_id')
+        else:
+            tamanho_id = numeros.get(str(linha.get('numero', '')).strip())
+        if tamanho_id not in validos:
+            raise GradeInvalida(f'Tamanho {linha.get("numero") or linha.get("tamanho_id")} não existe para este modelo/cor')
+        # Número repetido na grade: vale a última linha
+        quantidades[tamanho_id] = (
+            _quantidade(linha, 'quantidade_pe_direito'),
+            _quantidade(linha, 'quantidade_pe_esquerdo'),
+        )
+    if not quantidades:
+        raise GradeInvalida('Nenhuma linha enviada')
+
+    with transaction.atomic():
+        existentes = set(
+            ItemInventario.objects.filter(ficha=ficha, modelo_id=modelo_id, cor_id=cor_id, tamanho_id__in=quantidades)
+            .values_list('tamanho_id', flat=True)
+        )
+        ItemInventario.objects.bulk_create(
+            [
+                ItemInventario(
+                    ficha=ficha, modelo_id=modelo_id, cor_id=cor_id, tamanho_id=tamanho_id,
+                    quantidade_pe_direito=pe_direito, quantidade_pe_esquerdo=pe_esquerdo,
+                )
+                for tamanho_id, (pe_direito, pe_esquerdo) in quantidades.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['ficha', 'modelo', 'cor', 'tamanho'],
+            update_fields=['quantidade_pe_direito', 'quantidade_pe_esquerdo', 'atualizado_em'],
+        )
+        # bulk_create não passa pelo ItemInventario.save(): a versão da ficha (PDF, facetas) avança aqui
+        ficha.atualizada_em = timezone.now()
+        FichaInventario.objects.filter(pk=ficha.pk).update(atualizada_em=ficha.atualizada_em)
+
+    return {
+        'criados': len(quantidades) - len(existentes),
+        'atualizados': len(existentes),
+        'itens': [
+            {
+                'tamanho_id': tamanho_id,
+                'numero': validos[tamanho_id],
+                'quantidade_pe_direito': pe_direito,
+                'quantidade_pe_esquerdo': pe_esquerdo,
+            }
+            for tamanho_id, (pe_direito, pe_esquerdo) in sorted(quantidades.items(), key=lambda par: validos[par[0]])
+        ],
+    }
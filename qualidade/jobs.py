@@ -0,0 +1,120 @@
+# qualidade/jobs.py
+"""
+Fila de relatórios em segundo plano, guardada no próprio banco
+
+A requisição apenas enfileira o job; o worker (manage.py processar_relatorios)
+reserva os pendentes, desenha o PDF e grava o arquivo em MEDIA_ROOT.
+"""
+import logging
+import tempfile
+import traceback
+from datetime import datetime, timedelta
+
+from django.core.files import File
+from django.utils import timezone
+
+from .models import RelatorioJob
+from .pdfs import desenhar_relatorio_periodo, nome_arquivo_periodo
+
+logger = logging.getLogger(__name__)
+
+# Jobs "processando" há mais tempo que isso pertencem a um worker que morreu
+TEMPO_MAXIMO_PROCESSANDO = timedelta(minutes=15)
+# PDFs prontos ficam disponíveis para download por este período
+RETENCAO_JOBS = timedelta(days=7)
+
+
+def enfileirar_relatorio_periodo(usuario, parametros):
+    """Cria o job do relatório de período e devolve-o ainda pendente"""
+    return RelatorioJob.objects.create(
+        tipo='periodo',
+        parametros=parametros,
+        solicitado_por=usuario,
+    )
+
+
+def liberar_travados():
+    """Devolve à fila os jobs abandonados por um worker interrompido"""
+    limite = timezone.now() - TEMPO_MAXIMO_PROCESSANDO
+    return RelatorioJob.objects.filter(status='processando', iniciado_em__lt=limite).update(
+        status='pendente', iniciado_em=None
+    )
+
+
+def limpar_antigos():
+    """Remove os jobs (e seus arquivos) mais antigos que a retenção"""
+    antigos = RelatorioJob.objects.filter(criado_em__lt=timezone.now() - RETENCAO_JOBS)
+    for job in antigos:
+        if job.arquivo:
+            job.arquivo.delete(save=False)
+        job.delete()
+
+
+def reservar_proximo():
+    """Marca o job pendente mais antigo como 'processando' (um worker por job)"""
+    while True:
+        job = RelatorioJob.objects.filter(status='pendente').order_by('criado_em').first()
+        if job is None:
+            return None
+
+        # UPDATE condicional: se outro worker reservou antes, tenta o próximo
+        agora = timezone.now()
+        reservado = RelatorioJob.objects.filter(pk=job.pk, status='pendente').update(
+            status='processando', iniciado_em=agora
+        )
+        if reservado:
+            job.status = 'processando'
+            job.iniciado_em = agora
+            return job
+
+
+def _desenhar_periodo(job, saida):
+    parametros = job.parametros
+    data_inicio = datetime.strptime(parametros['data_inicio'], '%Y-%m-%d').date()
+    data_fim = datetime.strptime(parametros['data_fim'], '%Y-%m-%d').date()
+
+    desenhar_relatorio_periodo(
+        saida,
+        data_inicio,
+        data_fim,
+        job.solicitado_por.username,
+        parte_id=parametros.get('parte_id'),
+        operador_id=parametros.get('operador_id'),
+        nome_ficha=parametros.get('nome_ficha'),
+    )
+    return nome_arquivo_periodo(data_inicio, data_fim, parametros.get('operador_id'), parametros.get('nome_ficha'))
+
+
+GERADORES = {
+    'periodo': _desenhar_periodo,
+}
+
+
+def processar(job):
+    """Gera o PDF do job e grava o arquivo; erros ficam registrados no próprio job"""
+    try:
+        with tempfile.TemporaryFile() as saida:
+            nome_arquivo = GERADORES[job.tipo](job, saida)
+            saida.seek(0)
+            job.arquivo.save(f'{job.id}_{nome_arquivo}', File(saida), save=False)
+        job.nome_arquivo = nome_arquivo
+        job.status = 'concluido'
+    except Exception:
+        logger.exception('Erro ao gerar o relatório do job %s', job.id)
+        job.status = 'erro'
+        job.erro = traceback.format_exc()
+    job.concluido_em = timezone.now()
+    job.save(update_fields=['arquivo', 'nome_arquivo', 'status', 'erro', 'concluido_em'])
+    return job
+
+
+def processar_pendentes(limite=None):
+    """Processa jobs pendentes até esvaziar a fila (ou até `limite` jobs)"""
+    processados = 0
+    while limite is None or processados < limite:
+        job = reservar_proximo()
+        if job is None:
+            break
+        processar(job)
+        processados += 1
+    return processados
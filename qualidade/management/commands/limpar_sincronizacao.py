@@ -0,0 +1,15 @@
+# qualidade/management/commands/limpar_sincronizacao.py
+"""
+Apaga as chaves da fila offline fora da retenção (o worker também roda a limpeza a cada hora)
+"""
+from django.core.management.base import BaseCommand
+
+from qualidade.sincronizacao import limpar_operacoes
+
+
+class Command(BaseCommand):
+    help = 'Apaga as chaves de operações sincronizadas mais antigas que a retenção'
+
+    def handle(self, *args, **options):
+        apagadas = limpar_operacoes()
+        self.stdout.write(self.style.SUCCESS(f'{apagadas} chave(s) de sincronização apagada(s)'))
@@ -0,0 +1,15 @@
+# qualidade/management/commands/limpar_telao.py
+"""
+Apaga os eventos do telão fora da retenção (o worker também roda a limpeza a cada hora)
+"""
+from django.core.management.base import BaseCommand
+
+from qualidade.telao import limpar_eventos
+
+
+class Command(BaseCommand):
+    help = 'Apaga os eventos do telão mais antigos que a retenção'
+
+    def handle(self, *args, **options):
+        apagados = limpar_eventos()
+        self.stdout.write(self.style.SUCCESS(f'{apagados} evento(s) do telão apagado(s)'))
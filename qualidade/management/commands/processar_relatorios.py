@@ -0,0 +1,57 @@
+# qualidade/management/commands/processar_relatorios.py
+"""
+Worker dos relatórios em segundo plano (fila RelatorioJob no banco)
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from qualidade.jobs import limpar_antigos, liberar_travados, processar_pendentes
+from qualidade.sincronizacao import limpar_operacoes
+from qualidade.telao import limpar_eventos
+
+# Segundos entre as limpezas de retenção (jobs antigos, eventos do telão e chaves da fila offline)
+INTERVALO_LIMPEZA = 3600
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de relatórios PDF em segundo plano'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Relatórios gerados em paralelo')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre verificações da fila')
+        parser.add_argument('--uma-vez', action='store_true', help='Esvazia a fila e encerra')
+
+    def handle(self, *args, workers=2, intervalo=2.0, uma_vez=False, **options):
+        liberados = liberar_travados()
+        if liberados:
+            self.stdout.write(f'{liberados} job(s) travado(s) devolvido(s) à fila')
+
+        ultima_limpeza = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                if ultima_limpeza is None or time.monotonic() - ultima_limpeza >= INTERVALO_LIMPEZA:
+                    self._limpar()
+                    ultima_limpeza = time.monotonic()
+                processados = sum(executor.map(lambda _: self._rodada(), range(workers)))
+                if processados:
+                    self.stdout.write(f'{processados} relatório(s) gerado(s)')
+                if uma_vez:
+                    break
+                if not processados:
+                    time.sleep(intervalo)
+
+    def _limpar(self):
+        close_old_connections()
+        limpar_antigos()
+        limpar_eventos()
+        limpar_operacoes()
+
+    def _rodada(self):
+        close_old_connections()
+        try:
+            return processar_pendentes()
+        finally:
+            close_old_connections()
@@ -0,0 +1,31 @@
+# qualidade/management/commands/rebuild_rollups.py
+"""
+Regenera o rollup diário de produção (ProducaoDiaria) a partir dos registros
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from qualidade.models import ProducaoDiaria
+
+
+def _data(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Data inválida: {valor} (use AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Regenera o rollup diário de produção no intervalo informado (padrão: todo o histórico)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='data_inicio', type=_data, help='Data inicial (AAAA-MM-DD)')
+        parser.add_argument('--to', dest='data_fim', type=_data, help='Data final (AAAA-MM-DD)')
+
+    def handle(self, *args, data_inicio=None, data_fim=None, **options):
+        if data_inicio and data_fim and data_inicio > data_fim:
+            raise CommandError('A data inicial deve ser anterior à data final')
+
+        linhas = ProducaoDiaria.reconstruir(data_inicio, data_fim)
+        self.stdout.write(self.style.SUCCESS(f'Rollup regenerado: {linhas} linhas'))
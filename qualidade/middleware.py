@@ -0,0 +1,108 @@
+# qualidade/middleware.py
+"""
+Contexto do usuário logado por requisição (request.qualidade_ctx)
+
+Perfil e grupos saem de uma única consulta, feita só quando alguma view ou
+template pede, e valem para o resto da requisição. Com QUALIDADE_CTX_TTL > 0
+(desligado por padrão) o resultado também fica alguns segundos na sessão,
+junto com a versão do contexto do usuário no cache: os signals trocam essa
+versão quando o perfil ou os grupos mudam, e a cópia da sessão é descartada.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+
+from . import cache
+from .models import PerfilUsuario
+
+CHAVE_SESSAO = '_qualidade_ctx'
+
+
+def namespace_contexto(usuario_id):
+    """Namespace do cache cuja versão invalida o contexto guardado na sessão do usuário"""
+    return f'contexto_usuario:{usuario_id}'
+
+
+class ContextoUsuario:
+    """Perfil e grupos do usuário da requisição, carregados uma única vez"""
+
+    def __init__(self, request):
+        self._request = request
+
+    @cached_property
+    def _dados(self):
+        usuario = self._request.user
+        if not usuario.is_authenticated:
+            return {'perfil_id': None, 'tipo': None, 'grupos': []}
+
+        ttl = getattr(settings, 'QUALIDADE_CTX_TTL', 0)
+        sessao = getattr(self._request, 'session', None)
+        guardar = ttl and sessao is not None
+        if guardar:
+            versao = cache.versao(namespace_contexto(usuario.pk))
+            guardado = sessao.get(CHAVE_SESSAO)
+            if (
+                guardado and guardado['usuario'] == usuario.pk and guardado.get('versao') == versao
+                and time.time() - guardado['em'] < ttl
+            ):
+                return guardado
+
+        # Uma linha por grupo, na ordem de groups.first()
+        linhas = list(
+            User.objects.filter(pk=usuario.pk)
+            .values_list('perfil__id', 'perfil__tipo', 'groups__name')
+            .order_by('groups__id')
+        )
+        dados = {
+            'usuario': usuario.pk,
+            'perfil_id': linhas[0][0] if linhas else None,
+            'tipo': linhas[0][1] if linhas else None,
+            'grupos': [grupo for _, _, grupo in linhas if grupo],
+            'em': time.time(),
+        }
+        if guardar:
+            sessao[CHAVE_SESSAO] = dict(dados, versao=versao)
+        return dados
+
+    @cached_property
+    def perfil(self):
+        """PerfilUsuario do usuário (também fica em request.user.perfil, sem nova consulta)"""
+        if self._dados['perfil_id'] is None:
+            return None
+        perfil = PerfilUsuario(id=self._dados['perfil_id'], tipo=self._dados['tipo'])
+        self._request.user.perfil = perfil
+        return perfil
+
+    @property
+    def tipo(self):
+        return self._dados['tipo']
+
+    @property
+    def grupos(self):
+        return self._dados['grupos']
+
+    @property
+    def grupo(self):
+        """Nome do primeiro grupo (o mesmo de user.groups.first()) ou None"""
+        return self.grupos[0] if self.grupos else None
+
+    @property
+    def setor(self):
+        """Setor a gravar nas fichas do usuário: o nome do grupo, ou '' sem grupo"""
+        return self.grupo or ''
+
+    def no_grupo(self, nome):
+        return nome in self.grupos
+
+
+class ContextoUsuarioMiddleware:
+    """Anexa request.qualidade_ctx; nada é consultado até o primeiro uso"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.qualidade_ctx = ContextoUsuario(request)
+        return self.get_response(request)
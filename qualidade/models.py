@@ -1,6 +1,114 @@
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .cache import invalidar_apos_commit
+
+
+class LixeiraQuerySet(models.QuerySet):
+    """
+    Consultas dos modelos com lixeira (excluido / excluido_em / excluido_por).
+
+    mover_para_lixeira() e restaurar() são um único UPDATE para a seleção
+    inteira, sem carregar os objetos. Como não passam pelo save() nem pelos
+    signals, cada subclasse repete o que eles fariam (rollup, caches).
+    """
+    # Namespaces de qualidade/cache.py que dependem do que está na lixeira
+    namespaces_cache = ()
+
+    def ativos(self):
+        return self.filter(excluido=False)
+
+    def lixeira(self):
+        return self.filter(excluido=True)
+
+    def disponiveis(self):
+        """Fora da lixeira e ativos (modelos com o campo `ativo`)"""
+        return self.filter(ativo=True, excluido=False)
+
+    def mover_para_lixeira(self, usuario=None):
+        """Move a seleção para a lixeira; devolve quantos itens mudaram"""
+        return self.ativos()._marcar(True, usuario)
+
+    def restaurar(self):
+        """Tira a seleção da lixeira; devolve quantos itens mudaram"""
+        return self.lixeira()._marcar(False)
+
+    def _marcar(self, excluido, usuario=None):
+        agora = timezone.now()
+        nomes = {campo.name for campo in self.model._meta.concrete_fields}
+        campos = {'excluido': excluido}
+        if 'excluido_em' in nomes:
+            campos['excluido_em'] = agora if excluido else None
+        if 'excluido_por' in nomes:
+            campos['excluido_por'] = usuario if excluido else None
+        if 'atualizada_em' in nomes:
+            # auto_now não vale para update(): a versão dos PDFs depende deste campo
+            campos['atualizada_em'] = agora
+
+        alterados = self.update(**campos)
+        if alterados:
+            invalidar_apos_commit(*self.namespaces_cache)
+        return alterados
+
+
+class AtivosManager(models.Manager):
+    """Somente itens fora da lixeira (WHERE NOT excluido, o mesmo dos índices parciais)"""
+
+    def get_queryset(self):
+        return super().get_queryset().ativos()
+
+
+class LixeiraManager(models.Manager):
+    """Somente itens na lixeira"""
+
+    def get_queryset(self):
+        return super().get_queryset().lixeira()
+
+
+class NomeOperadorQuerySet(LixeiraQuerySet):
+    pass
+
+
+class ParteCalcadoQuerySet(LixeiraQuerySet):
+    namespaces_cache = ('filtros_relatorio',)
+
+
+class FichaQuerySet(LixeiraQuerySet):
+    namespaces_cache = ('filtros_relatorio', 'telao')
+
+    def _marcar(self, excluido, usuario=None):
+        with transaction.atomic():
+            ids = list(self.select_for_update().values_list('id', flat=True))
+            if not ids:
+                return 0
+            # Como no save(): a produção sai do rollup na lixeira e volta na restauração
+            ProducaoDiaria.aplicar_fichas(ids, -1 if excluido else 1)
+            return super(FichaQuerySet, self.model.objects.filter(id__in=ids))._marcar(excluido, usuario)
+
+
+class CorQuerySet(LixeiraQuerySet):
+    namespaces_cache = ('catalogo',)
+
+
+class ModeloCalcadoQuerySet(LixeiraQuerySet):
+    namespaces_cache = ('catalogo',)
+
+    def _marcar(self, excluido, usuario=None):
+        with transaction.atomic():
+            # Os tamanhos acompanham o modelo (antes do UPDATE, enquanto a seleção ainda casa)
+            TamanhoModelo.objects.filter(modelo__in=self.values('id')).update(excluido=excluido, ativo=not excluido)
+            return super()._marcar(excluido, usuario)
+
+
+class TamanhoModeloQuerySet(LixeiraQuerySet):
+    namespaces_cache = ('catalogo',)
+
+
+class FichaInventarioQuerySet(LixeiraQuerySet):
+    pass
+
 
 class NomeOperador(models.Model):
     """Modelo para os nomes dos operadores"""
@@ -11,6 +119,10 @@ class NomeOperador(models.Model):
     excluido_em = models.DateTimeField(null=True, blank=True)
     excluido_por = models.ForeignKey('auth.User', null=True, blank=True, on_delete=models.SET_NULL, related_name='operadores_excluidos')
 
+    objects = NomeOperadorQuerySet.as_manager()
+    ativos = AtivosManager.from_queryset(NomeOperadorQuerySet)()
+    lixeira = LixeiraManager.from_queryset(NomeOperadorQuerySet)()
+
     class Meta:
         verbose_name = 'Nome do Operador'
         verbose_name_plural = 'Nomes dos Operadores'
@@ -29,6 +141,10 @@ class ParteCalcado(models.Model):
     excluido_em = models.DateTimeField(null=True, blank=True)
     excluido_por = models.ForeignKey('auth.User', null=True, blank=True, on_delete=models.SET_NULL, related_name='partes_excluidas')
 
+    objects = ParteCalcadoQuerySet.as_manager()
+    ativos = AtivosManager.from_queryset(ParteCalcadoQuerySet)()
+    lixeira = LixeiraManager.from_queryset(ParteCalcadoQuerySet)()
+
     class Meta:
         verbose_name = 'Parte do Calçado'
         verbose_name_plural = 'Partes do Calçado'
@@ -51,26 +167,87 @@ class Ficha(models.Model):
     nome_ficha = models.CharField(max_length=200)
     criada_em = models.DateTimeField(auto_now_add=True)
     atualizada_em = models.DateTimeField(auto_now=True)
+    total_geral = models.IntegerField(default=0)  # Soma dos totais dos registros (mantida pelo RegistroParte)
     excluido = models.BooleanField(default=False)
     excluido_em = models.DateTimeField(null=True, blank=True)
     excluido_por = models.ForeignKey(User,null=True,blank=True,on_delete=models.SET_NULL,related_name='fichas_excluidas')
 
+    objects = FichaQuerySet.as_manager()
+    ativos = AtivosManager.from_queryset(FichaQuerySet)()
+    lixeira = LixeiraManager.from_queryset(FichaQuerySet)()
+
     class Meta:
         verbose_name = 'Ficha'
         verbose_name_plural = 'Fichas'
         ordering = ['-data', '-criada_em']
+        indexes = [
+            # Listagens (home, telão do dia): só fichas fora da lixeira, na ordem da paginação
+            models.Index(fields=['-data', '-criada_em', 'id'], condition=Q(excluido=False), name='ficha_ativa_data_idx'),
+            models.Index(fields=['setor', '-data', '-criada_em'], condition=Q(excluido=False), name='ficha_ativa_setor_idx'),
+            models.Index(fields=['operador', '-data', '-criada_em'], condition=Q(excluido=False), name='ficha_ativa_operador_idx'),
+            # Nomes de ficha dos filtros de relatório
+            models.Index(fields=['nome_ficha'], condition=Q(excluido=False), name='ficha_ativa_nome_idx'),
+            # Versão do período dos PDFs (inclui a lixeira)
+            models.Index(fields=['data', 'nome_ficha'], name='ficha_data_nome_idx'),
+            # Lixeira de fichas (ramo Ficha do UNION ALL, ordem da paginação)
+            models.Index(fields=['-excluido_em', '-id'], condition=Q(excluido=True), name='ficha_lixeira_idx'),
+        ]
+
+    # Chave da ficha no ProducaoDiaria como está gravada no banco (None: fora do rollup)
+    _chave_rollup_salva = None
+    _chave_rollup_conhecida = True
 
     def __str__(self):
         return f"{self.nome_ficha} - {self.data} - {self.operador.username}"
-    
-    def save(self, *args, **kwargs):
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        campos = ('data', 'setor', 'operador_id', 'nome_ficha', 'excluido')
+        if all(campo in instancia.__dict__ for campo in campos):
+            instancia._chave_rollup_salva = instancia.chave_rollup()
+        else:
+            # Carregada com .only()/.defer(): o estado anterior no rollup é desconhecido
+            instancia._chave_rollup_conhecida = False
+        return instancia
+
+    def chave_rollup(self):
+        """Chave (data, setor, operador, nome) no rollup diário; None se estiver na lixeira"""
+        if self.excluido:
+            return None
+        return {
+            'data': self.data,
+            'setor': self.setor or '',
+            'operador_id': self.operador_id,
+            'nome_ficha': self.nome_ficha,
+        }
+
+    def save(self, *args, setor_operador=None, **kwargs):
     # Preenche o setor automaticamente com o nome do grupo do usuário
-        if not self.setor and self.operador:
-            grupo = self.operador.groups.first()
-            print(f"DEBUG - Operador: {self.operador.username}")
-            print(f"DEBUG - Grupo encontrado: {grupo.name if grupo else 'Nenhum'}")
-            self.setor = grupo.name if grupo else None
-        super().save(*args, **kwargs)
+    # (setor_operador: grupo já conhecido, ex. request.qualidade_ctx.setor; '' = sem grupo)
+        if not self.setor and self.operador_id:
+            if setor_operador is None:
+                grupo = self.operador.groups.first()
+                print(f"DEBUG - Operador: {self.operador.username}")
+                print(f"DEBUG - Grupo encontrado: {grupo.name if grupo else 'Nenhum'}")
+                setor_operador = grupo.name if grupo else ''
+            self.setor = setor_operador or None
+        # total_geral é mantido por UPDATE atômico no RegistroParte: não sobrescrever com valor antigo
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'total_geral'
+            ]
+        existente = not self._state.adding and self._chave_rollup_conhecida
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Lixeira, restauração ou troca de data/nome/operador movem a produção no rollup
+            chave = self.chave_rollup()
+            if existente and chave != self._chave_rollup_salva:
+                ProducaoDiaria.mover_ficha(self, self._chave_rollup_salva, chave)
+        self._chave_rollup_salva = chave
+        self._chave_rollup_conhecida = True
 
     def excluir(self, usuario):
         """Marca a ficha como excluída e registra quem excluiu"""
@@ -90,7 +267,17 @@ class RegistroParte(models.Model):
     """Modelo para registrar as quantidades de cada parte na ficha"""
     ficha = models.ForeignKey(Ficha, on_delete=models.CASCADE, related_name='registros')
     parte = models.ForeignKey(ParteCalcado, on_delete=models.CASCADE)
+    # Lista gravada antes dos lançamentos existirem: só o backfill (signals.py) lê essa coluna.
+    # Registros novos gravam [] (os valores passados na criação viram lançamentos no save)
     quantidades = models.JSONField(default=list)  # Lista de quantidades [12, 32, 22, 65, 16]
+    total = models.IntegerField(default=0)  # Soma dos lançamentos (contador)
+    contagem = models.IntegerField(default=0)  # Número de lançamentos (contador)
+
+    # Total/contagem gravados no banco, para repassar a diferença à ficha e ao rollup
+    _total_salvo = 0
+    _contagem_salva = 0
+    # Projeção dos lançamentos lida nesta instância
+    _quantidades_lancadas = None
 
     class Meta:
         verbose_name = 'Registro de Parte'
@@ -100,16 +287,370 @@ class RegistroParte(models.Model):
     def __str__(self):
         return f"{self.ficha.nome_ficha} - {self.parte.nome}"
 
-    def total(self):
-        """Retorna o total das quantidades"""
-        return sum(self.quantidades) if self.quantidades else 0
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._total_salvo = instancia.__dict__.get('total', 0)
+        instancia._contagem_salva = instancia.__dict__.get('contagem', 0)
+        return instancia
 
-    def adicionar_quantidade(self, quantidade):
-        """Adiciona uma nova quantidade à lista"""
-        if not self.quantidades:
+    @property
+    def quantidades_lancadas(self):
+        """
+        Lista de quantidades na ordem de lançamento, projetada dos
+        LancamentoQuantidade (use prefetch_related('lancamentos') ao listar
+        vários registros).
+        """
+        if self.pk is None:
+            return list(self.quantidades or [])
+        if self._quantidades_lancadas is None:
+            lancamentos = getattr(self, '_prefetched_objects_cache', {}).get('lancamentos')
+            if lancamentos is not None:
+                self._quantidades_lancadas = [lancamento.quantidade for lancamento in lancamentos]
+            else:
+                self._quantidades_lancadas = list(self.lancamentos.values_list('quantidade', flat=True))
+        return self._quantidades_lancadas
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._quantidades_lancadas = None
+        self._total_salvo = self.total
+        self._contagem_salva = self.contagem
+
+    def save(self, *args, **kwargs):
+        """Grava o registro (e os lançamentos iniciais) e atualiza a ficha e o rollup na mesma transação"""
+        iniciais = list(self.quantidades or []) if self._state.adding else []
+        if iniciais:
             self.quantidades = []
-        self.quantidades.append(quantidade)
-        self.save()
+            self.total = sum(iniciais)
+            self.contagem = len(iniciais)
+        diferenca = self.total - self._total_salvo
+        diferenca_contagem = self.contagem - self._contagem_salva
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if iniciais:
+                LancamentoQuantidade.objects.bulk_create(
+                    [LancamentoQuantidade(registro=self, quantidade=quantidade) for quantidade in iniciais]
+                )
+            self._repassar_diferenca(diferenca, diferenca_contagem)
+        self._quantidades_lancadas = iniciais
+        self._total_salvo = self.total
+        self._contagem_salva = self.contagem
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            self._repassar_diferenca(-self._total_salvo, -self._contagem_salva)
+            return super().delete(*args, **kwargs)
+
+    def _repassar_diferenca(self, diferenca, diferenca_contagem):
+        # atualizada_em também marca a versão da ficha (cache dos PDFs)
+        Ficha.objects.filter(pk=self.ficha_id).update(
+            total_geral=F('total_geral') + diferenca,
+            atualizada_em=timezone.now(),
+        )
+        if diferenca or diferenca_contagem:
+            chave = self.ficha.chave_rollup()
+            if chave:
+                ProducaoDiaria.aplicar(chave, self.parte_id, diferenca, diferenca_contagem)
+                # Evento do telão na mesma transação do rollup (import local: telao importa models)
+                from .telao import publicar_delta
+                publicar_delta(self.ficha, self.parte, diferenca)
+
+    def adicionar_quantidade(self, quantidade, usuario=None):
+        """Grava um novo lançamento no registro"""
+        self.adicionar_quantidades([quantidade], usuario)
+
+    def adicionar_quantidades(self, quantidades, usuario=None):
+        """
+        Grava vários lançamentos de uma vez (na ordem recebida): só INSERTs dos
+        lançamentos e a soma nos contadores, sem reescrever nenhuma lista.
+        """
+        if not quantidades:
+            return
+        with transaction.atomic():
+            # O UPDATE trava a linha até o commit: lançamentos concorrentes entram em fila
+            if not self._somar_contadores(sum(quantidades), len(quantidades)):
+                raise RegistroParte.DoesNotExist
+            LancamentoQuantidade.objects.bulk_create([
+                LancamentoQuantidade(registro=self, quantidade=quantidade, criado_por=usuario)
+                for quantidade in quantidades
+            ])
+            self._repassar_diferenca(sum(quantidades), len(quantidades))
+        if self._quantidades_lancadas is not None:
+            self._quantidades_lancadas = self._quantidades_lancadas + list(quantidades)
+
+    def remover_ultima_quantidade(self):
+        """Remove o último lançamento e retorna o valor removido"""
+        with transaction.atomic():
+            # Trava o registro antes de escolher o último lançamento (no SQLite a transação IMMEDIATE já serializa)
+            if not RegistroParte.objects.select_for_update().filter(pk=self.pk).exists():
+                raise RegistroParte.DoesNotExist
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    _SQL_REMOVER_ULTIMO_LANCAMENTO.format(tabela=LancamentoQuantidade._meta.db_table), [self.pk]
+                )
+                linha = cursor.fetchone()
+            if linha is None:
+                return None
+            removida = linha[0]
+            self._somar_contadores(-removida, -1)
+            self._repassar_diferenca(-removida, -1)
+        if self._quantidades_lancadas:
+            self._quantidades_lancadas = self._quantidades_lancadas[:-1]
+        return removida
+
+    def _somar_contadores(self, total, contagem):
+        """Soma nos contadores com um UPDATE ... RETURNING e copia o resultado para a instância"""
+        with connection.cursor() as cursor:
+            cursor.execute(_SQL_SOMAR_CONTADORES.format(tabela=self._meta.db_table), [total, contagem, self.pk])
+            linha = cursor.fetchone()
+        if linha is None:
+            return False
+        self.total = self._total_salvo = linha[0]
+        self.contagem = self._contagem_salva = linha[1]
+        return True
+
+
+# UPDATE/DELETE ... RETURNING (PostgreSQL e SQLite >= 3.35): uma instrução cada
+_SQL_SOMAR_CONTADORES = """
+    UPDATE {tabela}
+       SET total = total + %s,
+           contagem = contagem + %s
+     WHERE id = %s
+ RETURNING total, contagem
+"""
+
+_SQL_REMOVER_ULTIMO_LANCAMENTO = """
+    DELETE FROM {tabela}
+     WHERE id = (SELECT MAX(id) FROM {tabela} WHERE registro_id = %s)
+ RETURNING quantidade
+"""
+
+
+class LancamentoQuantidade(models.Model):
+    """Cada quantidade lançada numa parte da ficha (só inserção; a remoção apaga o último)"""
+    registro = models.ForeignKey(RegistroParte, on_delete=models.CASCADE, related_name='lancamentos')
+    quantidade = models.IntegerField()
+    criado_em = models.DateTimeField(default=timezone.now)
+    criado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='lancamentos_quantidade')
+
+    class Meta:
+        verbose_name = 'Lançamento de Quantidade'
+        verbose_name_plural = 'Lançamentos de Quantidade'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['criado_em']),
+            # Último lançamento do registro (remover_ultima_quantidade) sem varrer os demais
+            models.Index(fields=['registro', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.registro} - {self.quantidade} ({self.criado_em:%d/%m/%Y %H:%M})"
+
+
+class ProducaoDiaria(models.Model):
+    """Rollup diário da produção por (data, setor, operador, nome da ficha, parte)"""
+    data = models.DateField()
+    setor = models.CharField(max_length=25, blank=True, default='')
+    operador = models.ForeignKey(User, on_delete=models.CASCADE, related_name='producao_diaria')
+    nome_ficha = models.CharField(max_length=200)
+    parte = models.ForeignKey(ParteCalcado, on_delete=models.CASCADE, related_name='producao_diaria')
+    quantidade = models.IntegerField(default=0)  # Soma das peças
+    lancamentos = models.IntegerField(default=0)  # Número de lançamentos
+
+    class Meta:
+        verbose_name = 'Produção Diária'
+        verbose_name_plural = 'Produção Diária'
+        ordering = ['-data', 'nome_ficha']
+        unique_together = ['data', 'setor', 'operador', 'nome_ficha', 'parte']
+
+    def __str__(self):
+        return f"{self.data} - {self.nome_ficha} - {self.parte_id}: {self.quantidade}"
+
+    @classmethod
+    def aplicar(cls, chave, parte_id, quantidade, lancamentos):
+        """
+        Soma (ou subtrai) peças e lançamentos na linha do rollup, criando-a se
+        preciso; a linha que fica zerada é apagada (não aparece no telão nem
+        nos relatórios).
+        """
+        linha = cls.objects.filter(parte_id=parte_id, **chave)
+        alterados = linha.update(
+            quantidade=F('quantidade') + quantidade,
+            lancamentos=F('lancamentos') + lancamentos,
+        )
+        if alterados:
+            if quantidade < 0 or lancamentos < 0:
+                linha.filter(quantidade=0, lancamentos=0).delete()
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(parte_id=parte_id, quantidade=quantidade, lancamentos=lancamentos, **chave)
+        except IntegrityError:
+            # Outra requisição criou a linha entre o UPDATE e o INSERT
+            cls.objects.filter(parte_id=parte_id, **chave).update(
+                quantidade=F('quantidade') + quantidade,
+                lancamentos=F('lancamentos') + lancamentos,
+            )
+
+    @classmethod
+    def mover_ficha(cls, ficha, chave_anterior, chave_nova):
+        """Retira a produção da ficha da chave anterior e a soma na nova (None = fora do rollup)"""
+        registros = RegistroParte.objects.filter(ficha=ficha).values_list('parte_id', 'total', 'contagem')
+        for parte_id, total, contagem in registros:
+            if not (total or contagem):
+                continue
+            if chave_anterior:
+                cls.aplicar(chave_anterior, parte_id, -total, -contagem)
+            if chave_nova:
+                cls.aplicar(chave_nova, parte_id, total, contagem)
+
+    @classmethod
+    def aplicar_fichas(cls, ficha_ids, sinal):
+        """Soma (sinal=1) ou retira (sinal=-1) a produção das fichas, uma vez por (chave, parte)"""
+        agrupados = (
+            RegistroParte.objects.filter(ficha_id__in=ficha_ids)
+            .values('ficha__data', 'ficha__setor', 'ficha__operador_id', 'ficha__nome_ficha', 'parte_id')
+            .annotate(soma=models.Sum('total'), soma_contagem=models.Sum('contagem'))
+            .order_by()
+        )
+        deltas = {}
+        for linha in agrupados:
+            chave = (
+                linha['ficha__data'], linha['ficha__setor'] or '', linha['ficha__operador_id'],
+                linha['ficha__nome_ficha'], linha['parte_id'],
+            )
+            quantidade, lancamentos = deltas.get(chave, (0, 0))
+            deltas[chave] = (quantidade + linha['soma'], lancamentos + linha['soma_contagem'])
+
+        for (data, setor, operador_id, nome_ficha, parte_id), (quantidade, lancamentos) in deltas.items():
+            if quantidade or lancamentos:
+                chave = {'data': data, 'setor': setor, 'operador_id': operador_id, 'nome_ficha': nome_ficha}
+                cls.aplicar(chave, parte_id, sinal * quantidade, sinal * lancamentos)
+
+    @classmethod
+    def reconstruir(cls, data_inicio=None, data_fim=None):
+        """Regenera o rollup a partir dos registros (todo o histórico ou um intervalo de datas)"""
+        linhas = cls.objects.all()
+        registros = RegistroParte.objects.filter(ficha__excluido=False)
+        if data_inicio:
+            linhas = linhas.filter(data__gte=data_inicio)
+            registros = registros.filter(ficha__data__gte=data_inicio)
+        if data_fim:
+            linhas = linhas.filter(data__lte=data_fim)
+            registros = registros.filter(ficha__data__lte=data_fim)
+
+        agrupados = (
+            registros
+            .values('ficha__data', 'ficha__setor', 'ficha__operador_id', 'ficha__nome_ficha', 'parte_id')
+            .annotate(soma=models.Sum('total'), soma_contagem=models.Sum('contagem'))
+            .order_by()
+        )
+
+        novas = {}
+        for linha in agrupados:
+            chave = (
+                linha['ficha__data'], linha['ficha__setor'] or '', linha['ficha__operador_id'],
+                linha['ficha__nome_ficha'], linha['parte_id'],
+            )
+            # Setor nulo e vazio caem na mesma linha do rollup
+            quantidade, lancamentos = novas.get(chave, (0, 0))
+            novas[chave] = (quantidade + linha['soma'], lancamentos + linha['soma_contagem'])
+
+        with transaction.atomic():
+            linhas.delete()
+            cls.objects.bulk_create(
+                [
+                    cls(
+                        data=data, setor=setor, operador_id=operador_id, nome_ficha=nome_ficha,
+                        parte_id=parte_id, quantidade=quantidade, lancamentos=lancamentos,
+                    )
+                    for (data, setor, operador_id, nome_ficha, parte_id), (quantidade, lancamentos) in novas.items()
+                    if quantidade or lancamentos
+                ],
+                batch_size=500,
+            )
+        return len(novas)
+
+
+class RelatorioJob(models.Model):
+    """Relatório PDF gerado em segundo plano (manage.py processar_relatorios)"""
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    ]
+
+    tipo = models.CharField(max_length=30, default='periodo')
+    parametros = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    arquivo = models.FileField(upload_to='relatorios/', blank=True)
+    nome_arquivo = models.CharField(max_length=200, blank=True)
+    erro = models.TextField(blank=True)
+    solicitado_por = models.ForeignKey(User, on_delete=models.CASCADE, related_name='relatorios_solicitados')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Relatório em Segundo Plano'
+        verbose_name_plural = 'Relatórios em Segundo Plano'
+        ordering = ['-criado_em']
+        indexes = [models.Index(fields=['status', 'criado_em'])]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.id} - {self.get_status_display()}"
+
+
+class OperacaoSincronizada(models.Model):
+    """Operação recebida da fila offline; a chave gerada no cliente impede aplicar a mesma operação duas vezes"""
+    chave = models.CharField(max_length=64, unique=True)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='operacoes_sincronizadas')
+    tipo = models.CharField(max_length=30)
+    resultado = models.JSONField(null=True, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Operação Sincronizada'
+        verbose_name_plural = 'Operações Sincronizadas'
+
+    def __str__(self):
+        return f"{self.tipo} {self.chave} ({self.usuario})"
+
+
+class SequenciaTelao(models.Model):
+    """Contador (linha única) que numera os eventos do telão na ordem de commit"""
+    valor = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Sequência do Telão'
+        verbose_name_plural = 'Sequência do Telão'
+
+    def __str__(self):
+        return str(self.valor)
+
+
+class EventoTelao(models.Model):
+    """Alteração de produção (delta por ficha/parte) enviada ao vivo para o telão"""
+    data = models.DateField()
+    # Número de SequenciaTelao: as telas leem "sequencia > último visto"
+    sequencia = models.BigIntegerField(unique=True, null=True)
+    payload = models.JSONField(default=dict)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Evento do Telão'
+        verbose_name_plural = 'Eventos do Telão'
+        ordering = ['sequencia']
+        indexes = [
+            models.Index(fields=['data', 'sequencia']),
+            models.Index(fields=['criado_em']),
+        ]
+
+    def __str__(self):
+        return f"{self.data} - {self.payload}"
 
 
 class PerfilUsuario(models.Model):
@@ -143,6 +684,10 @@ class Cor(models.Model):
     criado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='cores_criadas')
     excluido_por = models.ForeignKey(User,null=True,blank=True,on_delete=models.SET_NULL,related_name='cores_excluidas')
 
+    objects = CorQuerySet.as_manager()
+    ativos = AtivosManager.from_queryset(CorQuerySet)()
+    lixeira = LixeiraManager.from_queryset(CorQuerySet)()
+
     def __str__(self):
         return self.nome
 
@@ -156,6 +701,10 @@ class ModeloCalcado(models.Model):
     criado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='modelos_criados')
     excluido_por = models.ForeignKey(User,null=True,blank=True,on_delete=models.SET_NULL,related_name='modelos_excluidas')
     cores = models.ManyToManyField(Cor, related_name='modelos')
+
+    objects = ModeloCalcadoQuerySet.as_manager()
+    ativos = AtivosManager.from_queryset(ModeloCalcadoQuerySet)()
+    lixeira = LixeiraManager.from_queryset(ModeloCalcadoQuerySet)()
     
     class Meta:
         verbose_name = 'Modelo de Calçado'
@@ -172,6 +721,10 @@ class TamanhoModelo(models.Model):
     numero = models.CharField(max_length=10, verbose_name="Número/Tamanho")
     ativo = models.BooleanField(default=True)
     excluido = models.BooleanField(default=False)
+
+    objects = TamanhoModeloQuerySet.as_manager()
+    ativos = AtivosManager.from_queryset(TamanhoModeloQuerySet)()
+    lixeira = LixeiraManager.from_queryset(TamanhoModeloQuerySet)()
     
     class Meta:
         verbose_name = 'Tamanho do Modelo'
@@ -194,19 +747,30 @@ class FichaInventario(models.Model):
     excluido = models.BooleanField(default=False)
     excluido_em = models.DateTimeField(null=True, blank=True)
     excluido_por = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='fichas_inventario_excluidas')
+
+    objects = FichaInventarioQuerySet.as_manager()
+    ativos = AtivosManager.from_queryset(FichaInventarioQuerySet)()
+    lixeira = LixeiraManager.from_queryset(FichaInventarioQuerySet)()
     
     class Meta:
         verbose_name = 'Ficha de Inventário'
         verbose_name_plural = 'Fichas de Inventário'
         ordering = ['-data', '-criada_em']
+        indexes = [
+            models.Index(fields=['-data', '-criada_em', 'id'], condition=Q(excluido=False), name='inventario_ativo_data_idx'),
+            models.Index(fields=['operador', '-data', '-criada_em'], condition=Q(excluido=False), name='inventario_ativo_oper_idx'),
+            models.Index(fields=['-excluido_em', '-id'], condition=Q(excluido=True), name='inventario_lixeira_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nome_ficha} - {self.data} - {self.operador.username}"
     
-    def save(self, *args, **kwargs):
-        if not self.setor and self.operador:
-            grupo = self.operador.groups.first()
-            self.setor = grupo.name if grupo else 'Injetora'
+    def save(self, *args, setor_operador=None, **kwargs):
+        if not self.setor and self.operador_id:
+            if setor_operador is None:
+                grupo = self.operador.groups.first()
+                setor_operador = grupo.name if grupo else ''
+            self.setor = setor_operador or 'Injetora'
         super().save(*args, **kwargs)
 
     def model_name(self):
@@ -236,5 +800,46 @@ class ItemInventario(models.Model):
     
     def __str__(self):
         return f"{self.modelo.nome} - {self.cor.nome} - Nº{self.tamanho.numero} - {self.quantidade} pares"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._tocar_ficha()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            self._tocar_ficha()
+            return super().delete(*args, **kwargs)
+
+    def _tocar_ficha(self):
+        """Avança atualizada_em da ficha: qualquer mudança nos itens muda a versão do PDF"""
+        FichaInventario.objects.filter(pk=self.ficha_id).update(atualizada_em=timezone.now())
+
+    # Lado dos botões +/- → campo
+    CAMPOS_LADO = {'PD': 'quantidade_pe_direito', 'PE': 'quantidade_pe_esquerdo'}
+
+    @classmethod
+    def ajustar_quantidade(cls, item_id, campo, delta):
+        """
+        Soma `delta` (negativo para subtrair) a `campo` num UPDATE condicional
+        (SET campo = campo + delta WHERE campo + delta >= 0), sem ler o item
+        antes: cliques simultâneos não deixam a quantidade negativa.
+
+        Devolve {'ficha_id', 'quantidade_pe_direito', 'quantidade_pe_esquerdo',
+        'ficha_atualizada_em'} já alterados, ou None se o item não existe ou
+        ficaria negativo.
+        """
+        agora = timezone.now()
+        with transaction.atomic():
+            alterados = cls.objects.filter(id=item_id, **{f'{campo}__gte': -delta}).update(
+                **{campo: F(campo) + delta, 'atualizado_em': agora}
+            )
+            if not alterados:
+                return None
+            valores = cls.objects.filter(id=item_id).values(
+                'ficha_id', 'quantidade_pe_direito', 'quantidade_pe_esquerdo'
+            ).get()
+            FichaInventario.objects.filter(pk=valores['ficha_id']).update(atualizada_em=agora)
+        return {**valores, 'ficha_atualizada_em': agora}
     
     
\ No newline at end of file
@@ -0,0 +1,232 @@
+# qualidade/paginacao.py
+"""
+Paginação por cursor (keyset) das listagens de fichas
+
+Em vez de COUNT(*) + OFFSET, cada página começa logo depois da última linha
+da anterior: WHERE (data, criada_em, id) vem depois do cursor, LIMIT n + 1,
+com data <= a do cursor para que o índice seja buscado a partir dele. O
+custo de qualquer página é o de ler n linhas pelo índice, por maior que
+seja o histórico. Os cursores das URLs Anterior/Próxima são os valores da
+primeira/última linha da página, em base64.
+
+paginar_uniao() faz o mesmo sobre um UNION ALL de consultas .values() com o
+mesmo formato: o cursor é aplicado dentro de cada ramo, antes da união, e o
+LIMIT vale para o resultado unido.
+"""
+import base64
+import binascii
+import json
+import operator
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Mesma ordem do Meta.ordering de Ficha/FichaInventario, com o id como desempate
+ORDEM_FICHAS = ('-data', '-criada_em', 'id')
+# Fora do PostgreSQL a contagem é exata, mas só até este limite
+LIMITE_CONTAGEM = 1000
+
+
+def _campos(ordem):
+    return [(campo.lstrip('-'), campo.startswith('-')) for campo in ordem]
+
+
+def _inverter(ordem):
+    return tuple(campo[1:] if campo.startswith('-') else f'-{campo}' for campo in ordem)
+
+
+def _valor(objeto, nome):
+    # Linhas de .values() (paginar_uniao) são dicionários
+    return objeto[nome] if isinstance(objeto, dict) else getattr(objeto, nome)
+
+
+def _converter(modelo, nome, valor):
+    try:
+        return modelo._meta.get_field(nome).to_python(valor)
+    except FieldDoesNotExist:
+        return valor  # coluna anotada (ex.: o tipo na união): fica como veio do JSON
+
+
+def codificar_cursor(objeto, ordem):
+    valores = [_valor(objeto, nome) for nome, _ in _campos(ordem)]
+    texto = json.dumps([valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in valores])
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token, modelo, ordem):
+    """Valores do cursor convertidos pelos campos do modelo, ou None se o token for inválido"""
+    if not token:
+        return None
+    try:
+        texto = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+        valores = json.loads(texto)
+        campos = _campos(ordem)
+        if len(valores) != len(campos):
+            return None
+        return [_converter(modelo, nome, valor) for (nome, _), valor in zip(campos, valores)]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, ValidationError):
+        return None
+
+
+def _depois_de(ordem, valores):
+    """
+    Linhas posteriores ao cursor na ordem dada: expansão de (a, b, c) > (x, y, z)
+    com direções mistas, mais o limite só na primeira coluna (a >= x, ou a <= x
+    se decrescente). O OR sozinho não delimita o índice e o banco o percorre
+    desde o começo; com o limite a busca começa no cursor.
+    """
+    campos = _campos(ordem)
+    termos = []
+    iguais = {}
+    for (nome, decrescente), valor in zip(campos, valores):
+        termos.append(Q(**iguais, **{f"{nome}__{'lt' if decrescente else 'gt'}": valor}))
+        iguais[nome] = valor
+    nome, decrescente = campos[0]
+    return Q(**{f"{nome}__{'lte' if decrescente else 'gte'}": valores[0]}) & reduce(operator.or_, termos)
+
+
+def contagem_aproximada(queryset):
+    """
+    (número, limitado): estimativa do planejador no PostgreSQL, sem contar
+    linha a linha; nos demais bancos, COUNT que para em LIMITE_CONTAGEM.
+    """
+    queryset = queryset.order_by()
+    if connection.vendor == 'postgresql':
+        sql, parametros = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', parametros)
+            plano = cursor.fetchone()[0]
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        return int(plano[0]['Plan']['Plan Rows']), False
+    numero = queryset[:LIMITE_CONTAGEM + 1].count()
+    return min(numero, LIMITE_CONTAGEM), numero > LIMITE_CONTAGEM
+
+
+class PaginaCursor:
+    """Uma página da listagem, com as URLs de navegação (preservando os outros parâmetros da query string)"""
+
+    def __init__(self, request, queryset, itens, prefixo, ordem, tem_anterior, tem_proxima):
+        self._request = request
+        self._queryset = queryset
+        self._prefixo = prefixo
+        self._ordem = ordem
+        self.itens = itens
+        self.tem_anterior = tem_anterior
+        self.tem_proxima = tem_proxima
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+    def __bool__(self):
+        return bool(self.itens)
+
+    @property
+    def tem_outras_paginas(self):
+        return self.tem_anterior or self.tem_proxima
+
+    def _url(self, parametro, objeto):
+        parametros = self._request.GET.copy()
+        for nome in (f'{self._prefixo}depois', f'{self._prefixo}antes', 'page'):
+            parametros.pop(nome, None)
+        parametros[f'{self._prefixo}{parametro}'] = codificar_cursor(objeto, self._ordem)
+        return f'?{parametros.urlencode()}'
+
+    @property
+    def url_anterior(self):
+        return self._url('antes', self.itens[0]) if self.tem_anterior else None
+
+    @property
+    def url_proxima(self):
+        return self._url('depois', self.itens[-1]) if self.tem_proxima else None
+
+    @cached_property
+    def _contagem(self):
+        return contagem_aproximada(self._queryset)
+
+    @property
+    def contagem_aproximada(self):
+        """Total aproximado da listagem (só é calculado se o template pedir)"""
+        return self._contagem[0]
+
+    @property
+    def contagem_limitada(self):
+        """True quando o total passa de contagem_aproximada (contagem interrompida no limite)"""
+        return self._contagem[1]
+
+
+def _unir(consultas):
+    if len(consultas) == 1:
+        return consultas[0]
+    # Ramos de UNION não aceitam ORDER BY próprio (nem o do Meta.ordering)
+    consultas = [consulta.order_by() for consulta in consultas]
+    return consultas[0].union(*consultas[1:], all=True)
+
+
+def _consulta(consultas, ordem, cursor):
+    """Linhas posteriores ao cursor em cada consulta, unidas e ordenadas"""
+    if cursor is not None:
+        consultas = [consulta.filter(_depois_de(ordem, cursor)) for consulta in consultas]
+    return _unir(consultas).order_by(*ordem)
+
+
+def _buscar(consultas, por_pagina, ordem, antes, depois):
+    if antes is not None:
+        # Página anterior: percorre na ordem inversa a partir do cursor e desvira
+        linhas = list(_consulta(consultas, _inverter(ordem), antes)[:por_pagina + 1])
+        return linhas[:por_pagina][::-1], len(linhas) > por_pagina, True
+
+    linhas = list(_consulta(consultas, ordem, depois)[:por_pagina + 1])
+    return linhas[:por_pagina], depois is not None, len(linhas) > por_pagina
+
+
+def paginar(request, queryset, por_pagina, prefixo='', ordem=ORDEM_FICHAS):
+    """
+    Página de `queryset` indicada por ?<prefixo>depois= ou ?<prefixo>antes=.
+
+    `prefixo` separa os parâmetros quando a mesma tela tem duas listagens.
+    Cursor ausente ou inválido leva à primeira página.
+    """
+    return _paginar(request, [queryset], por_pagina, prefixo, ordem)
+
+
+def paginar_uniao(request, consultas, por_pagina, ordem, prefixo=''):
+    """
+    Como paginar(), sobre o UNION ALL de `consultas`.
+
+    As consultas devem ser .values() com as mesmas colunas, na mesma ordem,
+    incluindo todas as de `ordem`; os itens da página são dicionários.
+    """
+    return _paginar(request, list(consultas), por_pagina, prefixo, ordem)
+
+
+def _paginar(request, consultas, por_pagina, prefixo, ordem):
+    modelo = consultas[0].model
+    antes = decodificar_cursor(request.GET.get(f'{prefixo}antes'), modelo, ordem)
+    depois = None if antes else decodificar_cursor(request.GET.get(f'{prefixo}depois'), modelo, ordem)
+
+    itens, tem_anterior, tem_proxima = _buscar(consultas, por_pagina, ordem, antes, depois)
+    if not itens and (antes is not None or depois is not None):
+        # Cursor além do fim (fichas excluídas nesse meio tempo): volta ao início
+        itens, tem_anterior, tem_proxima = _buscar(consultas, por_pagina, ordem, None, None)
+
+    return PaginaCursor(request, _unir(consultas), itens, prefixo, ordem, tem_anterior, tem_proxima)
+
+
+class PaginadorComTotal(Paginator):
+    """Paginator por número de página que recebe o total já conhecido (ex.: das facetas), sem COUNT(*)"""
+
+    def __init__(self, object_list, per_page, total, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._total = total
+
+    @cached_property
+    def count(self):
+        return self._total
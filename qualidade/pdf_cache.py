@@ -0,0 +1,112 @@
+# qualidade/pdf_cache.py
+"""
+Cache em disco dos PDFs gerados
+
+A chave é o hash de (tipo do relatório, filtros, versão dos dados). A versão
+vem do atualizada_em/atualizado_em das linhas envolvidas, então qualquer
+edição numa ficha ou item gera uma chave nova e as entradas antigas deixam de
+ser usadas (e saem pela evicção LRU). O mesmo hash vira o ETag da resposta.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def _diretorio():
+    diretorio = settings.PDF_CACHE_DIR
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def chave(tipo, filtros, versao):
+    """Hash estável dos parâmetros do relatório e da versão dos dados"""
+    conteudo = json.dumps({'tipo': tipo, 'filtros': filtros, 'versao': versao}, sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def _caminho(chave_pdf):
+    return os.path.join(_diretorio(), f'{chave_pdf}.pdf')
+
+
+def abrir(chave_pdf):
+    """Arquivo cacheado aberto para leitura, ou None; marca o acesso para o LRU"""
+    caminho = _caminho(chave_pdf)
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(caminho)
+    except FileNotFoundError:
+        pass  # removido pela evicção depois de aberto: o descritor continua válido
+    return arquivo
+
+
+def gravar(chave_pdf, desenhar):
+    """Desenha o PDF direto em disco (arquivo temporário + rename atômico) e devolve-o aberto"""
+    diretorio = _diretorio()
+    with tempfile.NamedTemporaryFile(dir=diretorio, suffix='.tmp', delete=False) as temporario:
+        try:
+            desenhar(temporario)
+        except Exception:
+            os.unlink(temporario.name)
+            raise
+    caminho = _caminho(chave_pdf)
+    os.replace(temporario.name, caminho)
+    arquivo = open(caminho, 'rb')
+    evictar()
+    return arquivo
+
+
+def evictar(limite=None):
+    """Remove os PDFs acessados há mais tempo até o cache caber no limite de bytes"""
+    limite = settings.PDF_CACHE_MAX_BYTES if limite is None else limite
+    entradas = []
+    total = 0
+    with os.scandir(_diretorio()) as arquivos:
+        for entrada in arquivos:
+            if not entrada.name.endswith('.pdf'):
+                continue
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, entrada.path))
+            total += info.st_size
+
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite:
+            break
+        try:
+            os.unlink(caminho)
+        except FileNotFoundError:
+            pass
+        total -= tamanho
+
+
+def resposta_pdf(request, tipo, filtros, versao, ultima_modificacao, nome_arquivo, desenhar):
+    """
+    Resposta do PDF com ETag/Last-Modified: 304 se o navegador já tem esta
+    versão, o arquivo do cache se existir, ou `desenhar(saida)` uma única vez.
+    """
+    chave_pdf = chave(tipo, filtros, versao)
+    etag = f'"{chave_pdf}"'
+    ultima_modificacao = int(ultima_modificacao.timestamp()) if ultima_modificacao else None
+
+    nao_modificado = get_conditional_response(request, etag=etag, last_modified=ultima_modificacao)
+    if nao_modificado is not None:
+        return nao_modificado
+
+    arquivo = abrir(chave_pdf) or gravar(chave_pdf, desenhar)
+    response = FileResponse(arquivo, as_attachment=True, filename=nome_arquivo, content_type='application/pdf')
+    response['ETag'] = etag
+    if ultima_modificacao:
+        response['Last-Modified'] = http_date(ultima_modificacao)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,284 @@
+# qualidade/pdfs.py
+"""
+Geração dos PDFs de relatório (ReportLab)
+
+O desenho fica separado das views para ser usado tanto na resposta HTTP
+quanto pelo worker de relatórios em segundo plano.
+"""
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+
+from . import agregacoes, facetas
+from .models import ParteCalcado
+
+
+def desenhar_relatorio_ficha(saida, ficha):
+    """Escreve em `saida` o PDF de uma ficha de produção"""
+    p = canvas.Canvas(saida, pagesize=A4)
+    width, height = A4
+    
+    # Título
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, height - 50, f"Relatório - {ficha.nome_ficha}")
+    
+    p.setFont("Helvetica", 12)
+    p.drawString(50, height - 70, f"Data: {ficha.data.strftime('%d/%m/%Y')}")
+    p.drawString(50, height - 90, f"Operador: {ficha.operador.get_full_name() or ficha.operador.username}")
+    
+    # Tabela
+    y = height - 130
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Parte")
+    p.drawString(200, y, "Quantidades")
+    p.drawString(450, y, "Total")
+    
+    y -= 20
+    p.setFont("Helvetica", 10)
+    
+    for registro in ficha.registros.select_related('parte').prefetch_related('lancamentos'):
+        if y < 50:  # Nova página se necessário
+            p.showPage()
+            y = height - 50
+        
+        p.drawString(50, y, registro.parte.nome)
+        quantidades_str = ', '.join(map(str, registro.quantidades_lancadas))
+        p.drawString(200, y, quantidades_str[:40])  # Limitar tamanho
+        p.drawString(450, y, str(registro.total))
+        y -= 20
+    
+    # Total geral
+    y -= 10
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, f"TOTAL GERAL: {ficha.total_geral}")
+    
+    p.save()
+
+
+def desenhar_relatorio_ficha_inventario(saida, ficha):
+    """Escreve em `saida` o PDF de uma ficha de inventário"""
+    itens = ficha.itens.select_related("modelo", "cor", "tamanho")
+
+    # Totais das facetas (os mesmos das telas, em cache pela versão da ficha); os itens são lidos uma vez, em lotes
+    totais = facetas.calcular(ficha)
+
+    total_pd = totais["total_pd"]
+    total_pe = totais["total_pe"]
+    total_pares = totais["total_pares"]
+
+    p = canvas.Canvas(saida, pagesize=A4)
+    width, height = A4
+
+    # Cabeçalho
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, height - 50, "Relatório de Ficha de Inventário")
+
+    p.setFont("Helvetica", 11)
+    p.drawString(50, height - 75, f"Ficha nº: {ficha.id}")
+    p.drawString(50, height - 95, f"Data da ficha: {ficha.data.strftime('%d/%m/%Y')}")
+    p.drawString(
+        50,
+        height - 115,
+        f"Operador: {ficha.operador.get_full_name() or ficha.operador.username}"
+    )
+    p.drawString(50,height - 135,f"Nome na ficha: {ficha.nome_ficha}")  # ou ficha.nome_ficha
+    # Totais gerais
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, height - 170, f"Total Pé Direito: {total_pd}")
+    p.drawString(250, height - 170, f"Total Pé Esquerdo: {total_pe}")
+    p.drawString(450, height - 170, f"Total Pares: {total_pares}")
+
+
+    # Cabeçalho da tabela
+    y = height - 205
+    p.setFont("Helvetica-Bold", 11)
+    p.drawString(50, y, "Modelo")
+    p.drawString(180, y, "Cor")
+    p.drawString(280, y, "Tam.")
+    p.drawString(340, y, "PD")
+    p.drawString(390, y, "PE")
+    p.drawString(440, y, "Total")
+
+    y -= 20
+    p.setFont("Helvetica", 10)
+
+    # Itens
+    for item in itens.iterator(chunk_size=500):
+        if y < 50:
+            p.showPage()
+            y = height - 50
+            p.setFont("Helvetica", 10)
+
+        total_item = item.quantidade_pe_direito + item.quantidade_pe_esquerdo
+
+        p.drawString(50, y, item.modelo.nome[:20])
+        p.drawString(180, y, item.cor.nome[:15])
+        p.drawString(280, y, str(item.tamanho.numero))
+        p.drawString(340, y, str(item.quantidade_pe_direito))
+        p.drawString(390, y, str(item.quantidade_pe_esquerdo))
+        p.drawString(440, y, str(total_item))
+
+        y -= 18
+
+    p.save()
+
+
+def nome_arquivo_periodo(data_inicio, data_fim, operador_id=None, nome_ficha=None):
+    """Nome do arquivo do relatório de período"""
+    nome_arquivo = f'relatorio_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}'
+    if operador_id:
+        nome_arquivo += f'_op{operador_id}'
+    if nome_ficha:
+        nome_ficha_limpo = nome_ficha.replace(' ', '_')[:15]
+        nome_arquivo += f'_{nome_ficha_limpo}'
+    return nome_arquivo + '.pdf'
+
+
+def desenhar_relatorio_periodo(saida, data_inicio, data_fim, usuario_nome, parte_id=None, operador_id=None, nome_ficha=None):
+    """Escreve em `saida` o PDF de produção por período (mesma estrutura da view relatorios)"""
+    dados_por_operador, total_geral = agregacoes.dados_por_operador(
+        data_inicio,
+        data_fim,
+        operador_id=operador_id,
+        nome_ficha=nome_ficha,
+        parte_id=parte_id,
+    )
+
+    p = canvas.Canvas(saida, pagesize=landscape(A4))
+    width, height = landscape(A4)
+    
+    # Cabeçalho
+    p.setFont("Helvetica-Bold", 18)
+    p.drawString(50, height - 50, "Relatório de Produção por Período")
+    
+    p.setFont("Helvetica", 11)
+    periodo_texto = f"Período: {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
+    p.drawString(50, height - 75, periodo_texto)
+    
+    # Filtros aplicados
+    y = height - 95
+    p.setFont("Helvetica", 9)
+    
+    if operador_id:
+        operador = User.objects.filter(id=operador_id).first()
+        if operador:
+            p.drawString(50, y, f"Filtro: Operador {operador.get_full_name() or operador.username}")
+            y -= 12
+    
+    if parte_id:
+        parte = ParteCalcado.objects.filter(id=parte_id).first()
+        if parte:
+            p.drawString(50, y, f"Filtro: Parte {parte.nome}")
+            y -= 12
+    
+    if nome_ficha:
+        p.drawString(50, y, f"Filtro: Ficha {nome_ficha}")
+        y -= 12
+    
+    p.line(50, y, width - 50, y)
+    y -= 25
+    
+    # === DADOS POR OPERADOR ===
+    for operador_nome, dados in sorted(dados_por_operador.items()):
+        # Verificar espaço
+        if y < 200:
+            p.showPage()
+            y = height - 50
+        
+        # Nome do Operador
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(50, y, f"👤 {operador_nome}")
+        y -= 25
+        
+        # === FICHAS DO OPERADOR ===
+        for nome_ficha_key, partes_ficha in sorted(dados['fichas'].items()):
+            if y < 100:
+                p.showPage()
+                y = height - 50
+            
+            # Nome da Ficha
+            p.setFont("Helvetica-Bold", 11)
+            p.drawString(70, y, f"📋 Nome: {nome_ficha_key}")
+            y -= 18
+            
+            # Cabeçalho da tabela de partes
+            p.setFont("Helvetica-Bold", 9)
+            p.drawString(90, y, "Peças")
+            p.drawRightString(width - 100, y, "Quantidade de Pares")
+            y -= 2
+            p.line(90, y, width - 100, y)
+            y -= 12
+            
+            # Partes da ficha
+            p.setFont("Helvetica", 9)
+            for parte_nome, quantidade in sorted(partes_ficha.items()):
+                if y < 50:
+                    p.showPage()
+                    y = height - 50
+                
+                p.drawString(90, y, parte_nome)
+                p.drawRightString(width - 100, y, str(quantidade))
+                y -= 14
+            
+            y -= 8  # Espaço entre fichas
+        
+        # === TOTAIS DO OPERADOR (por parte) ===
+        if dados['totais_partes']:
+            if y < 120:
+                p.showPage()
+                y = height - 50
+            
+            y -= 10
+            p.line(70, y, width - 100, y)
+            y -= 15
+            
+            p.setFont("Helvetica-Bold", 11)
+            p.drawString(70, y, "Totais do Perfil:")
+            y -= 18
+            
+            # Cabeçalho
+            p.setFont("Helvetica-Bold", 9)
+            p.drawString(90, y, "Parte")
+            p.drawRightString(width - 100, y, "Total")
+            y -= 2
+            p.line(90, y, width - 100, y)
+            y -= 12
+            
+            # Totais por parte
+            p.setFont("Helvetica", 9)
+            for parte_nome, total_parte in sorted(dados['totais_partes'].items()):
+                if y < 50:
+                    p.showPage()
+                    y = height - 50
+                
+                p.drawString(90, y, parte_nome)
+                p.drawRightString(width - 100, y, str(total_parte))
+                y -= 14
+        
+        y -= 20  # Espaço entre operadores
+    
+    # === TOTAL GERAL ===
+    if y < 80:
+        p.showPage()
+        y = height - 50
+    
+    y -= 10
+    p.line(50, y, width - 50, y)
+    y -= 30
+    
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, y, "TOTAL GERAL:")
+    p.drawRightString(width - 100, y, str(total_geral))
+    
+    y -= 10
+    p.setFont("Helvetica", 10)
+    p.drawCentredString(width / 2, y, "peças produzidas no período")
+    
+    # Rodapé
+    p.setFont("Helvetica", 8)
+    p.drawString(50, 30, f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}")
+    p.drawRightString(width - 50, 30, f"Usuário: {usuario_nome}")
+    
+    p.save()
@@ -1,4 +1,5 @@
-from django.db.models.signals import post_migrate
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import Group, User
 from django.contrib.auth.hashers import make_password
@@ -50,4 +51,254 @@ def criar_dados_iniciais(sender, **kwargs):
         # 🔹 Perfil (com verificação)
         PerfilUsuario.objects.get_or_create(user=user)
     
-    print("Dados padrões verificados/criados com sucesso!")
\ No newline at end of file
+    print("Dados padrões verificados/criados com sucesso!")
+
+@receiver(post_migrate)
+def preencher_totais_registros(sender, **kwargs):
+    """Backfill de total/contagem dos registros antigos e do total_geral das fichas"""
+    if sender.name != 'qualidade':
+        return
+
+    from django.db.models import OuterRef, Subquery, Sum, Value
+    from django.db.models.functions import Coalesce
+
+    try:
+        RegistroParte = apps.get_model('qualidade', 'RegistroParte')
+        Ficha = apps.get_model('qualidade', 'Ficha')
+    except LookupError:
+        return
+
+    # Registros gravados antes das colunas existirem ficaram com contagem=0
+    pendentes = (
+        RegistroParte.objects.filter(contagem=0)
+        .exclude(quantidades=[])
+        .only('id', 'ficha_id', 'quantidades')
+    )
+
+    atualizados = []
+    fichas_ids = set()
+    for registro in pendentes.iterator(chunk_size=500):
+        registro.total = sum(registro.quantidades or [])
+        registro.contagem = len(registro.quantidades or [])
+        atualizados.append(registro)
+        fichas_ids.add(registro.ficha_id)
+
+    if not atualizados:
+        return
+
+    RegistroParte.objects.bulk_update(atualizados, ['total', 'contagem'], batch_size=500)
+
+    soma = (
+        RegistroParte.objects.filter(ficha=OuterRef('pk'))
+        .values('ficha')
+        .annotate(soma=Sum('total'))
+        .values('soma')
+    )
+    Ficha.objects.filter(pk__in=fichas_ids).update(
+        total_geral=Coalesce(Subquery(soma), Value(0))
+    )
+    print(f"Totais preenchidos em {len(atualizados)} registros de partes.")
+
+
+@receiver(post_migrate)
+def preencher_producao_diaria(sender, **kwargs):
+    """Gera o rollup diário na primeira migração após sua criação"""
+    if sender.name != 'qualidade':
+        return
+
+    try:
+        ProducaoDiaria = apps.get_model('qualidade', 'ProducaoDiaria')
+        RegistroParte = apps.get_model('qualidade', 'RegistroParte')
+    except LookupError:
+        return
+
+    if ProducaoDiaria.objects.exists() or not RegistroParte.objects.exists():
+        return
+
+    linhas = ProducaoDiaria.reconstruir()
+    print(f"Rollup de produção diária gerado: {linhas} linhas.")
+
+
+@receiver(post_migrate)
+def preencher_excluido_em(sender, **kwargs):
+    """Fichas que foram para a lixeira sem data de exclusão (a lixeira ordena por ela)"""
+    if sender.name != 'qualidade':
+        return
+
+    from django.db.models import F
+
+    for nome_modelo in ('Ficha', 'FichaInventario'):
+        try:
+            modelo = apps.get_model('qualidade', nome_modelo)
+        except LookupError:
+            continue
+        modelo.objects.filter(excluido=True, excluido_em__isnull=True).update(excluido_em=F('atualizada_em'))
+
+
+@receiver(post_migrate)
+def preencher_lancamentos(sender, **kwargs):
+    """Cria os lançamentos dos registros gravados só com a lista JSON de quantidades"""
+    if sender.name != 'qualidade':
+        return
+
+    try:
+        LancamentoQuantidade = apps.get_model('qualidade', 'LancamentoQuantidade')
+        RegistroParte = apps.get_model('qualidade', 'RegistroParte')
+    except LookupError:
+        return
+
+    # Depois de preencher_totais_registros: contagem > 0 sem lançamentos = registro antigo
+    pendentes = (
+        RegistroParte.objects.filter(contagem__gt=0, lancamentos__isnull=True)
+        .exclude(quantidades=[])
+        .select_related('ficha')
+        .only('id', 'quantidades', 'ficha__criada_em')
+    )
+
+    registros_ids = []
+    lancamentos = []
+    for registro in pendentes.iterator(chunk_size=500):
+        registros_ids.append(registro.id)
+        # O horário de cada lançamento antigo não foi guardado: usa a criação da ficha
+        lancamentos.extend(
+            LancamentoQuantidade(registro_id=registro.id, quantidade=quantidade, criado_em=registro.ficha.criada_em)
+            for quantidade in registro.quantidades
+        )
+    if not lancamentos:
+        return
+
+    with transaction.atomic():
+        LancamentoQuantidade.objects.bulk_create(lancamentos, batch_size=1000)
+        # A lista antiga não é mais lida: os lançamentos passam a ser a fonte
+        RegistroParte.objects.filter(id__in=registros_ids).update(quantidades=[])
+    print(f"Lançamentos criados a partir das listas antigas: {len(lancamentos)}.")
+
+
+@receiver(post_save, sender='qualidade.ModeloCalcado')
+@receiver(post_delete, sender='qualidade.ModeloCalcado')
+@receiver(post_save, sender='qualidade.Cor')
+@receiver(post_delete, sender='qualidade.Cor')
+@receiver(post_save, sender='qualidade.TamanhoModelo')
+@receiver(post_delete, sender='qualidade.TamanhoModelo')
+@receiver(m2m_changed, sender='qualidade.ModeloCalcado_cores')
+def invalidar_catalogo(sender, **kwargs):
+    """Catálogo do inventário (qualidade/catalogo.py)"""
+    from .cache import invalidar_apos_commit
+
+    invalidar_apos_commit('catalogo')
+
+
+@receiver(post_save, sender='qualidade.ParteCalcado')
+@receiver(post_delete, sender='qualidade.ParteCalcado')
+@receiver(post_save, sender='qualidade.PerfilUsuario')
+@receiver(post_delete, sender='qualidade.PerfilUsuario')
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_filtros_relatorio(sender, update_fields=None, **kwargs):
+    """Listas de partes e operadores dos filtros de relatórios"""
+    from .cache import invalidar_apos_commit
+
+    # O login grava só last_login: não muda nada que apareça nos filtros
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidar_apos_commit('filtros_relatorio')
+
+
+@receiver(post_save, sender='qualidade.PerfilUsuario')
+@receiver(post_delete, sender='qualidade.PerfilUsuario')
+def invalidar_contexto_do_perfil(sender, instance, **kwargs):
+    """Perfil (tipo) guardado na sessão do usuário (QUALIDADE_CTX_TTL)"""
+    _invalidar_contextos([instance.user_id])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_contexto_dos_grupos(sender, instance, action, reverse, pk_set, **kwargs):
+    """Grupos guardados na sessão: user.groups.add(...) ou group.user_set.add(...)"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _invalidar_contextos([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        _invalidar_contextos(pk_set)
+    elif action == 'pre_clear':
+        # Depois do clear não há mais como saber quem estava no grupo
+        _invalidar_contextos(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidar_contexto_do_grupo_excluido(sender, instance, **kwargs):
+    # A exclusão do grupo apaga as ligações sem disparar m2m_changed
+    _invalidar_contextos(instance.user_set.values_list('pk', flat=True))
+
+
+def _invalidar_contextos(usuarios_ids):
+    from .cache import invalidar_apos_commit
+    from .middleware import namespace_contexto
+
+    invalidar_apos_commit(*[namespace_contexto(usuario_id) for usuario_id in usuarios_ids])
+
+
+@receiver(pre_delete, sender='qualidade.Ficha')
+def retirar_ficha_do_rollup(sender, instance, **kwargs):
+    """
+    Exclusão definitiva de ficha ativa (admin, queryset.delete()): os registros
+    saem em cascata pelo collector, sem passar por RegistroParte.delete(),
+    então a produção é retirada do rollup aqui, antes de os registros sumirem.
+    """
+    if instance.excluido:
+        return
+    from .models import ProducaoDiaria
+
+    ProducaoDiaria.aplicar_fichas([instance.pk], -1)
+
+
+@receiver(pre_delete, sender='qualidade.ParteCalcado')
+def retirar_parte_das_fichas(sender, instance, **kwargs):
+    """
+    Exclusão definitiva de parte (lixeira de partes): os registros dela saem
+    em cascata sem passar por RegistroParte.delete(), então o total de cada
+    ficha é descontado aqui, num único UPDATE. atualizada_em avança junto
+    (versão da ficha nos caches de PDF); o rollup da parte sai em cascata.
+    """
+    from django.db.models import F, OuterRef, Subquery
+    from django.utils import timezone
+
+    from .cache import invalidar_apos_commit
+    from .models import Ficha, RegistroParte
+
+    total_da_parte = RegistroParte.objects.filter(ficha=OuterRef('pk'), parte=instance).values('total')[:1]
+    alteradas = Ficha.objects.filter(registros__parte=instance).update(
+        total_geral=F('total_geral') - Subquery(total_da_parte),
+        atualizada_em=timezone.now(),
+    )
+    if alteradas:
+        invalidar_apos_commit('telao')
+
+
+# Campo de ItemInventario que aponta para cada modelo do catálogo
+_CAMPOS_ITEM_INVENTARIO = {'ModeloCalcado': 'modelo', 'Cor': 'cor', 'TamanhoModelo': 'tamanho'}
+
+
+@receiver(pre_delete, sender='qualidade.ModeloCalcado')
+@receiver(pre_delete, sender='qualidade.Cor')
+@receiver(pre_delete, sender='qualidade.TamanhoModelo')
+def tocar_fichas_inventario_do_catalogo(sender, instance, **kwargs):
+    """
+    Exclusão definitiva de item do catálogo: os ItemInventario saem em cascata
+    sem passar por ItemInventario.delete(), então a versão das fichas afetadas
+    (facetas e PDF do inventário) avança aqui, como em _tocar_ficha.
+    """
+    from django.utils import timezone
+
+    from .models import FichaInventario
+
+    campo = _CAMPOS_ITEM_INVENTARIO[sender.__name__]
+    FichaInventario.objects.filter(**{f'itens__{campo}': instance}).update(atualizada_em=timezone.now())
+
+
+@receiver(post_save, sender='qualidade.Ficha')
+@receiver(post_delete, sender='qualidade.Ficha')
+def invalidar_fichas(sender, **kwargs):
+    """Nomes de fichas dos filtros de relatórios e os cards do telão"""
+    from .cache import invalidar_apos_commit
+
+    invalidar_apos_commit('filtros_relatorio', 'telao')
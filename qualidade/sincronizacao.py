@@ -0,0 +1,243 @@
+# qualidade/sincronizacao.py
+"""
+Sincronização da fila offline (outbox) das telas de edição
+
+O navegador guarda cada operação no IndexedDB com uma chave gerada no cliente
+e envia a fila em lotes quando a conexão volta. Cada chave é registrada em
+OperacaoSincronizada na mesma transação da operação: reenvios do mesmo lote
+(rede caiu antes da resposta, duas abas, service worker) não duplicam nada.
+"""
+from datetime import timedelta
+
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import (
+    Cor, Ficha, FichaInventario, ItemInventario, ModeloCalcado, OperacaoSincronizada,
+    ParteCalcado, RegistroParte, TamanhoModelo,
+)
+from .grade import GradeInvalida, lancar_inventario
+
+# Uma operação pode ficar dias no aparelho sem rede; depois disso a chave é esquecida
+RETENCAO_OPERACOES = timedelta(days=30)
+# Operações aceitas por requisição
+LIMITE_LOTE = 200
+
+
+class ErroOperacao(Exception):
+    """Operação inválida: é descartada pelo cliente, reenviar não adianta"""
+
+
+class _Contexto:
+    """Fichas já carregadas no lote, para não buscar a mesma ficha a cada operação"""
+
+    def __init__(self, usuario, tipo_perfil=None):
+        self.usuario = usuario
+        self.tipo_perfil = tipo_perfil or usuario.perfil.tipo
+        self._fichas = {}
+        self._fichas_inventario = {}
+
+    def ficha(self, ficha_id):
+        if ficha_id not in self._fichas:
+            ficha = Ficha.objects.select_related('operador').filter(id=ficha_id).first()
+            if ficha is None:
+                raise ErroOperacao('Ficha não encontrada')
+            if self.tipo_perfil == 'operador' and ficha.operador_id != self.usuario.id:
+                raise ErroOperacao('Sem permissão')
+            self._fichas[ficha_id] = ficha
+        return self._fichas[ficha_id]
+
+    def ficha_inventario(self, ficha_id):
+        if self.tipo_perfil != 'operador':
+            raise ErroOperacao('Sem permissão')
+        if ficha_id not in self._fichas_inventario:
+            ficha = FichaInventario.objects.filter(id=ficha_id).first()
+            if ficha is None:
+                raise ErroOperacao('Ficha não encontrada')
+            self._fichas_inventario[ficha_id] = ficha
+        return self._fichas_inventario[ficha_id]
+
+
+def _inteiro(operacao, campo, minimo=None):
+    try:
+        valor = int(operacao[campo])
+    except (KeyError, TypeError, ValueError):
+        raise ErroOperacao(f'Campo "{campo}" inválido')
+    if minimo is not None and valor < minimo:
+        raise ErroOperacao(f'Campo "{campo}" deve ser no mínimo {minimo}')
+    return valor
+
+
+def _estado_registro(registro):
+    return {
+        'ficha_id': registro.ficha_id,
+        'parte_id': registro.parte_id,
+        'quantidades': registro.quantidades_lancadas,
+        'total': registro.total,
+    }
+
+
+def _registro(contexto, operacao):
+    ficha = contexto.ficha(_inteiro(operacao, 'ficha_id'))
+    registro = RegistroParte.objects.select_related('parte').filter(
+        ficha=ficha, parte_id=_inteiro(operacao, 'parte_id')
+    ).first()
+    if registro is None:
+        raise ErroOperacao('Parte não encontrada nesta ficha')
+    registro.ficha = ficha
+    return registro
+
+
+def adicionar_quantidade(contexto, operacao):
+    quantidade = _inteiro(operacao, 'quantidade', minimo=1)
+    ficha = contexto.ficha(_inteiro(operacao, 'ficha_id'))
+    parte_id = _inteiro(operacao, 'parte_id')
+
+    registro = RegistroParte.objects.select_related('parte').filter(ficha=ficha, parte_id=parte_id).first()
+    if registro is None:
+        parte = ParteCalcado.objects.filter(id=parte_id).first()
+        if parte is None:
+            raise ErroOperacao('Parte não encontrada')
+        registro, created = RegistroParte.objects.get_or_create(ficha=ficha, parte=parte)
+    registro.ficha = ficha
+
+    registro.adicionar_quantidade(quantidade, contexto.usuario)
+    return _estado_registro(registro)
+
+
+def remover_quantidade(contexto, operacao):
+    registro = _registro(contexto, operacao)
+    registro.remover_ultima_quantidade()
+    return _estado_registro(registro)
+
+
+def adicionar_parte(contexto, operacao):
+    ficha = contexto.ficha(_inteiro(operacao, 'ficha_id'))
+    parte = ParteCalcado.objects.filter(id=_inteiro(operacao, 'parte_id'), ativo=True, excluido=False).first()
+    if parte is None:
+        raise ErroOperacao('Parte não encontrada')
+
+    registro, created = RegistroParte.objects.get_or_create(ficha=ficha, parte=parte)
+    if not created:
+        raise ErroOperacao('Esta parte já foi adicionada')
+    return {'ficha_id': ficha.id, 'parte_id': parte.id, 'parte_nome': parte.nome}
+
+
+def remover_parte(contexto, operacao):
+    registro = _registro(contexto, operacao)
+    registro.delete()
+    return {'ficha_id': registro.ficha_id, 'parte_id': registro.parte_id, 'parte_nome': registro.parte.nome}
+
+
+def item_inventario(contexto, operacao):
+    """Cria o item ou grava as quantidades informadas (upsert); `apenas_criar` recusa item existente"""
+    ficha = contexto.ficha_inventario(_inteiro(operacao, 'ficha_id'))
+    pe_direito = _inteiro(operacao, 'quantidade_pe_direito', minimo=0)
+    pe_esquerdo = _inteiro(operacao, 'quantidade_pe_esquerdo', minimo=0)
+
+    modelo = ModeloCalcado.objects.filter(id=_inteiro(operacao, 'modelo_id')).first()
+    cor = Cor.objects.filter(id=_inteiro(operacao, 'cor_id')).first()
+    tamanho = TamanhoModelo.objects.filter(id=_inteiro(operacao, 'tamanho_id')).first()
+    if modelo is None or cor is None or tamanho is None:
+        raise ErroOperacao('Modelo, cor ou tamanho não encontrado')
+
+    item, criado = ItemInventario.objects.get_or_create(
+        ficha=ficha,
+        modelo=modelo,
+        cor=cor,
+        tamanho=tamanho,
+        defaults={'quantidade_pe_direito': pe_direito, 'quantidade_pe_esquerdo': pe_esquerdo},
+    )
+    if not criado:
+        if operacao.get('apenas_criar'):
+            raise ErroOperacao('Este item já existe na ficha! Escolha outro modelo/cor/tamanho.')
+        item.quantidade_pe_direito = pe_direito
+        item.quantidade_pe_esquerdo = pe_esquerdo
+        item.save()
+
+    return {
+        'ficha_id': ficha.id,
+        'item_id': item.id,
+        'criado': criado,
+        'quantidade_pe_direito': item.quantidade_pe_direito,
+        'quantidade_pe_esquerdo': item.quantidade_pe_esquerdo,
+    }
+
+
+def grade_inventario(contexto, operacao):
+    """Todos os números de um (modelo, cor) de uma vez (ver grade.lancar_inventario)"""
+    ficha = contexto.ficha_inventario(_inteiro(operacao, 'ficha_id'))
+    linhas = operacao.get('linhas')
+    if not isinstance(linhas, list):
+        raise ErroOperacao('Campo "linhas" inválido')
+    try:
+        resumo = lancar_inventario(ficha, _inteiro(operacao, 'modelo_id'), _inteiro(operacao, 'cor_id'), linhas)
+    except GradeInvalida as e:
+        raise ErroOperacao(str(e))
+    return {'ficha_id': ficha.id, **resumo}
+
+
+OPERACOES = {
+    'adicionar_quantidade': adicionar_quantidade,
+    'remover_quantidade': remover_quantidade,
+    'adicionar_parte': adicionar_parte,
+    'remover_parte': remover_parte,
+    'item_inventario': item_inventario,
+    'grade_inventario': grade_inventario,
+}
+
+
+def _aplicar(contexto, operacao):
+    chave = str(operacao.get('chave') or '')[:64]
+    tipo = operacao.get('tipo')
+    if not chave:
+        return {'chave': chave, 'status': 'erro', 'erro': 'Operação sem chave'}
+    if tipo not in OPERACOES:
+        return {'chave': chave, 'status': 'erro', 'erro': 'Tipo de operação desconhecido'}
+
+    try:
+        with transaction.atomic():
+            # A chave é gravada antes: um reenvio concorrente esbarra na unique e não aplica de novo
+            try:
+                with transaction.atomic():
+                    registro = OperacaoSincronizada.objects.create(chave=chave, usuario=contexto.usuario, tipo=tipo)
+            except IntegrityError:
+                anterior = OperacaoSincronizada.objects.filter(chave=chave, usuario=contexto.usuario).first()
+                if anterior is None:
+                    return {'chave': chave, 'status': 'erro', 'erro': 'Chave já utilizada'}
+                return {'chave': chave, 'status': 'duplicada', 'resultado': anterior.resultado}
+
+            resultado = OPERACOES[tipo](contexto, operacao)
+            registro.resultado = resultado
+            registro.save(update_fields=['resultado'])
+    except ErroOperacao as e:
+        # A transação da operação é desfeita, inclusive a chave
+        return {'chave': chave, 'status': 'erro', 'erro': str(e)}
+    except ObjectDoesNotExist:
+        # Ex.: registro apagado por outra tela entre a leitura e o lançamento
+        return {'chave': chave, 'status': 'erro', 'erro': 'Registro não encontrado'}
+    except ValidationError as e:
+        return {'chave': chave, 'status': 'erro', 'erro': '; '.join(e.messages)}
+
+    return {'chave': chave, 'status': 'ok', 'resultado': resultado}
+
+
+def sincronizar(usuario, operacoes, tipo_perfil=None):
+    """
+    Aplica as operações na ordem recebida e devolve um resultado por operação.
+
+    Erros de validação e registros que sumiram ficam no resultado da própria
+    operação; qualquer outra exceção desfaz o lote inteiro, e o cliente
+    reenvia tudo depois.
+    `tipo_perfil` evita reler o perfil quando a view já o conhece.
+    """
+    contexto = _Contexto(usuario, tipo_perfil)
+    with transaction.atomic():
+        return [_aplicar(contexto, operacao) for operacao in operacoes]
+
+
+def limpar_operacoes():
+    """Esquece as chaves fora da retenção (comando limpar_sincronizacao / worker); devolve quantas"""
+    apagadas, _ = OperacaoSincronizada.objects.filter(criado_em__lt=timezone.now() - RETENCAO_OPERACOES).delete()
+    return apagadas
@@ -0,0 +1,144 @@
+# qualidade/telao.py
+"""
+Publicação de alterações de produção para o telão (atualização ao vivo)
+
+Cada alteração de quantidade grava um EventoTelao com o delta da ficha/parte
+na mesma transação que altera o rollup (RegistroParte._repassar_diferenca).
+A numeração vem de SequenciaTelao, cuja linha fica travada até o commit: os
+números seguem a ordem de commit, então uma tela que leu até N nunca perde
+um evento menor que N que ainda não tinha sido gravado.
+
+As telas não consultam o banco cada uma: o Quadro do processo busca os
+eventos novos de cada data no máximo uma vez por intervalo e todas as telas
+daquela data leem dele.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import EventoTelao, SequenciaTelao
+
+# Eventos mais antigos que isso não interessam a nenhuma tela aberta (ver limpar_eventos)
+RETENCAO_EVENTOS = timedelta(days=2)
+# Intervalo mínimo entre consultas do Quadro para a mesma data (por processo)
+TELAO_INTERVALO = getattr(settings, 'TELAO_INTERVALO', 0.5)
+# Eventos guardados por data no Quadro; uma tela mais atrasada que isso lê do banco
+EVENTOS_POR_DATA = 500
+# Datas sem nenhuma tela lendo há tanto tempo (segundos) saem do Quadro
+QUADRO_OCIOSO = 600
+
+
+def publicar_delta(ficha, parte, delta):
+    """Grava o delta de quantidade na transação atual, com o próximo número da sequência"""
+    if not delta:
+        return
+
+    payload = {
+        'ficha': ficha.nome_ficha,
+        'operador': ficha.operador.get_full_name() or ficha.operador.username,
+        'parte': parte.nome,
+        'delta': delta,
+    }
+    # Sem savepoint: chamado dentro da transação do lançamento (RegistroParte._repassar_diferenca)
+    with transaction.atomic(savepoint=False):
+        EventoTelao.objects.create(data=ficha.data, sequencia=_proxima_sequencia(), payload=payload)
+
+
+# UPDATE ... RETURNING (PostgreSQL e SQLite >= 3.35): o lock da linha vale até o commit
+_SQL_PROXIMA_SEQUENCIA = 'UPDATE {tabela} SET valor = valor + 1 WHERE id = 1 RETURNING valor'
+
+
+def _proxima_sequencia():
+    # Quem vier depois espera o commit no UPDATE: a numeração segue a ordem de commit
+    sql = _SQL_PROXIMA_SEQUENCIA.format(tabela=SequenciaTelao._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        linha = cursor.fetchone()
+        if linha is None:
+            SequenciaTelao.objects.get_or_create(pk=1)
+            cursor.execute(sql)
+            linha = cursor.fetchone()
+    return linha[0]
+
+
+def ultima_sequencia():
+    """Número do último evento publicado (ponto de partida de uma tela recém-carregada)"""
+    return SequenciaTelao.objects.filter(pk=1).values_list('valor', flat=True).first() or 0
+
+
+@contextmanager
+def retrato_consistente():
+    """
+    Transação em que a sequência e a agregação são lidas do mesmo retrato do
+    banco: nenhum delta fica contado na agregação e de novo nos eventos.
+    """
+    # No PostgreSQL cada instrução do READ COMMITTED vê um retrato diferente
+    repetivel = connection.vendor == 'postgresql' and not connection.in_atomic_block
+    with transaction.atomic():
+        if repetivel:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def buscar_eventos(data, desde, limite=200):
+    """Eventos da data informada posteriores ao número `desde`, direto do banco"""
+    eventos = (
+        EventoTelao.objects
+        .filter(data=data, sequencia__gt=desde)
+        .order_by('sequencia')
+        .values('sequencia', 'payload')[:limite]
+    )
+    return [dict(evento['payload'], id=evento['sequencia']) for evento in eventos]
+
+
+class Quadro:
+    """
+    Eventos recentes de cada data, compartilhados pelas telas do processo.
+
+    `inicio` é o número a partir do qual o quadro tem todos os eventos da
+    data; pedidos anteriores a ele vão ao banco.
+    """
+
+    def __init__(self, intervalo=TELAO_INTERVALO, capacidade=EVENTOS_POR_DATA):
+        self.intervalo = intervalo
+        self.capacidade = capacidade
+        self._trava = threading.Lock()
+        self._datas = {}
+
+    def eventos(self, data, desde):
+        with self._trava:
+            agora = time.monotonic()
+            for outra in [outra for outra, estado in self._datas.items() if agora - estado['lido_em'] > QUADRO_OCIOSO]:
+                del self._datas[outra]
+            estado = self._datas.get(data)
+            if estado is None or desde < estado['inicio']:
+                # Primeira tela da data (ou tela atrasada): o quadro passa a começar nela
+                estado = self._datas[data] = {'inicio': desde, 'eventos': deque(), 'buscado_em': None}
+            estado['lido_em'] = agora
+            if estado['buscado_em'] is None or agora - estado['buscado_em'] >= self.intervalo:
+                ultimo = estado['eventos'][-1]['id'] if estado['eventos'] else estado['inicio']
+                estado['eventos'].extend(buscar_eventos(data, ultimo, limite=self.capacidade))
+                while len(estado['eventos']) > self.capacidade:
+                    estado['inicio'] = estado['eventos'].popleft()['id']
+                estado['buscado_em'] = agora
+            return [evento for evento in estado['eventos'] if evento['id'] > desde]
+
+    def limpar(self):
+        with self._trava:
+            self._datas.clear()
+
+
+quadro = Quadro()
+
+
+def limpar_eventos():
+    """Apaga os eventos fora da retenção (comando limpar_telao / worker); devolve quantos"""
+    apagados, _ = EventoTelao.objects.filter(criado_em__lt=timezone.now() - RETENCAO_EVENTOS).delete()
+    return apagados
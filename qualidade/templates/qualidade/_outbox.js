@@ -0,0 +1,137 @@
+// Fila offline (outbox): as operações ficam no IndexedDB até o servidor confirmar.
+// Usada pelas telas de edição e pelo service worker (/sw.js).
+const Outbox = (() => {
+    const BANCO = 'qualidade-outbox';
+    const OPERACOES = 'operacoes';
+    const META = 'meta';
+    const URL_SINCRONIZAR = '{% url "sincronizar_operacoes" %}';
+    const LIMITE_LOTE = 200;
+    const INTERVALO_TENTATIVAS_MS = 30000;
+
+    const ouvintes = [];
+    let envio = null;
+
+    function abrir() {
+        return new Promise((resolve, reject) => {
+            const pedido = indexedDB.open(BANCO, 1);
+            pedido.onupgradeneeded = () => {
+                pedido.result.createObjectStore(OPERACOES, { keyPath: 'seq', autoIncrement: true });
+                pedido.result.createObjectStore(META);
+            };
+            pedido.onsuccess = () => resolve(pedido.result);
+            pedido.onerror = () => reject(pedido.error);
+        });
+    }
+
+    async function executar(loja, modo, acao) {
+        const banco = await abrir();
+        return new Promise((resolve, reject) => {
+            const transacao = banco.transaction(loja, modo);
+            const pedido = acao(transacao.objectStore(loja));
+            transacao.oncomplete = () => {
+                banco.close();
+                resolve(pedido ? pedido.result : undefined);
+            };
+            transacao.onerror = () => {
+                banco.close();
+                reject(transacao.error);
+            };
+        });
+    }
+
+    // crypto.randomUUID só existe em contexto seguro (HTTPS); getRandomValues existe sempre
+    function novaChave() {
+        const bytes = crypto.getRandomValues(new Uint8Array(16));
+        return Array.from(bytes, byte => byte.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function enfileirar(operacao, csrfToken) {
+        operacao.chave = operacao.chave || novaChave();
+        await executar(OPERACOES, 'readwrite', loja => loja.add(operacao));
+        if (csrfToken) {
+            // O service worker não lê cookies: o token fica guardado junto da fila
+            await executar(META, 'readwrite', loja => loja.put(csrfToken, 'csrf'));
+        }
+        return operacao;
+    }
+
+    function pendentes() {
+        return executar(OPERACOES, 'readonly', loja => loja.getAll());
+    }
+
+    function enviar() {
+        if (!envio) {
+            envio = enviarTudo()
+                .catch(erro => {
+                    // Sem rede: o navegador chama o service worker quando a conexão voltar
+                    agendarSincronizacaoEmSegundoPlano();
+                    throw erro;
+                })
+                .finally(() => { envio = null; });
+        }
+        return envio;
+    }
+
+    async function enviarTudo() {
+        const todos = [];
+        while (true) {
+            const lote = await executar(OPERACOES, 'readonly', loja => loja.getAll(null, LIMITE_LOTE));
+            if (lote.length === 0) {
+                return todos;
+            }
+            const csrfToken = await executar(META, 'readonly', loja => loja.get('csrf'));
+
+            const response = await fetch(URL_SINCRONIZAR, {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': csrfToken || ''
+                },
+                body: JSON.stringify({ operacoes: lote.map(({ seq, ...operacao }) => operacao) })
+            });
+            if (!response.ok) {
+                // Lote desfeito no servidor (ou sessão expirada): tudo continua na fila
+                throw new Error(`Sincronização falhou (${response.status})`);
+            }
+            const data = await response.json();
+
+            // ok, duplicada e erro são definitivos: saem da fila
+            await executar(OPERACOES, 'readwrite', loja => { lote.forEach(operacao => loja.delete(operacao.seq)); });
+            data.resultados.forEach((resultado, i) => { resultado.operacao = lote[i]; });
+            ouvintes.forEach(ouvinte => ouvinte(data.resultados));
+            todos.push(...data.resultados);
+        }
+    }
+
+    function aoSincronizar(ouvinte) {
+        ouvintes.push(ouvinte);
+    }
+
+    function agendarSincronizacaoEmSegundoPlano() {
+        if (typeof window === 'undefined' || !('serviceWorker' in navigator)) {
+            return;
+        }
+        navigator.serviceWorker.ready
+            .then(registro => registro.sync && registro.sync.register('outbox'))
+            .catch(() => {});
+    }
+
+    // Telas: registra o service worker e reenvia ao voltar a conexão (ou a cada 30s)
+    function iniciar() {
+        if ('serviceWorker' in navigator) {
+            navigator.serviceWorker.register('{% url "service_worker" %}').catch(() => {});
+            navigator.serviceWorker.addEventListener('message', evento => {
+                if (evento.data && evento.data.tipo === 'outbox') {
+                    ouvintes.forEach(ouvinte => ouvinte(evento.data.resultados));
+                }
+            });
+        }
+        const tentar = () => enviar().catch(() => {});
+        window.addEventListener('online', tentar);
+        setInterval(tentar, INTERVALO_TENTATIVAS_MS);
+        return tentar();
+    }
+
+    return { enfileirar, pendentes, enviar, aoSincronizar, iniciar };
+})();
@@ -0,0 +1,20 @@
+// Service worker da fila offline: envia o outbox quando a conexão volta,
+// mesmo que a tela de edição já tenha sido fechada (Background Sync).
+{% include 'qualidade/_outbox.js' %}
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', evento => evento.waitUntil(self.clients.claim()));
+
+self.addEventListener('sync', evento => {
+    if (evento.tag === 'outbox') {
+        evento.waitUntil(Outbox.enviar());
+    }
+});
+
+// Telas abertas atualizam as listas com o resultado do envio feito aqui
+Outbox.aoSincronizar(resultados => {
+    self.clients.matchAll().then(clientes => {
+        clientes.forEach(cliente => cliente.postMessage({ tipo: 'outbox', resultados }));
+    });
+});
@@ -14,7 +14,7 @@ def get_registro_total(registro):
     if registro is None:
         return 0
     try:
-        return registro.total()
+        return registro.total
     except:
         return 0
 
@@ -1,3 +1,1362 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache as cache_app
+from . import comparacao, consolidacao, facetas, grade, sincronizacao, telao
+from .agregacoes import dados_por_operador, linhas_producao
+from .models import (
+    Cor, Ficha, FichaInventario, ItemInventario, LancamentoQuantidade, ModeloCalcado, ParteCalcado, PerfilUsuario,
+    EventoTelao, OperacaoSincronizada, ProducaoDiaria, RegistroParte, RelatorioJob, TamanhoModelo,
+)
+from .paginacao import ORDEM_FICHAS, _depois_de, paginar
+from .views.lixeira import ORDEM_LIXEIRA_FICHAS, consultas_lixeira_fichas
+
+
+class RelatorioPeriodoTests(TestCase):
+    """Agregação dos relatórios por período feita no banco"""
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.qualidade = User.objects.create_user('qualidade_teste', password='senha')
+        PerfilUsuario.objects.create(user=cls.qualidade, tipo='qualidade')
+
+        cls.operadores = []
+        for i in range(3):
+            operador = User.objects.create_user(f'operador_teste{i}', password='senha')
+            PerfilUsuario.objects.create(user=operador, tipo='operador')
+            cls.operadores.append(operador)
+
+        cls.partes = [ParteCalcado.objects.create(nome=nome) for nome in ('Língua', 'Sola', 'Reforço')]
+
+        cls.inicio = date(2025, 1, 1)
+        for dia in range(30):
+            for operador in cls.operadores:
+                ficha = Ficha.objects.create(
+                    operador=operador,
+                    data=cls.inicio + timedelta(days=dia),
+                    nome_ficha=f'Ficha {dia % 4}',
+                    setor='Corte',
+                )
+                for parte in cls.partes:
+                    RegistroParte.objects.create(ficha=ficha, parte=parte, quantidades=[10, 5])
+
+    def test_totais_por_operador(self):
+        dados, total_geral = dados_por_operador(self.inicio, self.inicio + timedelta(days=29))
+
+        self.assertEqual(total_geral, 30 * 3 * 3 * 15)
+        self.assertEqual(len(dados), 3)
+        operador = dados['operador_teste0']
+        self.assertEqual(operador['totais_partes']['Sola'], 30 * 15)
+        self.assertEqual(sum(operador['fichas']['Ficha 0'].values()), 8 * 3 * 15)
+
+    def test_filtro_por_parte(self):
+        parte = self.partes[0]
+        dados, total_geral = dados_por_operador(self.inicio, self.inicio, parte_id=parte.id)
+
+        self.assertEqual(total_geral, 3 * 15)
+        self.assertEqual(set(dados['operador_teste1']['totais_partes']), {parte.nome})
+
+    def _consultas_relatorio(self, dias):
+        self.client.login(username='qualidade_teste', password='senha')
+        parametros = {
+            'data_inicio': self.inicio.isoformat(),
+            'data_fim': (self.inicio + timedelta(days=dias - 1)).isoformat(),
+        }
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('relatorios'), parametros)
+        self.assertEqual(response.status_code, 200)
+        return len(consultas)
+
+    @override_settings(QUALIDADE_CTX_TTL=0)
+    def test_numero_de_consultas_constante_no_periodo(self):
+        self._consultas_relatorio(1)  # opções dos filtros ficam no cache
+        self.assertEqual(self._consultas_relatorio(1), self._consultas_relatorio(30))
+
+    def test_exportacao_csv(self):
+        self.client.login(username='qualidade_teste', password='senha')
+        response = self.client.get(reverse('exportar_relatorio_periodo_csv'), {
+            'data_inicio': self.inicio.isoformat(),
+            'data_fim': (self.inicio + timedelta(days=29)).isoformat(),
+            'operador_id': self.operadores[0].id,
+        })
+        self.assertTrue(response.streaming)
+
+        linhas = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(linhas[0], 'Operador;Ficha;Parte;Pares')
+        self.assertEqual(len(linhas), 1 + 4 * 3)
+        self.assertEqual(sum(int(linha.split(';')[-1]) for linha in linhas[1:]), 30 * 3 * 15)
+
+    def test_status_do_job_com_erro_nao_expoe_traceback(self):
+        job = RelatorioJob.objects.create(
+            solicitado_por=self.qualidade, status='erro', erro='Traceback (most recent call last):\n  File "/app/x.py"'
+        )
+        self.client.login(username='qualidade_teste', password='senha')
+        dados = self.client.get(reverse('status_relatorio_job', args=[job.id])).json()
+        self.assertEqual(dados['status'], 'erro')
+        self.assertNotIn('Traceback', dados['erro'])
+
+
+class ProducaoDiariaTests(TestCase):
+    """Manutenção incremental do rollup diário"""
+
+    def setUp(self):
+        self.operador = User.objects.create_user('operador_rollup', password='senha')
+        self.ficha = Ficha.objects.create(operador=self.operador, data=date(2025, 2, 1), nome_ficha='Rollup', setor='Corte')
+        self.parte = ParteCalcado.objects.create(nome='Sola')
+        self.registro = RegistroParte.objects.create(ficha=self.ficha, parte=self.parte, quantidades=[4])
+
+    def _linha(self):
+        return ProducaoDiaria.objects.values_list('quantidade', 'lancamentos').get()
+
+    def test_lancamentos_atualizam_rollup(self):
+        self.registro.adicionar_quantidade(6)
+        self.assertEqual(self._linha(), (10, 2))
+
+        self.registro.remover_ultima_quantidade()
+        self.assertEqual(self._linha(), (4, 1))
+
+    def test_lixeira_e_restauracao(self):
+        self.ficha.excluir(self.operador)
+        # Linha zerada sai do rollup
+        self.assertFalse(ProducaoDiaria.objects.exists())
+
+        self.ficha.excluido = False
+        self.ficha.save()
+        self.assertEqual(self._linha(), (4, 1))
+
+    def test_lixeira_em_lote(self):
+        outra = Ficha.objects.create(operador=self.operador, data=date(2025, 2, 1), nome_ficha='Rollup', setor='Corte')
+        RegistroParte.objects.create(ficha=outra, parte=self.parte, quantidades=[5])
+        atualizada_em = Ficha.objects.get(id=self.ficha.id).atualizada_em
+
+        self.assertEqual(Ficha.objects.all().mover_para_lixeira(self.operador), 2)
+        self.assertFalse(ProducaoDiaria.objects.exists())
+        self.assertEqual(Ficha.lixeira.filter(excluido_por=self.operador).count(), 2)
+        self.assertGreater(Ficha.objects.get(id=self.ficha.id).atualizada_em, atualizada_em)
+        # Quem já está na lixeira não sai do rollup de novo
+        self.assertEqual(Ficha.objects.all().mover_para_lixeira(self.operador), 0)
+
+        self.assertEqual(Ficha.objects.all().restaurar(), 2)
+        self.assertEqual(self._linha(), (9, 2))
+        self.assertFalse(Ficha.lixeira.exists())
+
+    def test_exclusao_definitiva(self):
+        outra = Ficha.objects.create(operador=self.operador, data=date(2025, 2, 1), nome_ficha='Rollup', setor='Corte')
+        RegistroParte.objects.create(ficha=outra, parte=self.parte, quantidades=[5])
+
+        # Registros saem em cascata pelo collector, sem RegistroParte.delete()
+        Ficha.objects.filter(id=outra.id).delete()
+        self.assertEqual(self._linha(), (4, 1))
+
+        self.ficha.delete()
+        self.assertFalse(ProducaoDiaria.objects.exists())
+
+    def test_exclusao_definitiva_da_lixeira(self):
+        self.ficha.excluir(self.operador)
+        Ficha.lixeira.all().delete()
+        self.assertFalse(ProducaoDiaria.objects.exists())
+        ProducaoDiaria.reconstruir()
+        self.assertFalse(ProducaoDiaria.objects.exists())
+
+    def test_lancamentos_registrados(self):
+        self.registro.adicionar_quantidade(6, self.operador)
+        self.registro.adicionar_quantidade(2, self.operador)
+        self.assertEqual(
+            list(self.registro.lancamentos.values_list('quantidade', 'criado_por')),
+            # O 4 veio de create(quantidades=[4]), sem usuário
+            [(4, None), (6, self.operador.id), (2, self.operador.id)],
+        )
+
+        self.assertEqual(self.registro.remover_ultima_quantidade(), 2)
+        self.assertEqual(list(LancamentoQuantidade.objects.values_list('quantidade', flat=True)), [4, 6])
+        self.registro.refresh_from_db()
+        self.assertEqual((self.registro.quantidades_lancadas, self.registro.total), ([4, 6], 10))
+
+    def test_clique_so_insere_ou_apaga_lancamentos(self):
+        # A lista antiga não é mais reescrita: cada clique é INSERT/DELETE do lançamento e os contadores
+        with CaptureQueriesContext(connection) as consultas:
+            self.registro.adicionar_quantidade(6)
+            self.registro.remover_ultima_quantidade()
+        sql = ' '.join(consulta['sql'] for consulta in consultas.captured_queries)
+        self.assertNotIn('"quantidades"', sql)
+        self.assertEqual(RegistroParte.objects.values_list('quantidades', flat=True).get(), [])
+
+    def test_instrucoes_por_clique(self):
+        registro = RegistroParte.objects.select_related('ficha__operador', 'parte').get(pk=self.registro.pk)
+
+        def instrucoes(acao):
+            with CaptureQueriesContext(connection) as consultas:
+                acao()
+            return [c['sql'] for c in consultas.captured_queries if 'SAVEPOINT' not in c['sql']]
+
+        # Contadores, lançamento, ficha, rollup, sequência e evento do telão
+        self.assertEqual(len(instrucoes(lambda: registro.adicionar_quantidade(6))), 6)
+        # Lock do registro, DELETE do último lançamento, contadores, ficha, rollup (+ limpeza de linha zerada),
+        # sequência e evento do telão
+        self.assertEqual(len(instrucoes(registro.remover_ultima_quantidade)), 8)
+
+        self.assertEqual(self.registro.remover_ultima_quantidade(), 4)
+        self.assertIsNone(self.registro.remover_ultima_quantidade())
+        self.registro.refresh_from_db()
+        self.assertEqual((self.registro.quantidades_lancadas, self.registro.total, self.registro.contagem), ([], 0, 0))
+
+    def test_lista_antiga_vira_lancamentos(self):
+        from django.apps import apps
+        from .signals import preencher_lancamentos, preencher_totais_registros
+
+        # A coluna antiga continua sendo o mesmo campo do modelo original: o makemigrations
+        # do deploy não gera RemoveField/AddField (que recriaria a coluna vazia)
+        campo = RegistroParte._meta.get_field('quantidades')
+        self.assertEqual((campo.column, campo.deconstruct()[3]), ('quantidades', {'default': list}))
+
+        # Registro gravado antes dos contadores e dos lançamentos: só a lista na coluna existente
+        self.registro.lancamentos.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {RegistroParte._meta.db_table} SET quantidades = %s, total = 0, contagem = 0 WHERE id = %s',
+                ['[3, 2]', self.registro.id],
+            )
+
+        configuracao = apps.get_app_config('qualidade')
+        preencher_totais_registros(configuracao)
+        preencher_lancamentos(configuracao)
+        self.registro.refresh_from_db()
+        self.assertEqual(
+            (self.registro.quantidades_lancadas, self.registro.total, self.registro.contagem), ([3, 2], 5, 2)
+        )
+        self.assertEqual(self.registro.quantidades, [])
+        self.assertEqual(Ficha.objects.get(id=self.ficha.id).total_geral, 5)
+
+    def test_reconstruir(self):
+        ProducaoDiaria.objects.update(quantidade=0, lancamentos=0)
+        ProducaoDiaria.reconstruir(date(2025, 2, 1), date(2025, 2, 1))
+        self.assertEqual(self._linha(), (4, 1))
+
+
+class TelaoTests(TestCase):
+    """Eventos ao vivo do telão: mesma transação da quantidade, numeração e polling"""
+
+    def setUp(self):
+        cache.clear()
+        telao.quadro.limpar()
+        self.operador = User.objects.create_user('operador_telao', password='senha')
+        self.ficha = Ficha.objects.create(operador=self.operador, data=date.today(), nome_ficha='Telão', setor='Corte')
+        self.parte = ParteCalcado.objects.create(nome='Cabedal')
+        self.registro = RegistroParte.objects.create(ficha=self.ficha, parte=self.parte, quantidades=[])
+
+    def _deltas(self):
+        return list(EventoTelao.objects.values_list('payload__delta', flat=True))
+
+    def test_evento_gravado_com_a_quantidade(self):
+        # Sem on_commit: o evento existe assim que a quantidade é gravada
+        self.registro.adicionar_quantidade(5)
+        self.registro.adicionar_quantidade(3)
+        self.registro.remover_ultima_quantidade()
+        self.assertEqual(self._deltas(), [5, 3, -3])
+        sequencias = list(EventoTelao.objects.values_list('sequencia', flat=True))
+        self.assertEqual(sequencias, sorted(sequencias))
+        self.assertEqual(telao.ultima_sequencia(), sequencias[-1])
+
+        self.registro.delete()
+        self.assertEqual(self._deltas(), [5, 3, -3, -5])
+
+    def test_ficha_na_lixeira_nao_publica(self):
+        self.ficha.excluir(self.operador)
+        self.registro.ficha.refresh_from_db()
+        self.registro.adicionar_quantidade(5)
+        self.assertFalse(EventoTelao.objects.exists())
+
+    def test_retrato_e_eventos_sem_contar_duas_vezes(self):
+        self.registro.adicionar_quantidade(5)
+        self.client.force_login(self.operador)
+        response = self.client.get(reverse('telas'))
+        self.assertEqual(response.context['total_dia'], 5)
+        ultimo = response.context['ultimo_evento']
+        self.assertEqual(ultimo, telao.ultima_sequencia())
+
+        self.registro.adicionar_quantidade(2)
+        dados = self.client.get(reverse('telas_eventos'), {'desde': ultimo}).json()
+        self.assertEqual([evento['delta'] for evento in dados['eventos']], [2])
+        self.assertEqual(dados['ultimo'], ultimo + 1)
+        self.assertIn('retry_after', dados)
+
+    def test_quadro_compartilhado(self):
+        quadro = telao.Quadro(intervalo=60)
+        self.registro.adicionar_quantidade(5)
+        self.assertEqual(len(quadro.eventos(self.ficha.data, 0)), 1)
+        # Outras telas dentro do intervalo leem do quadro, sem ir ao banco
+        self.registro.adicionar_quantidade(2)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(quadro.eventos(self.ficha.data, 0)), 1)
+            self.assertEqual(quadro.eventos(self.ficha.data, 1), [])
+        quadro.intervalo = 0
+        self.assertEqual([evento['delta'] for evento in quadro.eventos(self.ficha.data, 1)], [2])
+
+    def test_limpar_eventos(self):
+        self.registro.adicionar_quantidade(5)
+        self.registro.adicionar_quantidade(2)
+        EventoTelao.objects.filter(payload__delta=5).update(criado_em=timezone.now() - timedelta(days=3))
+        self.assertEqual(telao.limpar_eventos(), 1)
+        self.assertEqual(self._deltas(), [2])
+
+
+class LixeiraTests(TestCase):
+    """Ações em lote das telas de lixeira"""
+
+    def setUp(self):
+        usuario = User.objects.create_user('qualidade_lixeira', password='senha')
+        PerfilUsuario.objects.create(user=usuario, tipo='qualidade')
+        self.usuario = usuario
+        self.cor = Cor.objects.create(nome='Preto')
+        self.modelos = [ModeloCalcado.objects.create(nome=nome) for nome in ('Bota', 'Tênis')]
+        for modelo in self.modelos:
+            TamanhoModelo.objects.create(modelo=modelo, cor=self.cor, numero=38)
+        self.client.login(username='qualidade_lixeira', password='senha')
+
+    def test_modelos_levam_tamanhos(self):
+        ModeloCalcado.objects.all().mover_para_lixeira(self.usuario)
+        self.assertFalse(TamanhoModelo.objects.filter(ativo=True).exists())
+        self.assertEqual(ModeloCalcado.ativos.count(), 0)
+
+        response = self.client.post(reverse('lixeira_modelos'), {
+            'acao': 'restaurar', 'modelo_id': [modelo.id for modelo in self.modelos],
+        })
+        self.assertRedirects(response, reverse('lixeira_modelos'))
+        self.assertEqual(ModeloCalcado.ativos.count(), 2)
+        self.assertEqual(TamanhoModelo.objects.filter(ativo=True, excluido=False).count(), 2)
+        self.assertFalse(ModeloCalcado.objects.filter(excluido_por__isnull=False).exists())
+
+    def test_exclusao_permanente_so_na_lixeira(self):
+        azul = Cor.objects.create(nome='Azul')
+        Cor.objects.filter(id=azul.id).mover_para_lixeira()
+        self.client.post(reverse('lixeira_cores'), {
+            'acao': 'excluir_permanente', 'cor_id': [azul.id, self.cor.id],
+        })
+        # Preto não estava na lixeira: continua no banco
+        self.assertEqual(list(Cor.objects.values_list('nome', flat=True)), ['Preto'])
+
+    def test_exclusao_permanente_de_parte_desconta_das_fichas(self):
+        ficha = Ficha.objects.create(operador=self.usuario, data=date(2025, 4, 1), nome_ficha='Partes', setor='Corte')
+        lingua, sola = ParteCalcado.objects.create(nome='Língua'), ParteCalcado.objects.create(nome='Sola')
+        RegistroParte.objects.create(ficha=ficha, parte=lingua, quantidades=[5])
+        RegistroParte.objects.create(ficha=ficha, parte=sola, quantidades=[7])
+        intocada = Ficha.objects.create(operador=self.usuario, data=date(2025, 4, 1), nome_ficha='Sem língua', setor='Corte')
+        RegistroParte.objects.create(ficha=intocada, parte=sola, quantidades=[2])
+        antes = Ficha.objects.get(id=ficha.id).atualizada_em
+        intocada_antes = Ficha.objects.get(id=intocada.id).atualizada_em
+
+        ParteCalcado.objects.filter(id=lingua.id).mover_para_lixeira(self.usuario)
+        self.client.post(reverse('lixeira_partes'), {'acao': 'excluir_permanente', 'parte_id': [lingua.id]})
+
+        ficha.refresh_from_db()
+        self.assertFalse(ParteCalcado.objects.filter(id=lingua.id).exists())
+        self.assertEqual(ficha.total_geral, 7)
+        self.assertEqual(ficha.total_geral, RegistroParte.objects.filter(ficha=ficha).aggregate(soma=Sum('total'))['soma'])
+        self.assertGreater(ficha.atualizada_em, antes)
+        self.assertEqual(Ficha.objects.values_list('total_geral', 'atualizada_em').get(id=intocada.id), (2, intocada_antes))
+
+    def test_lixeira_fichas_unificada(self):
+        operador = User.objects.create_user('operador_lixeira', first_name='Ana', last_name='Souza')
+        for i in range(20):
+            Ficha.objects.create(operador=operador, data=date(2025, 4, 1), nome_ficha=f'F{i}', setor='Corte')
+            FichaInventario.objects.create(operador=self.usuario, data=date(2025, 4, 1), nome_ficha=f'I{i}')
+        Ficha.objects.all().mover_para_lixeira(self.usuario)
+        FichaInventario.objects.all().mover_para_lixeira()
+        # Mesmo excluido_em nas duas tabelas: o desempate por tipo/id precisa ser estável
+        momento = timezone.now()
+        Ficha.objects.update(excluido_em=momento)
+        FichaInventario.objects.exclude(nome_ficha='I0').update(excluido_em=momento)
+        recente = FichaInventario.objects.get(nome_ficha='I0')
+        FichaInventario.objects.filter(id=recente.id).update(excluido_em=momento + timedelta(hours=1))
+
+        esperado = [('Inventario', recente.id)]
+        esperado += [('Ficha', i) for i in Ficha.objects.order_by('-id').values_list('id', flat=True)]
+        esperado += [
+            ('Inventario', i) for i in FichaInventario.objects.exclude(id=recente.id).order_by('-id').values_list('id', flat=True)
+        ]
+
+        self.client.get(reverse('lixeira_fichas'))  # contexto do usuário já na sessão
+        vistos, url, consultas_por_pagina = [], '', []
+        while url is not None:
+            with CaptureQueriesContext(connection) as consultas:
+                pagina = self.client.get(reverse('lixeira_fichas') + url).context['fichas']
+            consultas_por_pagina.append(len(consultas))
+            vistos.extend((ficha['tipo'], ficha['id']) for ficha in pagina)
+            url = pagina.url_proxima
+        self.assertEqual(vistos, esperado)
+        self.assertEqual(len(set(consultas_por_pagina)), 1)
+        self.assertEqual(pagina.itens[-1]['operador_nome'], self.usuario.username)
+        self.assertIsNone(pagina.itens[-1]['excluido_por_nome'])
+
+        primeira = self.client.get(reverse('lixeira_fichas')).context['fichas']
+        self.assertEqual(primeira.itens[1]['operador_nome'], 'Ana Souza')
+        self.assertEqual(primeira.itens[1]['excluido_por_nome'], self.usuario.username)
+
+    def test_selecao_de_fichas_dos_dois_tipos(self):
+        ficha = Ficha.objects.create(operador=self.usuario, data=date(2025, 4, 1), nome_ficha='F', setor='Corte')
+        inventario = FichaInventario.objects.create(operador=self.usuario, data=date(2025, 4, 1), nome_ficha='I')
+        Ficha.objects.all().mover_para_lixeira()
+        FichaInventario.objects.all().mover_para_lixeira()
+
+        response = self.client.post(reverse('lixeira_fichas'), {
+            'acao': 'restaurar', 'selecao': [f'Ficha:{ficha.id}', f'Inventario:{inventario.id}', 'Ficha:x'],
+        }, follow=True)
+        self.assertContains(response, '2 fichas restauradas com sucesso!')
+        self.assertFalse(Ficha.lixeira.exists() or FichaInventario.lixeira.exists())
+
+
+class GradeTamanhosTests(TestCase):
+    """Provisionamento da grade modelo × cor × número em lote"""
+
+    def setUp(self):
+        usuario = User.objects.create_user('qualidade_grade', password='senha')
+        PerfilUsuario.objects.create(user=usuario, tipo='qualidade')
+        self.cores = [Cor.objects.create(nome=f'Cor {i}') for i in range(8)]
+        self.client.login(username='qualidade_grade', password='senha')
+
+    def test_criar_modelo_em_consultas_constantes(self):
+        tamanhos = [str(numero) for numero in range(26, 46)]
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse('gerenciar_modelos'), {
+                'acao': 'adicionar_modelo', 'nome_modelo': 'Bota',
+                'cores': [cor.id for cor in self.cores], 'tamanhos': tamanhos,
+            })
+        self.assertEqual(TamanhoModelo.objects.filter(modelo__nome='Bota').count(), 160)
+        self.assertLess(len(consultas), 20)
+
+    def test_reativa_e_separa_existentes(self):
+        modelo = ModeloCalcado.objects.create(nome='Tênis')
+        modelo.cores.set(self.cores[:2])
+        grade.provisionar(modelo, [self.cores[0].id], ['38', '39'])
+        TamanhoModelo.objects.filter(numero='39').update(excluido=True, ativo=False)
+
+        with self.assertNumQueries(5):
+            resultado = grade.provisionar(modelo, [cor.id for cor in self.cores[:2]], [38, 39])
+        primeira, segunda = self.cores[0].id, self.cores[1].id
+        self.assertEqual(resultado['adicionados'], {(segunda, '38'), (segunda, '39')})
+        self.assertEqual(resultado['reativados'], {(primeira, '39')})
+        self.assertEqual(resultado['existentes'], {(primeira, '38')})
+        self.assertEqual(TamanhoModelo.ativos.filter(ativo=True, modelo=modelo).count(), 4)
+
+        response = self.client.post(reverse('gerenciar_modelos'), {
+            'acao': 'adicionar_tamanho', 'modelo_id': modelo.id, 'tamanhos': ['38', '40'],
+        }, follow=True)
+        self.assertContains(response, 'Já existiam: 38 (Cor 0), 38 (Cor 1)')
+        self.assertEqual(TamanhoModelo.objects.filter(modelo=modelo).count(), 6)
+
+    def _criar_modelos(self, quantidade):
+        for _ in range(quantidade):
+            modelo = ModeloCalcado.objects.create(nome=f'Modelo {ModeloCalcado.objects.count():03d}')
+            modelo.cores.set(self.cores[:3])
+            grade.provisionar(modelo, [cor.id for cor in self.cores[:3]], range(34, 40))
+
+    def test_listagem_em_consultas_constantes(self):
+        self._criar_modelos(21)
+        self.client.get(reverse('gerenciar_modelos'))  # contexto do usuário já na sessão
+        with CaptureQueriesContext(connection) as poucos:
+            response = self.client.get(reverse('gerenciar_modelos'))
+        modelo = response.context['modelos'].itens[0]
+        self.assertEqual((modelo.tamanho_count, len(modelo.cores_ativas)), (6, 3))
+        self.assertEqual(modelo.tamanhos_unicos, ['34', '35', '36', '37', '38', '39'])
+
+        self._criar_modelos(40)
+        with CaptureQueriesContext(connection) as muitos:
+            response = self.client.get(reverse('gerenciar_modelos'))
+        self.assertEqual(len(muitos), len(poucos))
+        self.assertTrue(response.context['modelos'].tem_proxima)
+
+        busca = self.client.get(reverse('gerenciar_modelos'), {'q': 'modelo 02'}).context['modelos']
+        self.assertEqual([modelo.nome for modelo in busca], [f'Modelo {i:03d}' for i in range(20, 30)])
+
+
+class LoteQuantidadesTests(TestCase):
+    """Endpoint de lançamentos em lote da tela de edição"""
+
+    def setUp(self):
+        self.operador = User.objects.create_user('operador_lote', password='senha')
+        PerfilUsuario.objects.create(user=self.operador, tipo='operador')
+        self.ficha = Ficha.objects.create(operador=self.operador, data=date(2025, 5, 1), nome_ficha='Lote', setor='Corte')
+        self.sola, self.lingua = (ParteCalcado.objects.create(nome=nome) for nome in ('Sola', 'Língua'))
+        RegistroParte.objects.create(ficha=self.ficha, parte=self.sola, quantidades=[])
+        self.client.login(username='operador_lote', password='senha')
+        self.url = reverse('adicionar_quantidades_lote', args=[self.ficha.id])
+
+    def _enviar(self, operacoes):
+        return self.client.post(self.url, {'operacoes': operacoes}, content_type='application/json')
+
+    def test_lote_com_varias_partes(self):
+        response = self._enviar([
+            {'parte_id': self.sola.id, 'quantidades': [5, 7]},
+            {'parte_id': self.lingua.id, 'quantidades': [3]},
+            {'parte_id': self.sola.id, 'quantidades': [1]},
+        ])
+        self.assertEqual(response.status_code, 200)
+        registros = response.json()['registros']
+        self.assertEqual(registros[str(self.sola.id)], {'quantidades': [5, 7, 1], 'total': 13})
+        self.assertEqual(registros[str(self.lingua.id)], {'quantidades': [3], 'total': 3})
+        self.assertEqual(Ficha.objects.get(pk=self.ficha.pk).total_geral, 16)
+        self.assertEqual(LancamentoQuantidade.objects.count(), 4)
+
+    def test_lote_invalido_nao_grava_nada(self):
+        response = self._enviar([
+            {'parte_id': self.sola.id, 'quantidades': [5]},
+            {'parte_id': self.lingua.id, 'quantidades': [0]},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(LancamentoQuantidade.objects.exists())
+
+
+class SincronizacaoTests(TestCase):
+    """API da fila offline com chaves de idempotência"""
+
+    def setUp(self):
+        self.operador = User.objects.create_user('operador_offline', password='senha')
+        PerfilUsuario.objects.create(user=self.operador, tipo='operador')
+        self.ficha = Ficha.objects.create(operador=self.operador, data=date(2025, 6, 1), nome_ficha='Offline', setor='Corte')
+        self.parte = ParteCalcado.objects.create(nome='Sola')
+        self.client.login(username='operador_offline', password='senha')
+
+    def _sincronizar(self, *operacoes):
+        response = self.client.post(reverse('sincronizar_operacoes'), {'operacoes': list(operacoes)}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return [resultado['status'] for resultado in response.json()['resultados']]
+
+    def _lancamento(self, chave, quantidade):
+        return {
+            'chave': chave,
+            'tipo': 'adicionar_quantidade',
+            'ficha_id': self.ficha.id,
+            'parte_id': self.parte.id,
+            'quantidade': quantidade,
+        }
+
+    def test_reenvio_nao_duplica(self):
+        lote = [self._lancamento('a1', 5), self._lancamento('a2', 3)]
+        self.assertEqual(self._sincronizar(*lote), ['ok', 'ok'])
+        self.assertEqual(self._sincronizar(*lote, self._lancamento('a3', 1)), ['duplicada', 'duplicada', 'ok'])
+
+        registro = RegistroParte.objects.get(ficha=self.ficha, parte=self.parte)
+        self.assertEqual((registro.quantidades_lancadas, registro.total), ([5, 3, 1], 9))
+
+    def test_operacao_invalida_nao_bloqueia_o_lote(self):
+        outra_ficha = Ficha.objects.create(
+            operador=User.objects.create_user('outro_operador'), data=date(2025, 6, 1), nome_ficha='Outra'
+        )
+        invalida = dict(self._lancamento('b2', 4), ficha_id=outra_ficha.id)
+        self.assertEqual(
+            self._sincronizar(self._lancamento('b1', 2), invalida, self._lancamento('b3', 0)),
+            ['ok', 'erro', 'erro'],
+        )
+        self.assertEqual(Ficha.objects.get(pk=self.ficha.pk).total_geral, 2)
+        self.assertFalse(RegistroParte.objects.filter(ficha=outra_ficha).exists())
+
+    def test_registro_apagado_nao_bloqueia_o_lote(self):
+        def registro_sumiu(contexto, operacao):
+            raise RegistroParte.DoesNotExist
+
+        sumiu = {'chave': 'c2', 'tipo': 'remover_quantidade', 'ficha_id': self.ficha.id, 'parte_id': self.parte.id}
+        lote = [self._lancamento('c1', 2), sumiu, self._lancamento('c3', 4)]
+        with mock.patch.dict(sincronizacao.OPERACOES, remover_quantidade=registro_sumiu):
+            self.assertEqual(self._sincronizar(*lote), ['ok', 'erro', 'ok'])
+            self.assertEqual(self._sincronizar(*lote), ['duplicada', 'erro', 'duplicada'])
+        self.assertEqual(Ficha.objects.get(pk=self.ficha.pk).total_geral, 6)
+        self.assertFalse(OperacaoSincronizada.objects.filter(chave='c2').exists())
+
+    def test_retencao_das_chaves_fora_da_requisicao(self):
+        self.assertEqual(self._sincronizar(self._lancamento('d1', 1), self._lancamento('d2', 1)), ['ok', 'ok'])
+        OperacaoSincronizada.objects.filter(chave='d1').update(criado_em=timezone.now() - timedelta(days=31))
+
+        self.assertEqual(self._sincronizar(self._lancamento('d3', 1)), ['ok'])
+        self.assertTrue(OperacaoSincronizada.objects.filter(chave='d1').exists())
+
+        self.assertEqual(sincronizacao.limpar_operacoes(), 1)
+        self.assertEqual(sorted(OperacaoSincronizada.objects.values_list('chave', flat=True)), ['d2', 'd3'])
+
+
+class LancamentoConcorrenteTests(TransactionTestCase):
+    """Lançamentos simultâneos na mesma parte não se perdem"""
+
+    def test_lancamentos_paralelos(self):
+        operador = User.objects.create_user('operador_concorrente', password='senha')
+        ficha = Ficha.objects.create(operador=operador, data=date(2025, 4, 1), nome_ficha='Concorrência', setor='Corte')
+        registro = RegistroParte.objects.create(ficha=ficha, parte=ParteCalcado.objects.create(nome='Sola'))
+
+        def lancar(quantidade):
+            try:
+                RegistroParte.objects.select_related('ficha').get(pk=registro.pk).adicionar_quantidade(quantidade)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lancar, [1] * 40))
+
+        registro.refresh_from_db()
+        self.assertEqual((registro.total, registro.contagem, len(registro.quantidades_lancadas)), (40, 40, 40))
+        self.assertEqual(registro.lancamentos.count(), 40)
+        self.assertEqual(Ficha.objects.get(pk=ficha.pk).total_geral, 40)
+        self.assertEqual(ProducaoDiaria.objects.values_list('quantidade', 'lancamentos').get(), (40, 40))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'UPDATE/DELETE ... RETURNING no PostgreSQL')
+class LancamentoPostgresTests(TestCase):
+    """SQL dos lançamentos (contadores e último lançamento) executado no PostgreSQL"""
+
+    def setUp(self):
+        operador = User.objects.create_user('operador_postgres', password='senha')
+        ficha = Ficha.objects.create(operador=operador, data=date(2025, 4, 2), nome_ficha='Postgres', setor='Corte')
+        self.registro = RegistroParte.objects.create(ficha=ficha, parte=ParteCalcado.objects.create(nome='Sola'))
+
+    def _estado(self):
+        registro = RegistroParte.objects.get(pk=self.registro.pk)
+        return registro.quantidades_lancadas, registro.total, registro.contagem
+
+    def test_acrescentar(self):
+        self.registro.adicionar_quantidade(5)
+        self.registro.adicionar_quantidades([3, 1])
+        self.assertEqual((self.registro.total, self.registro.contagem), (9, 3))
+        self.assertEqual(self._estado(), ([5, 3, 1], 9, 3))
+        self.assertEqual(ProducaoDiaria.objects.values_list('quantidade', 'lancamentos').get(), (9, 3))
+
+    def test_remover_ultima(self):
+        self.registro.adicionar_quantidades([5, 3])
+        self.assertEqual(self.registro.remover_ultima_quantidade(), 3)
+        self.assertEqual(self._estado(), ([5], 5, 1))
+        self.assertEqual(self.registro.remover_ultima_quantidade(), 5)
+        self.assertEqual(self._estado(), ([], 0, 0))
+        self.assertFalse(ProducaoDiaria.objects.exists())
+
+    def test_remover_de_lista_vazia(self):
+        self.assertIsNone(self.registro.remover_ultima_quantidade())
+        self.assertEqual(self._estado(), ([], 0, 0))
+        self.assertEqual(Ficha.objects.get(pk=self.registro.ficha_id).total_geral, 0)
+
+
+class PdfCacheTests(TestCase):
+    """Cache dos PDFs por parâmetros e versão dos dados"""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio, ignore_errors=True)
+        configuracao = override_settings(PDF_CACHE_DIR=self.diretorio)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        usuario = User.objects.create_user('qualidade_pdf', password='senha')
+        PerfilUsuario.objects.create(user=usuario, tipo='qualidade')
+        self.ficha = Ficha.objects.create(operador=usuario, data=date(2025, 3, 1), nome_ficha='PDF', setor='Corte')
+        self.registro = RegistroParte.objects.create(
+            ficha=self.ficha, parte=ParteCalcado.objects.create(nome='Sola'), quantidades=[3]
+        )
+        self.client.login(username='qualidade_pdf', password='senha')
+        self.url = reverse('gerar_relatorio', args=[self.ficha.id])
+
+    def test_etag_e_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        etag = response['ETag']
+
+        repetida = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(len(os.listdir(self.diretorio)), 1)
+
+    def test_edicao_invalida(self):
+        etag = self.client.get(self.url)['ETag']
+        self.registro.adicionar_quantidade(7)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_exclusao_definitiva_de_parte_invalida(self):
+        lingua = ParteCalcado.objects.create(nome='Língua')
+        RegistroParte.objects.create(ficha=self.ficha, parte=lingua, quantidades=[4])
+        etag = self.client.get(self.url)['ETag']
+
+        lingua.delete()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(os.listdir(self.diretorio)), 2)
+
+    def test_evicao_lru(self):
+        from . import pdf_cache
+
+        for i in range(3):
+            pdf_cache.gravar(f'chave{i}', lambda saida: saida.write(b'x' * 100)).close()
+            os.utime(os.path.join(self.diretorio, f'chave{i}.pdf'), (i, i))
+        pdf_cache.evictar(limite=250)
+        self.assertEqual(sorted(os.listdir(self.diretorio)), ['chave1.pdf', 'chave2.pdf'])
+
+
+class ContextoUsuarioTests(TestCase):
+    """request.qualidade_ctx: perfil e grupos lidos uma vez por requisição"""
+
+    def setUp(self):
+        cache.clear()
+        self.operador = User.objects.create_user('operador_ctx', password='senha')
+        PerfilUsuario.objects.create(user=self.operador, tipo='operador')
+        self.operador.groups.add(Group.objects.get_or_create(name='Corte')[0])
+        self.client.login(username='operador_ctx', password='senha')
+
+    def _consultas_de_grupo(self, contexto):
+        return [q for q in contexto.captured_queries if 'auth_group' in q['sql']]
+
+    def test_home_consulta_perfil_e_grupo_uma_vez(self):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Corte')
+        self.assertEqual(len(self._consultas_de_grupo(contexto)), 1)
+        self.assertFalse([q for q in contexto.captured_queries if 'qualidade_perfilusuario' in q['sql']
+                          and 'auth_group' not in q['sql']])
+
+    @override_settings(QUALIDADE_CTX_TTL=60)
+    def test_cache_na_sessao(self):
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as contexto:
+            self.client.get(reverse('home'))
+        self.assertEqual(self._consultas_de_grupo(contexto), [])
+
+    def _contexto_relido(self):
+        with CaptureQueriesContext(connection) as contexto:
+            self.client.get(reverse('home'))
+        return bool(self._consultas_de_grupo(contexto))
+
+    @override_settings(QUALIDADE_CTX_TTL=60)
+    def test_mudanca_de_perfil_invalida_a_sessao(self):
+        self.client.get(reverse('home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            PerfilUsuario.objects.filter(user=self.operador).get().save()
+        self.assertTrue(self._contexto_relido())
+        self.assertFalse(self._contexto_relido())
+
+    @override_settings(QUALIDADE_CTX_TTL=60)
+    def test_mudanca_de_grupos_invalida_a_sessao(self):
+        injetora = Group.objects.get_or_create(name='Injetora')[0]
+        self.client.get(reverse('home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.operador.groups.add(injetora)
+        self.assertTrue(self._contexto_relido())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            injetora.user_set.remove(self.operador)
+        self.assertTrue(self._contexto_relido())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.get(name='Corte').delete()
+        self.assertTrue(self._contexto_relido())
+
+    def test_criar_ficha_usa_setor_conhecido(self):
+        with CaptureQueriesContext(connection) as contexto:
+            self.client.post(reverse('criar_ficha'), {'data': '2025-06-01', 'nome_ficha': 'Contexto'})
+        self.assertEqual(Ficha.objects.get(nome_ficha='Contexto').setor, 'Corte')
+        self.assertEqual(len(self._consultas_de_grupo(contexto)), 1)
+
+
+class CatalogoInventarioTests(TestCase):
+    """Catálogo modelo → cor → tamanho: um documento versionado, invalidado por signals"""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create_user('operador_catalogo', password='senha')
+        PerfilUsuario.objects.create(user=usuario, tipo='operador')
+        self.modelo = ModeloCalcado.objects.create(nome='Tênis')
+        self.preto = Cor.objects.create(nome='Preto')
+        self.modelo.cores.add(self.preto)
+        self.tamanho = TamanhoModelo.objects.create(modelo=self.modelo, cor=self.preto, numero='38')
+        self.client.login(username='operador_catalogo', password='senha')
+        self.url = reverse('catalogo_inventario')
+
+    def test_documento_e_etag(self):
+        response = self.client.get(self.url)
+        dados = response.json()
+        self.assertEqual(dados['cores'], {str(self.preto.id): 'Preto'})
+        self.assertEqual(dados['modelos'][0]['cores'], [self.preto.id])
+        self.assertEqual(dados['modelos'][0]['tamanhos'], {str(self.preto.id): [[self.tamanho.id, '38']]})
+
+        with self.assertNumQueries(2):  # sessão e usuário: o catálogo vem do cache
+            repetida = self.client.get(self.url, {'v': dados['versao']}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+        self.assertIn('immutable', repetida['Cache-Control'])
+
+    def test_alteracao_invalida(self):
+        versao = self.client.get(self.url).json()['versao']
+        with self.captureOnCommitCallbacks(execute=True):
+            TamanhoModelo.objects.create(modelo=self.modelo, cor=self.preto, numero='39')
+        self.assertNotEqual(self.client.get(self.url).json()['versao'], versao)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.modelo.cores.remove(self.preto)
+        self.assertEqual(self.client.get(self.url).json()['modelos'][0]['cores'], [])
+
+
+class FacetasInventarioTests(TestCase):
+    """Opções de filtro e totais das fichas de inventário numa consulta agrupada"""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create_user('operador_facetas', password='senha')
+        PerfilUsuario.objects.create(user=usuario, tipo='operador')
+        self.ficha = FichaInventario.objects.create(operador=usuario, data=date(2025, 5, 1), nome_ficha='Facetas')
+        self.cores = [Cor.objects.create(nome=nome) for nome in ('Branco', 'Preto')]
+        self.modelos = [ModeloCalcado.objects.create(nome=nome) for nome in ('Tênis', 'Bota')]
+        for i, (modelo, cor, numero) in enumerate(
+            (modelo, cor, numero) for modelo in self.modelos for cor in self.cores for numero in ('37', '38')
+        ):
+            ItemInventario.objects.create(
+                ficha=self.ficha, modelo=modelo, cor=cor,
+                tamanho=TamanhoModelo.objects.create(modelo=modelo, cor=cor, numero=numero),
+                quantidade_pe_direito=i, quantidade_pe_esquerdo=8 - i,
+            )
+        self.client.login(username='operador_facetas', password='senha')
+
+    def _ficha(self):
+        return FichaInventario.objects.get(id=self.ficha.id)
+
+    def test_opcoes_e_totais(self):
+        tenis, bota = self.modelos
+        branco = self.cores[0]
+        resumo = facetas.calcular(self._ficha(), {'modelo': str(tenis.id), 'cor': None, 'numero': '38'})
+        self.assertEqual([modelo['nome'] for modelo in resumo['modelos']], ['Bota', 'Tênis'])
+        self.assertEqual([cor['nome'] for cor in resumo['cores']], ['Branco', 'Preto'])
+        self.assertEqual(resumo['numeros'], ['37', '38'])
+        itens = ItemInventario.objects.filter(ficha=self.ficha, modelo=tenis, tamanho__numero='38')
+        self.assertEqual(resumo['total_itens'], itens.count())
+        self.assertEqual(
+            resumo['total_pares'],
+            sum(min(item.quantidade_pe_direito, item.quantidade_pe_esquerdo) for item in itens),
+        )
+
+        resumo = facetas.calcular(self._ficha(), {'modelo': str(bota.id), 'cor': str(branco.id), 'numero': None})
+        self.assertEqual((resumo['total_itens'], resumo['modelos_diferentes']), (2, 1))
+        self.assertEqual(resumo['total_pd'] + resumo['total_pe'], 16)
+
+    def test_cache_pela_versao_da_ficha(self):
+        url = reverse('visualizar_ficha_inventario', args=[self.ficha.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, {'cor': self.cores[1].id})
+        self.assertFalse([q for q in consultas.captured_queries if 'GROUP BY' in q['sql']])
+        self.assertFalse([q for q in consultas.captured_queries if 'COUNT(' in q['sql']])
+        self.assertEqual(response.context['total_itens'], 4)
+        self.assertEqual(len(response.context['itens_paginados']), 4)
+
+        item = ItemInventario.objects.filter(ficha=self.ficha).first()
+        item.quantidade_pe_direito = 100
+        item.save()
+        self.assertEqual(
+            facetas.calcular(self._ficha())['total_pd'],
+            ItemInventario.objects.filter(ficha=self.ficha).aggregate(total=Sum('quantidade_pe_direito'))['total'],
+        )
+
+    def test_exclusao_definitiva_do_catalogo_invalida(self):
+        tenis, bota = self.modelos
+        outra = FichaInventario.objects.create(operador=self.ficha.operador, data=date(2025, 5, 2), nome_ficha='Só bota')
+        ItemInventario.objects.create(
+            ficha=outra, modelo=bota, cor=self.cores[0], tamanho=TamanhoModelo.objects.get(modelo=bota, cor=self.cores[0], numero='37'),
+        )
+        self.assertEqual(facetas.calcular(self._ficha())['total_itens'], 8)
+        intocada_antes = FichaInventario.objects.get(id=outra.id).atualizada_em
+
+        for excluir, restantes in (
+            (lambda: TamanhoModelo.objects.get(modelo=tenis, cor=self.cores[0], numero='37').delete(), 7),
+            (lambda: self.cores[1].delete(), 3),
+            (lambda: tenis.delete(), 2),
+        ):
+            antes = self._ficha().atualizada_em
+            excluir()
+            self.assertGreater(self._ficha().atualizada_em, antes)
+            self.assertEqual(facetas.calcular(self._ficha())['total_itens'], restantes)
+        self.assertEqual(FichaInventario.objects.get(id=outra.id).atualizada_em, intocada_antes)
+
+
+class GradeInventarioTests(TestCase):
+    """Lançamento de todos os tamanhos de um (modelo, cor) num único upsert"""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create_user('operador_grade', password='senha')
+        PerfilUsuario.objects.create(user=usuario, tipo='operador')
+        self.ficha = FichaInventario.objects.create(operador=usuario, data=date(2025, 5, 1), nome_ficha='Grade')
+        self.modelo = ModeloCalcado.objects.create(nome='Tênis')
+        self.cor = Cor.objects.create(nome='Branco')
+        self.tamanhos = {
+            numero: TamanhoModelo.objects.create(modelo=self.modelo, cor=self.cor, numero=numero)
+            for numero in ('37', '38', '39')
+        }
+        ItemInventario.objects.create(
+            ficha=self.ficha, modelo=self.modelo, cor=self.cor, tamanho=self.tamanhos['37'],
+            quantidade_pe_direito=1, quantidade_pe_esquerdo=1,
+        )
+        self.url = reverse('lancar_grade_inventario', args=[self.ficha.id])
+        self.client.login(username='operador_grade', password='senha')
+
+    def _lancar(self, linhas, **extra):
+        corpo = {'modelo_id': self.modelo.id, 'cor_id': self.cor.id, 'linhas': linhas, **extra}
+        return self.client.post(self.url, json.dumps(corpo), content_type='application/json')
+
+    def test_upsert_da_grade(self):
+        self.client.get(reverse('editar_ficha_inventario', args=[self.ficha.id]))
+        versao = FichaInventario.objects.get(id=self.ficha.id).atualizada_em
+        linhas = [
+            {'tamanho_id': self.tamanhos['37'].id, 'quantidade_pe_direito': 5, 'quantidade_pe_esquerdo': 4},
+            {'numero': '38', 'quantidade_pe_direito': 2, 'quantidade_pe_esquerdo': 3},
+            {'numero': '39', 'quantidade_pe_direito': 7, 'quantidade_pe_esquerdo': 7},
+        ]
+        with CaptureQueriesContext(connection) as consultas:
+            response = self._lancar(linhas)
+        self.assertEqual(response.status_code, 200)
+        # Número de consultas não depende de quantos tamanhos vieram na grade
+        self.assertEqual(len([q for q in consultas.captured_queries if q['sql'].startswith('INSERT')]), 1)
+
+        dados = response.json()
+        self.assertEqual((dados['criados'], dados['atualizados']), (2, 1))
+        self.assertEqual(dados['totais']['total_pares'], 4 + 2 + 7)
+        self.assertEqual(
+            sorted(ItemInventario.objects.filter(ficha=self.ficha).values_list('tamanho__numero', 'quantidade_pe_direito')),
+            [('37', 5), ('38', 2), ('39', 7)],
+        )
+        self.assertGreater(FichaInventario.objects.get(id=self.ficha.id).atualizada_em, versao)
+
+    def test_linha_invalida_nao_grava_nada(self):
+        outro = TamanhoModelo.objects.create(modelo=self.modelo, cor=Cor.objects.create(nome='Preto'), numero='38')
+        for linhas in (
+            [{'numero': '38', 'quantidade_pe_direito': 1}, {'numero': '45', 'quantidade_pe_direito': 1}],
+            [{'tamanho_id': outro.id, 'quantidade_pe_direito': 1}],
+            [{'numero': '38', 'quantidade_pe_direito': -1}],
+            [],
+        ):
+            response = self._lancar(linhas)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(ItemInventario.objects.filter(ficha=self.ficha).count(), 1)
+
+    def test_grade_pela_fila_offline(self):
+        operacao = {
+            'chave': 'grade-1', 'tipo': 'grade_inventario', 'ficha_id': self.ficha.id,
+            'modelo_id': self.modelo.id, 'cor_id': self.cor.id,
+            'linhas': [{'numero': '39', 'quantidade_pe_direito': 2, 'quantidade_pe_esquerdo': 2}],
+        }
+        for _ in range(2):
+            response = self.client.post(
+                reverse('sincronizar_operacoes'), json.dumps({'operacoes': [operacao]}), content_type='application/json'
+            )
+        self.assertEqual(response.json()['resultados'][0]['status'], 'duplicada')
+        self.assertEqual(ItemInventario.objects.filter(ficha=self.ficha).count(), 2)
+
+
+class AjusteItemInventarioTests(TestCase):
+    """Botões +/- da ficha de inventário pela API JSON (UPDATE condicional)"""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create_user('operador_ajuste', password='senha')
+        PerfilUsuario.objects.create(user=usuario, tipo='operador')
+        self.ficha = FichaInventario.objects.create(operador=usuario, data=date(2025, 5, 1), nome_ficha='Ajuste')
+        modelo = ModeloCalcado.objects.create(nome='Tênis')
+        cor = Cor.objects.create(nome='Branco')
+        self.item = ItemInventario.objects.create(
+            ficha=self.ficha, modelo=modelo, cor=cor,
+            tamanho=TamanhoModelo.objects.create(modelo=modelo, cor=cor, numero='38'),
+            quantidade_pe_direito=3, quantidade_pe_esquerdo=5,
+        )
+        self.url = reverse('api_atualizar_item', args=[self.item.id])
+        self.client.login(username='operador_ajuste', password='senha')
+
+    def _ajustar(self, acao, lado, valor):
+        return self.client.post(self.url, {'acao': acao, 'lado': lado, 'valor': valor})
+
+    def test_soma_e_devolve_totais(self):
+        self._ajustar('adicionar', 'PD', 0)
+        versao = FichaInventario.objects.get(id=self.ficha.id).atualizada_em
+        with CaptureQueriesContext(connection) as consultas:
+            response = self._ajustar('adicionar', 'PD', 4)
+        # Sem ler o item antes: UPDATE condicional, uma leitura dos valores novos e as facetas
+        leituras = [
+            q for q in consultas.captured_queries
+            if q['sql'].startswith('SELECT') and 'qualidade_iteminventario' in q['sql'] and 'GROUP BY' not in q['sql']
+        ]
+        self.assertEqual(len(leituras), 1)
+        dados = response.json()
+        self.assertEqual((dados['quantidade_pe_direito'], dados['quantidade_pe_esquerdo'], dados['pares']), (7, 5, 5))
+        self.assertEqual(dados['totais']['total_pd'], 7)
+        self.assertGreater(FichaInventario.objects.get(id=self.ficha.id).atualizada_em, versao)
+
+    def test_nao_fica_negativo(self):
+        response = self._ajustar('subtrair', 'PD', 4)
+        self.assertEqual(response.status_code, 400)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantidade_pe_direito, 3)
+
+        self.assertEqual(self._ajustar('subtrair', 'PD', 3).json()['quantidade_pe_direito'], 0)
+        self.assertEqual(self._ajustar('subtrair', 'XX', 1).status_code, 400)
+        self.assertEqual(
+            self.client.post(reverse('api_atualizar_item', args=[0]), {'acao': 'adicionar', 'lado': 'PE', 'valor': 1}).status_code,
+            404,
+        )
+
+    def test_remover(self):
+        response = self.client.post(reverse('api_remover_item', args=[self.item.id]))
+        self.assertEqual(response.json()['totais']['total_itens'], 0)
+        self.assertFalse(ItemInventario.objects.filter(id=self.item.id).exists())
+
+    def test_remover_de_ficha_na_lixeira(self):
+        FichaInventario.objects.filter(id=self.item.ficha_id).mover_para_lixeira()
+        response = self.client.post(reverse('api_remover_item', args=[self.item.id]))
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(ItemInventario.objects.filter(id=self.item.id).exists())
+
+
+class ConsolidacaoInventarioTests(TestCase):
+    """Inventário consolidado de várias fichas numa consulta agrupada"""
+
+    def setUp(self):
+        cache.clear()
+        operador = User.objects.create_user('operador_consolidado', password='senha')
+        PerfilUsuario.objects.create(user=operador, tipo='operador')
+        usuario = User.objects.create_user('qualidade_consolidado', password='senha')
+        PerfilUsuario.objects.create(user=usuario, tipo='qualidade')
+        modelo = ModeloCalcado.objects.create(nome='Tênis')
+        cor = Cor.objects.create(nome='Branco')
+        self.tamanhos = {
+            numero: TamanhoModelo.objects.create(modelo=modelo, cor=cor, numero=numero) for numero in ('37', '38')
+        }
+        # (data, setor, {número: (PD, PE)})
+        for dia, setor, contagem in (
+            (1, 'Injetora', {'37': (4, 5), '38': (2, 2)}),
+            (3, 'Injetora', {'37': (1, 1)}),
+            (2, 'Costura', {'38': (10, 0)}),
+        ):
+            ficha = FichaInventario.objects.create(operador=operador, data=date(2025, 5, dia), nome_ficha=f'Dia {dia}', setor=setor)
+            for numero, (pd, pe) in contagem.items():
+                ItemInventario.objects.create(
+                    ficha=ficha, modelo=modelo, cor=cor, tamanho=self.tamanhos[numero],
+                    quantidade_pe_direito=pd, quantidade_pe_esquerdo=pe,
+                )
+        self.periodo = {'data_inicio': date(2025, 5, 1), 'data_fim': date(2025, 5, 31)}
+        self.client.login(username='qualidade_consolidado', password='senha')
+
+    def _por_numero(self, **parametros):
+        with CaptureQueriesContext(connection) as consultas:
+            linhas = list(consolidacao.linhas(**self.periodo, **parametros))
+        self.assertEqual(len(consultas.captured_queries), 1)
+        return {linha['tamanho__numero']: (linha['pd'], linha['pe'], linha['pares'], linha['fichas']) for linha in linhas}
+
+    def test_soma_e_ultima_contagem(self):
+        self.assertEqual(self._por_numero(), {'37': (5, 6, 5, 2), '38': (12, 2, 2, 2)})
+        self.assertEqual(
+            self._por_numero(modo=consolidacao.ULTIMA),
+            {'37': (1, 1, 1, 1), '38': (10, 0, 0, 1)},
+        )
+        self.assertEqual(self._por_numero(setor='Injetora', modo=consolidacao.ULTIMA)['38'], (2, 2, 2, 1))
+
+    def test_tela_api_e_csv(self):
+        parametros = {'data_inicio': '2025-05-01', 'data_fim': '2025-05-31', 'setor': 'Injetora'}
+        response = self.client.get(reverse('inventario_consolidado'), parametros)
+        self.assertEqual(response.context['totais'], {'pd': 7, 'pe': 8, 'pares': 7, 'itens': 2})
+        self.assertEqual(response.context['setores'], ['Costura', 'Injetora'])
+
+        arvore = self.client.get(reverse('api_inventario_consolidado'), parametros).json()
+        self.assertEqual(arvore['modelos'][0]['cores'][0]['pares'], 7)
+
+        response = self.client.get(reverse('exportar_inventario_consolidado_csv'), parametros)
+        linhas = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(linhas[1:], ['Tênis;Branco;37;2;03/05/2025;5;6;5', 'Tênis;Branco;38;1;01/05/2025;2;2;2'])
+
+        self.client.login(username='operador_consolidado', password='senha')
+        self.assertEqual(self.client.get(reverse('api_inventario_consolidado')).status_code, 403)
+
+
+class ComparacaoInventarioTests(TestCase):
+    """Diferenças entre duas fichas de inventário numa única consulta agrupada"""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create_user('operador_comparacao', password='senha')
+        PerfilUsuario.objects.create(user=usuario, tipo='operador')
+        modelo = ModeloCalcado.objects.create(nome='Tênis')
+        cor = Cor.objects.create(nome='Branco')
+        tamanhos = {numero: TamanhoModelo.objects.create(modelo=modelo, cor=cor, numero=numero) for numero in ('36', '37', '38', '39')}
+        self.antes = FichaInventario.objects.create(operador=usuario, data=date(2025, 5, 5), nome_ficha='Segunda')
+        self.depois = FichaInventario.objects.create(operador=usuario, data=date(2025, 5, 9), nome_ficha='Sexta')
+        # 36 igual, 37 alterado, 38 removido, 39 adicionado
+        for ficha, contagem in (
+            (self.antes, {'36': (2, 2), '37': (5, 5), '38': (1, 3)}),
+            (self.depois, {'36': (2, 2), '37': (4, 6), '39': (3, 3)}),
+        ):
+            for numero, (pd, pe) in contagem.items():
+                ItemInventario.objects.create(
+                    ficha=ficha, modelo=modelo, cor=cor, tamanho=tamanhos[numero],
+                    quantidade_pe_direito=pd, quantidade_pe_esquerdo=pe,
+                )
+        self.client.login(username='operador_comparacao', password='senha')
+
+    def _linhas(self, situacao='diferencas', filtros=None):
+        with CaptureQueriesContext(connection) as consultas:
+            linhas = list(comparacao.linhas(self.antes, self.depois, filtros, situacao))
+        self.assertEqual(len(consultas.captured_queries), 1)
+        return {linha['tamanho__numero']: linha for linha in linhas}
+
+    def test_situacoes_e_diferencas(self):
+        linhas = self._linhas()
+        self.assertEqual(
+            {numero: linha['situacao'] for numero, linha in linhas.items()},
+            {'37': comparacao.ALTERADO, '38': comparacao.REMOVIDO, '39': comparacao.ADICIONADO},
+        )
+        alterado = linhas['37']
+        self.assertEqual((alterado['delta_pd'], alterado['delta_pe'], alterado['delta_pares']), (-1, 1, -1))
+        self.assertEqual((alterado['avulsos_a'], alterado['avulsos_b']), (0, 2))
+        self.assertEqual((linhas['38']['delta_pd'], linhas['38']['pe_b']), (-1, 0))
+
+        self.assertEqual(len(self._linhas('todos')), 4)
+        self.assertEqual(set(self._linhas('avulsos')), {'37', '38'})
+        self.assertEqual(set(self._linhas(comparacao.ADICIONADO)), {'39'})
+        self.assertEqual(set(self._linhas('todos', {'modelo': None, 'cor': None, 'numero': '36'})), {'36'})
+
+    def test_paginacao_por_cursor(self):
+        fabrica = RequestFactory()
+        numeros, parametros = [], {}
+        while True:
+            pagina = paginar(fabrica.get('/', parametros), comparacao.linhas(self.antes, self.depois, situacao='todos'), 3, ordem=comparacao.ORDEM)
+            numeros += [linha['tamanho__numero'] for linha in pagina]
+            if not pagina.url_proxima:
+                break
+            parametros = QueryDict(pagina.url_proxima[1:])
+        self.assertEqual(numeros, ['36', '37', '38', '39'])
+
+    def test_tela_api_e_csv(self):
+        url = reverse('comparar_fichas_inventario', args=[self.antes.id])
+        self.assertIsNone(self.client.get(url).context['outra'])
+        response = self.client.get(url, {'com': self.depois.id, 'situacao': 'alterado'})
+        self.assertEqual([linha['tamanho__numero'] for linha in response.context['linhas']], ['37'])
+
+        dados = self.client.get(reverse('api_comparar_fichas_inventario', args=[self.antes.id]), {'com': self.depois.id}).json()
+        self.assertEqual([item['situacao'] for item in dados['itens']], ['alterado', 'removido', 'adicionado'])
+        self.assertIsNone(dados['url_proxima'])
+
+        response = self.client.get(reverse('exportar_comparacao_inventario_csv', args=[self.antes.id]), {'com': self.depois.id})
+        linhas = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(linhas[1], 'Tênis;Branco;37;alterado;5;5;4;6;-1;1;-1;0;2')
+
+
+class CacheAplicacaoTests(TestCase):
+    """Fachada qualidade/cache.py: namespaces versionados e trava de recálculo"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidacao_por_namespace(self):
+        self.assertEqual(cache_app.obter('teste', ('a',), lambda: 1), 1)
+        self.assertEqual(cache_app.obter('teste', ('a',), lambda: 2), 1)
+        self.assertEqual(cache_app.obter('outro', ('a',), lambda: 3), 3)
+
+        cache_app.invalidar('teste')
+        self.assertEqual(cache_app.obter('teste', ('a',), lambda: 4), 4)
+        self.assertEqual(cache_app.obter('outro', ('a',), lambda: 5), 3)
+
+    def test_um_recalculo_por_vez(self):
+        chamadas = []
+
+        def calcular():
+            chamadas.append(1)
+            time.sleep(0.2)
+            return 'valor'
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            valores = list(executor.map(lambda _: cache_app.obter('lento', (), calcular), range(5)))
+        self.assertEqual(valores, ['valor'] * 5)
+        self.assertEqual(len(chamadas), 1)
+
+    def test_signal_invalida_filtros_do_relatorio(self):
+        from .views.relatorios import _opcoes_filtros
+        cache_app.obter('filtros_relatorio', (), _opcoes_filtros)
+        with self.captureOnCommitCallbacks(execute=True):
+            ParteCalcado.objects.create(nome='Palmilha')
+        partes = cache_app.obter('filtros_relatorio', (), _opcoes_filtros)['partes']
+        self.assertIn('Palmilha', [parte.nome for parte in partes])
+
+
+class PaginacaoCursorTests(TestCase):
+    """Paginação por cursor da home: sem OFFSET, sem páginas repetidas ou puladas"""
+
+    def setUp(self):
+        usuario = User.objects.create_user('qualidade_pagina', password='senha')
+        PerfilUsuario.objects.create(user=usuario, tipo='qualidade')
+        for i in range(30):
+            # Datas repetidas: o desempate por criada_em/id precisa ser estável
+            Ficha.objects.create(operador=usuario, data=date(2025, 1, 1 + i % 3), nome_ficha=f'F{i}', setor='Corte')
+        self.client.login(username='qualidade_pagina', password='senha')
+
+    def test_percorre_todas_as_fichas(self):
+        esperado = list(Ficha.objects.order_by('-data', '-criada_em', 'id').values_list('id', flat=True))
+        vistos, paginas, url = [], [], reverse('home')
+        while url:
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(url if url.startswith('/') else reverse('home') + url)
+            self.assertFalse([q for q in consultas.captured_queries if 'OFFSET' in q['sql'].upper()])
+            pagina = response.context['fichas']
+            paginas.append([ficha.id for ficha in pagina])
+            vistos.extend(paginas[-1])
+            url = pagina.url_proxima
+        self.assertEqual(vistos, esperado)
+        self.assertEqual(len(paginas), 3)
+
+        anterior = self.client.get(reverse('home') + pagina.url_anterior).context['fichas']
+        self.assertEqual([ficha.id for ficha in anterior], paginas[1])
+        self.assertTrue(anterior.tem_anterior and anterior.tem_proxima)
+        self.assertEqual(anterior.contagem_aproximada, 30)
+
+    def test_cursor_invalido_volta_ao_inicio(self):
+        pagina = self.client.get(reverse('home'), {'depois': 'lixo!'}).context['fichas']
+        self.assertFalse(pagina.tem_anterior)
+        self.assertEqual(len(pagina), 12)
+
+
+class PlanoConsultasTests(TestCase):
+    """
+    As consultas quentes das listagens usam índice (EXPLAIN), nunca varredura
+    completa da tabela principal. No PostgreSQL o seq scan é desligado para
+    que o planejador revele se existe um índice utilizável.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.operadores = [User.objects.create_user(f'operador_plano{i}') for i in range(3)]
+        cls.inicio = date(2024, 1, 1)
+        Ficha.objects.bulk_create([
+            Ficha(
+                operador=cls.operadores[i % 3], data=cls.inicio + timedelta(days=i % 120),
+                nome_ficha=f'Ficha {i % 15}', setor=('Corte', 'Costura', 'Montagem')[i % 3], excluido=i % 10 == 0,
+            )
+            for i in range(600)
+        ])
+        FichaInventario.objects.bulk_create([
+            FichaInventario(operador=cls.operadores[i % 3], data=cls.inicio + timedelta(days=i % 120), nome_ficha=f'Inv {i}')
+            for i in range(300)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _plano(self, queryset):
+        sql, parametros = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', parametros)
+                return cursor.fetchone()[0]
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', parametros)
+            return [linha[-1] for linha in cursor.fetchall()]
+
+    def _varreduras(self, plano, tabela):
+        if connection.vendor == 'postgresql':
+            if isinstance(plano, str):
+                plano = json.loads(plano)
+            pendentes, encontradas = [plano[0]['Plan']], []
+            while pendentes:
+                no = pendentes.pop()
+                if no['Node Type'] == 'Seq Scan' and no.get('Relation Name') == tabela:
+                    encontradas.append(no)
+                pendentes.extend(no.get('Plans', []))
+            return encontradas
+        # SQLite: "SCAN tabela" sem "USING ... INDEX" é leitura da tabela inteira
+        return [linha for linha in plano if linha.split()[:2] == ['SCAN', tabela] and 'INDEX' not in linha]
+
+    def assertUsaIndice(self, queryset, modelos=None):
+        plano = self._plano(queryset)
+        for modelo in modelos or [queryset.model]:
+            tabela = modelo._meta.db_table
+            self.assertFalse(self._varreduras(plano, tabela), f'Varredura completa de {tabela}: {plano}')
+
+    def assertBuscaNoIndice(self, queryset, modelos=None):
+        """Além de usar índice, o acesso começa numa faixa dele (página do cursor), sem percorrê-lo do início"""
+        self.assertUsaIndice(queryset, modelos)
+        plano = self._plano(queryset)
+        for modelo in modelos or [queryset.model]:
+            tabela = modelo._meta.db_table
+            if connection.vendor == 'postgresql':
+                plano_json = json.loads(plano) if isinstance(plano, str) else plano
+                pendentes, condicoes = [plano_json[0]['Plan']], []
+                while pendentes:
+                    no = pendentes.pop()
+                    if no.get('Relation Name') == tabela and no.get('Index Cond'):
+                        condicoes.append(no['Index Cond'])
+                    pendentes.extend(no.get('Plans', []))
+                self.assertTrue(condicoes, f'Índice de {tabela} percorrido sem condição: {plano}')
+            else:
+                buscas = [linha for linha in plano if linha.split()[:2] == ['SEARCH', tabela]]
+                self.assertTrue(buscas, f'Índice de {tabela} percorrido desde o início: {plano}')
+
+    def _pagina_do_cursor(self, consulta, ordem, valores, limite=13):
+        return consulta.filter(_depois_de(ordem, valores)).order_by(*ordem)[:limite]
+
+    def test_home(self):
+        ativas = Ficha.objects.filter(excluido=False)
+        self.assertUsaIndice(ativas.order_by(*ORDEM_FICHAS)[:13])
+        self.assertUsaIndice(ativas.filter(setor='Corte').order_by(*ORDEM_FICHAS)[:13])
+        self.assertUsaIndice(ativas.filter(operador=self.operadores[0]).order_by(*ORDEM_FICHAS)[:13])
+        self.assertUsaIndice(FichaInventario.objects.filter(excluido=False).order_by(*ORDEM_FICHAS)[:13])
+        self.assertUsaIndice(
+            FichaInventario.objects.filter(excluido=False, operador=self.operadores[0]).order_by(*ORDEM_FICHAS)[:13]
+        )
+
+    def test_home_pagina_do_cursor(self):
+        # Página funda: a busca começa no cursor (data <= cursor), não no topo do índice
+        cursor = [self.inicio + timedelta(days=60), timezone.now(), 0]
+        ativas = Ficha.objects.filter(excluido=False)
+        self.assertBuscaNoIndice(self._pagina_do_cursor(ativas, ORDEM_FICHAS, cursor))
+        self.assertBuscaNoIndice(self._pagina_do_cursor(ativas.filter(setor='Corte'), ORDEM_FICHAS, cursor))
+        self.assertBuscaNoIndice(
+            self._pagina_do_cursor(FichaInventario.objects.filter(excluido=False), ORDEM_FICHAS, cursor)
+        )
+
+    def test_telas(self):
+        self.assertUsaIndice(Ficha.objects.filter(data=self.inicio, excluido=False).values('nome_ficha'))
+        self.assertUsaIndice(ProducaoDiaria.objects.filter(data=self.inicio).values('nome_ficha'))
+
+    def test_relatorios(self):
+        fim = self.inicio + timedelta(days=6)
+        self.assertUsaIndice(linhas_producao(self.inicio, fim))
+        self.assertUsaIndice(
+            Ficha.objects.filter(excluido=False).order_by('nome_ficha').values_list('nome_ficha', flat=True).distinct()
+        )
+        self.assertUsaIndice(Ficha.objects.filter(data__gte=self.inicio, data__lte=fim))
+
+    def test_lixeira_fichas(self):
+        ficha, inventario = consultas_lixeira_fichas()
+        uniao = ficha.order_by().union(inventario.order_by(), all=True).order_by(*ORDEM_LIXEIRA_FICHAS)[:25]
+        self.assertUsaIndice(uniao, [Ficha, FichaInventario])
+
+    def test_lixeira_fichas_pagina_do_cursor(self):
+        # Cursor dentro de cada ramo da união (paginar_uniao): cada um busca a partir de excluido_em
+        cursor = [timezone.now() - timedelta(days=1), 'Ficha', 0]
+        ramos = [
+            consulta.filter(_depois_de(ORDEM_LIXEIRA_FICHAS, cursor)).order_by()
+            for consulta in consultas_lixeira_fichas()
+        ]
+        uniao = ramos[0].union(ramos[1], all=True).order_by(*ORDEM_LIXEIRA_FICHAS)[:25]
+        self.assertBuscaNoIndice(uniao, [Ficha, FichaInventario])
+
+    def test_editar_ficha_inventario(self):
+        ficha = FichaInventario.objects.first()
+        self.assertUsaIndice(ItemInventario.objects.filter(ficha=ficha).select_related('modelo', 'cor', 'tamanho'))
+        self.assertUsaIndice(TamanhoModelo.objects.filter(modelo_id=1, cor_id=1, ativo=True, excluido=False))
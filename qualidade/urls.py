@@ -6,8 +6,13 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('telas/', views.telas, name= 'telas'),
+    path('telas/stream/', views.telas_stream, name='telas_stream'),
+    path('telas/eventos/', views.telas_eventos, name='telas_eventos'),
     path('relatorios/', views.relatorios, name='relatorios'),
     path('relatorios/gerar-pdf/', views.gerar_relatorio_periodo, name='gerar_relatorio_periodo'),
+    path('relatorios/exportar-csv/', views.exportar_relatorio_periodo_csv, name='exportar_relatorio_periodo_csv'),
+    path('relatorios/jobs/<int:job_id>/', views.status_relatorio_job, name='status_relatorio_job'),
+    path('relatorios/jobs/<int:job_id>/download/', views.baixar_relatorio_job, name='baixar_relatorio_job'),
     path('partes/', views.gerenciar_partes, name='gerenciar_partes'),
     path('partes/lixeira/', views.lixeira_partes, name='lixeira_partes'),
     path('operadores/', views.gerenciar_operadores, name='gerenciar_operadores'),
@@ -21,6 +26,7 @@ urlpatterns = [
     path('ficha/<int:ficha_id>/adicionar-parte/', views.adicionar_parte_ficha, name='adicionar_parte_ficha'),
     path('ficha/<int:ficha_id>/remover-parte/<int:parte_id>/', views.remover_parte_ficha, name='remover_parte_ficha'),
     path('ficha/<int:ficha_id>/parte/<int:parte_id>/adicionar/', views.adicionar_quantidade, name='adicionar_quantidade'),
+    path('ficha/<int:ficha_id>/quantidades/lote/', views.adicionar_quantidades_lote, name='adicionar_quantidades_lote'),
     path('ficha/<int:ficha_id>/parte/<int:parte_id>/remover/', views.remover_quantidade, name='remover_quantidade'),
     # URLs de Inventário (INJETORA)
     path('inventario/criar/', views.inventario.criar_ficha_inventario, name='criar_ficha_inventario'),
@@ -32,10 +38,23 @@ urlpatterns = [
     path('inventario/cores/lixeira/', views.lixeira_cores, name='lixeira_cores'),
     path("inventario/item/<int:item_id>/remover/", views.remover_item_inventario, name="remover_item_inventario"),
     path("inventario/item/<int:item_id>/atualizar/", views.atualizar_quantidade_item, name="atualizar_quantidade_item"),
+    path('inventario/consolidado/', views.inventario_consolidado, name='inventario_consolidado'),
+    path('inventario/consolidado/csv/', views.exportar_inventario_consolidado_csv, name='exportar_inventario_consolidado_csv'),
+    path('inventario/<int:ficha_id>/comparar/', views.comparar_fichas_inventario, name='comparar_fichas_inventario'),
+    path('inventario/<int:ficha_id>/comparar/csv/', views.exportar_comparacao_inventario_csv, name='exportar_comparacao_inventario_csv'),
     path("inventario/<int:ficha_id>/relatorio/",views.gerar_relatorio_ficha_inventario,name="gerar_relatorio_ficha_inventario",),
     # APIs para inventário
     path('api/get_cores/<int:id_modelo>/', views.get_cores, name='api_cores'),
     path('api/get_tamanhos/<int:id_cor>/', views.get_tamanhos, name='api_tamanhos'),
+    path('api/catalogo/', views.catalogo_inventario, name='catalogo_inventario'),
+    path('api/inventario/item/<int:item_id>/atualizar/', views.api_atualizar_item, name='api_atualizar_item'),
+    path('api/inventario/item/<int:item_id>/remover/', views.api_remover_item, name='api_remover_item'),
+    path('api/inventario/consolidado/', views.api_inventario_consolidado, name='api_inventario_consolidado'),
+    path('api/inventario/<int:ficha_id>/comparar/', views.api_comparar_fichas_inventario, name='api_comparar_fichas_inventario'),
+    path('api/inventario/<int:ficha_id>/grade/', views.lancar_grade_inventario, name='lancar_grade_inventario'),
+    # Fila offline das telas de edição
+    path('api/sincronizar/', views.sincronizar_operacoes, name='sincronizar_operacoes'),
+    path('sw.js', views.service_worker, name='service_worker'),
     # Gerenciamento de modelos (apenas qualidade)
     path('modelos/', views.inventario.gerenciar_modelos, name='gerenciar_modelos'),
 ]
@@ -37,6 +37,9 @@ __all__ = [
     'adicionar_parte_ficha',
     'remover_parte_ficha',
     'adicionar_quantidade',
+    'adicionar_quantidades_lote',
+    'sincronizar_operacoes',
+    'service_worker',
     'remover_quantidade',
     'api_cores_por_modelo',
     'api_tamanhos_por_modelo_e_cor',
@@ -45,14 +48,27 @@ __all__ = [
     'api_adicionar_item_inventario',
     'get_cores',
     'get_tamanhos',
+    'catalogo_inventario',
+    'lancar_grade_inventario',
+    'api_inventario_consolidado',
+    'api_comparar_fichas_inventario',
     
     # Relatórios
     'relatorios',
     'gerar_relatorio',
     'gerar_relatorio_periodo',
+    'exportar_relatorio_periodo_csv',
+    'inventario_consolidado',
+    'exportar_inventario_consolidado_csv',
+    'comparar_fichas_inventario',
+    'exportar_comparacao_inventario_csv',
+    'status_relatorio_job',
+    'baixar_relatorio_job',
     
     # Dashboard
     'telas',
+    'telas_stream',
+    'telas_eventos',
 
     #Inventário
     'criar_ficha_inventario',
@@ -2,12 +2,17 @@
 """
 Endpoints AJAX/API para manipulação de dados
 """
-from django.shortcuts import get_object_or_404
+from django.shortcuts import get_object_or_404, render
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.db import transaction
 import json
 
 from ..models import Ficha, ParteCalcado, RegistroParte, ModeloCalcado, Cor, ItemInventario, FichaInventario, TamanhoModelo
+from .. import catalogo, comparacao, consolidacao, facetas, sincronizacao
+from ..grade import GradeInvalida, lancar_inventario
+from ..paginacao import paginar
 
 
 @login_required
@@ -19,7 +24,7 @@ def adicionar_parte_ficha(request, ficha_id):
     ficha = get_object_or_404(Ficha, id=ficha_id)
     
     # Verificar permissão
-    if request.user.perfil.tipo == 'operador' and ficha.operador != request.user:
+    if request.qualidade_ctx.tipo == 'operador' and ficha.operador != request.user:
         return JsonResponse({'error': 'Sem permissão'}, status=403)
     
     try:
@@ -43,8 +48,7 @@ def adicionar_parte_ficha(request, ficha_id):
         # Criar registro
         registro = RegistroParte.objects.create(
             ficha=ficha,
-            parte=parte,
-            quantidades=[]
+            parte=parte
         )
         
         return JsonResponse({
@@ -63,15 +67,16 @@ def remover_parte_ficha(request, ficha_id, parte_id):
     if request.method != 'POST':
         return JsonResponse({'error': 'Método não permitido'}, status=405)
     
-    ficha = get_object_or_404(Ficha, id=ficha_id)
+    ficha = get_object_or_404(Ficha.objects.select_related('operador'), id=ficha_id)
     
     # Verificar permissão
-    if request.user.perfil.tipo == 'operador' and ficha.operador != request.user:
+    if request.qualidade_ctx.tipo == 'operador' and ficha.operador != request.user:
         return JsonResponse({'error': 'Sem permissão'}, status=403)
     
     try:
-        registro = RegistroParte.objects.get(ficha=ficha, parte_id=parte_id)
+        registro = RegistroParte.objects.select_related('parte', 'ficha').get(ficha=ficha, parte_id=parte_id)
         parte_nome = registro.parte.nome
+        registro.ficha = ficha
         registro.delete()
         
         return JsonResponse({
@@ -91,13 +96,17 @@ def adicionar_quantidade(request, ficha_id, parte_id):
     if request.method != 'POST':
         return JsonResponse({'error': 'Método não permitido'}, status=405)
     
-    ficha = get_object_or_404(Ficha, id=ficha_id)
-    parte = get_object_or_404(ParteCalcado, id=parte_id)
+    ficha = get_object_or_404(Ficha.objects.select_related('operador'), id=ficha_id)
     
     # Verificar permissão
-    if request.user.perfil.tipo == 'operador' and ficha.operador != request.user:
+    if request.qualidade_ctx.tipo == 'operador' and ficha.operador != request.user:
         return JsonResponse({'error': 'Sem permissão'}, status=403)
     
+    # Registro já existente traz a parte junto; a parte só é consultada no primeiro lançamento
+    registro = RegistroParte.objects.select_related('parte').filter(ficha=ficha, parte_id=parte_id).first()
+    if registro is None:
+        parte = get_object_or_404(ParteCalcado, id=parte_id)
+    
     try:
         data = json.loads(request.body)
         quantidade = int(data.get('quantidade', 0))
@@ -106,48 +115,142 @@ def adicionar_quantidade(request, ficha_id, parte_id):
             return JsonResponse({'error': 'Quantidade deve ser maior que zero'}, status=400)
         
         # Buscar ou criar registro
-        registro, created = RegistroParte.objects.get_or_create(
-            ficha=ficha,
-            parte=parte,
-            defaults={'quantidades': []}
-        )
+        if registro is None:
+            registro, created = RegistroParte.objects.get_or_create(
+                ficha=ficha,
+                parte=parte
+            )
+        registro.ficha = ficha
         
         # Adicionar quantidade
-        registro.adicionar_quantidade(quantidade)
+        registro.adicionar_quantidade(quantidade, request.user)
         
         return JsonResponse({
             'success': True,
-            'quantidades': registro.quantidades,
-            'total': registro.total()
+            'quantidades': registro.quantidades_lancadas,
+            'total': registro.total
         })
     
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
 
+def _operacoes_lote(data):
+    """Valida as operações do lote e junta as da mesma parte: {parte_id: [quantidades]}"""
+    operacoes = data.get('operacoes')
+    if not isinstance(operacoes, list) or not operacoes:
+        raise ValueError('Nenhuma operação enviada')
+
+    por_parte = {}
+    for operacao in operacoes:
+        parte_id = int(operacao['parte_id'])
+        quantidades = [int(quantidade) for quantidade in operacao.get('quantidades', [])]
+        if any(quantidade <= 0 for quantidade in quantidades):
+            raise ValueError('Quantidade deve ser maior que zero')
+        por_parte.setdefault(parte_id, []).extend(quantidades)
+    return por_parte
+
+
+@login_required
+def adicionar_quantidades_lote(request, ficha_id):
+    """API para adicionar várias quantidades (de uma ou mais partes) em uma requisição"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+    
+    ficha = get_object_or_404(Ficha.objects.select_related('operador'), id=ficha_id)
+    
+    # Verificar permissão (uma vez para o lote inteiro)
+    if request.qualidade_ctx.tipo == 'operador' and ficha.operador != request.user:
+        return JsonResponse({'error': 'Sem permissão'}, status=403)
+    
+    try:
+        por_parte = _operacoes_lote(json.loads(request.body))
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        return JsonResponse({'error': str(e) or 'Operações inválidas'}, status=400)
+    
+    registros = {
+        registro.parte_id: registro
+        for registro in RegistroParte.objects.select_related('parte').filter(ficha=ficha, parte_id__in=por_parte)
+    }
+    faltando = set(por_parte) - set(registros)
+    partes = ParteCalcado.objects.in_bulk(faltando)
+    if len(partes) != len(faltando):
+        return JsonResponse({'error': 'Parte não encontrada'}, status=404)
+    
+    try:
+        # Tudo ou nada: o lote inteiro em uma transação
+        with transaction.atomic():
+            for parte_id, parte in partes.items():
+                registros[parte_id], created = RegistroParte.objects.get_or_create(
+                    ficha=ficha,
+                    parte=parte
+                )
+            
+            for parte_id, quantidades in por_parte.items():
+                registro = registros[parte_id]
+                registro.ficha = ficha
+                registro.adicionar_quantidades(quantidades, request.user)
+    
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'registros': {
+            parte_id: {'quantidades': registro.quantidades_lancadas, 'total': registro.total}
+            for parte_id, registro in registros.items()
+        }
+    })
+
+
+@login_required
+def sincronizar_operacoes(request):
+    """API da fila offline: aplica operações com chave de idempotência, em lote"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+    
+    try:
+        operacoes = json.loads(request.body).get('operacoes')
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    
+    if not isinstance(operacoes, list) or not all(isinstance(operacao, dict) for operacao in operacoes):
+        return JsonResponse({'error': 'Operações inválidas'}, status=400)
+    if len(operacoes) > sincronizacao.LIMITE_LOTE:
+        return JsonResponse({'error': f'Máximo de {sincronizacao.LIMITE_LOTE} operações por lote'}, status=400)
+    
+    return JsonResponse({'resultados': sincronizacao.sincronizar(request.user, operacoes, request.qualidade_ctx.tipo)})
+
+
+def service_worker(request):
+    """Service worker da fila offline, servido na raiz para controlar todas as páginas"""
+    response = render(request, 'qualidade/sw.js', content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 @login_required
 def remover_quantidade(request, ficha_id, parte_id):
     """API para remover última quantidade via AJAX"""
     if request.method != 'POST':
         return JsonResponse({'error': 'Método não permitido'}, status=405)
     
-    ficha = get_object_or_404(Ficha, id=ficha_id)
+    ficha = get_object_or_404(Ficha.objects.select_related('operador'), id=ficha_id)
     
     # Verificar permissão
-    if request.user.perfil.tipo == 'operador' and ficha.operador != request.user:
+    if request.qualidade_ctx.tipo == 'operador' and ficha.operador != request.user:
         return JsonResponse({'error': 'Sem permissão'}, status=403)
     
     try:
-        registro = RegistroParte.objects.get(ficha=ficha, parte_id=parte_id)
+        registro = RegistroParte.objects.select_related('parte').get(ficha=ficha, parte_id=parte_id)
+        registro.ficha = ficha
         
-        if registro.quantidades:
-            registro.quantidades.pop()
-            registro.save()
+        registro.remover_ultima_quantidade()
         
         return JsonResponse({
             'success': True,
-            'quantidades': registro.quantidades,
-            'total': registro.total()
+            'quantidades': registro.quantidades_lancadas,
+            'total': registro.total
         })
     
     except RegistroParte.DoesNotExist:
@@ -158,21 +261,138 @@ def remover_quantidade(request, ficha_id, parte_id):
 
 ## API'S DAS FICHAS DE INVENTÁRIO ##
 
+def _totais_ficha(ficha_id, versao):
+    """Totais da ficha inteira pelas facetas (cache pela versão que acabou de ser gravada)"""
+    totais = facetas.calcular(FichaInventario(id=ficha_id, atualizada_em=versao))
+    return {campo: totais[campo] for campo in ('total_itens', 'total_pd', 'total_pe', 'total_pares')}
+
+
 @login_required
 def api_atualizar_item(request, item_id):
+    """
+    Botões +/- da ficha de inventário (mesmos campos acao/lado/valor do
+    formulário): UPDATE condicional e resposta com PD/PE e totais novos.
+    """
     if request.method != 'POST':
-        return JsonResponse({'success': False})
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+    if request.qualidade_ctx.tipo != 'operador':
+        return JsonResponse({'error': 'Sem permissão'}, status=403)
+
+    campo = ItemInventario.CAMPOS_LADO.get(request.POST.get('lado'))
+    acao = request.POST.get('acao')
+    try:
+        valor = int(request.POST.get('valor'))
+    except (TypeError, ValueError):
+        valor = -1
+    if campo is None or acao not in ('adicionar', 'subtrair') or valor < 0:
+        return JsonResponse({'error': 'Quantidade inválida.'}, status=400)
 
-    item = get_object_or_404(ItemInventario, id=item_id)
-    quantidade = int(request.POST.get('quantidade', 0))
+    alterado = ItemInventario.ajustar_quantidade(item_id, campo, valor if acao == 'adicionar' else -valor)
+    if alterado is None:
+        if not ItemInventario.objects.filter(id=item_id).exists():
+            return JsonResponse({'error': 'Item não encontrado'}, status=404)
+        return JsonResponse({'error': 'A quantidade não pode ficar negativa.'}, status=400)
 
-    if quantidade < 0:
-        return JsonResponse({'success': False, 'message': 'Quantidade inválida'})
+    return JsonResponse({
+        'success': True,
+        'quantidade_pe_direito': alterado['quantidade_pe_direito'],
+        'quantidade_pe_esquerdo': alterado['quantidade_pe_esquerdo'],
+        'pares': min(alterado['quantidade_pe_direito'], alterado['quantidade_pe_esquerdo']),
+        'totais': _totais_ficha(alterado['ficha_id'], alterado['ficha_atualizada_em']),
+    })
 
-    item.quantidade = quantidade
-    item.save()
 
-    return JsonResponse({'success': True})
+@login_required
+def api_remover_item(request, item_id):
+    """Remove o item da ficha de inventário e devolve os totais novos"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+    if request.qualidade_ctx.tipo != 'operador':
+        return JsonResponse({'error': 'Sem permissão'}, status=403)
+
+    # Ficha na lixeira não aceita alterações (como em lancar_grade_inventario)
+    item = get_object_or_404(
+        ItemInventario.objects.only('id', 'ficha_id').filter(ficha__in=FichaInventario.ativos.values('id')),
+        id=item_id,
+    )
+    item.delete()
+    ficha = FichaInventario.objects.only('id', 'atualizada_em').get(id=item.ficha_id)
+    return JsonResponse({'success': True, 'totais': _totais_ficha(ficha.id, ficha.atualizada_em)})
+
+
+@login_required
+def lancar_grade_inventario(request, ficha_id):
+    """
+    API da grade de contagem: recebe {modelo_id, cor_id, linhas: [{tamanho_id
+    ou numero, quantidade_pe_direito, quantidade_pe_esquerdo}]} e grava todos
+    os números num único upsert; devolve o resumo e os novos totais da ficha.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+    if request.qualidade_ctx.tipo != 'operador':
+        return JsonResponse({'error': 'Sem permissão'}, status=403)
+
+    ficha = get_object_or_404(FichaInventario.ativos, id=ficha_id)
+
+    try:
+        data = json.loads(request.body)
+        modelo_id, cor_id = int(data['modelo_id']), int(data['cor_id'])
+        linhas = data['linhas']
+        if not isinstance(linhas, list):
+            raise TypeError
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    try:
+        resumo = lancar_inventario(ficha, modelo_id, cor_id, linhas)
+    except GradeInvalida as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    totais = facetas.calcular(ficha)
+    return JsonResponse({
+        'success': True,
+        **resumo,
+        'totais': {campo: totais[campo] for campo in ('total_itens', 'total_pd', 'total_pe', 'total_pares')},
+    })
+
+
+@login_required
+def api_inventario_consolidado(request):
+    """Inventário consolidado em JSON: modelo → cores → tamanhos, com subtotais (apenas qualidade)"""
+    if request.qualidade_ctx.tipo != 'qualidade':
+        return JsonResponse({'error': 'Sem permissão'}, status=403)
+
+    parametros = consolidacao.ler_parametros(request.GET)
+    modelos, totais = consolidacao.arvore(consolidacao.linhas(**parametros))
+    return JsonResponse({
+        'data_inicio': parametros['data_inicio'].isoformat(),
+        'data_fim': parametros['data_fim'].isoformat(),
+        'setor': parametros['setor'],
+        'modo': parametros['modo'],
+        'totais': totais,
+        'modelos': modelos,
+    })
+
+
+@login_required
+def api_comparar_fichas_inventario(request, ficha_id):
+    """Comparação de duas fichas de inventário em JSON, paginada por cursor (mesmos parâmetros da tela)"""
+    ficha = get_object_or_404(FichaInventario, id=ficha_id)
+    outra = comparacao.segunda_ficha(ficha, request.GET)
+    if outra is None:
+        return JsonResponse({'error': 'Informe a ficha para comparar (?com=)'}, status=400)
+
+    linhas = comparacao.linhas(
+        ficha, outra, facetas.ler_filtros(request.GET), comparacao.ler_situacao(request.GET)
+    )
+    pagina = paginar(request, linhas, 100, ordem=comparacao.ORDEM)
+    return JsonResponse({
+        'ficha_id': ficha.id,
+        'com': outra.id,
+        'itens': pagina.itens,
+        'url_anterior': pagina.url_anterior,
+        'url_proxima': pagina.url_proxima,
+    })
 
 
 def get_cores(request, id_modelo):
@@ -204,3 +424,25 @@ def get_tamanhos(request, id_cor):
 
     return JsonResponse({"tamanhos": data})
 
+
+@login_required
+def catalogo_inventario(request):
+    """
+    Árvore modelo → cor → tamanho do formulário de inventário num só JSON.
+
+    Com ?v=<versão atual> a resposta é imutável e o navegador nem pergunta de
+    novo; sem ela (ou com versão antiga) revalida pelo ETag.
+    """
+    documento = catalogo.obter()
+    versao = documento['versao']
+    etag = f'"{versao}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(documento['conteudo'], content_type='application/json')
+    response['ETag'] = etag
+    if request.GET.get('v') == versao:
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
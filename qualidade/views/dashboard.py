@@ -2,62 +2,115 @@
 """
 Views para dashboard/telão de produção
 """
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Sum
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from datetime import date, datetime
 
-from ..models import Ficha
+from .. import cache
+from ..models import Ficha, ProducaoDiaria
+from ..telao import TELAO_INTERVALO, quadro, retrato_consistente, ultima_sequencia
 
+# Sob WSGI a tela pergunta de novo depois desse intervalo (segundos), sem prender a thread
+TELAO_RETRY_AFTER = getattr(settings, 'TELAO_RETRY_AFTER', 2)
+# Comentário SSE periódico para manter a conexão aberta em proxies
+TELAO_HEARTBEAT = 15
+# Vários telões abertos na mesma data compartilham a agregação por alguns segundos
+TELAO_CACHE_SEGUNDOS = getattr(settings, 'TELAO_CACHE_SEGUNDOS', 10)
 
-@login_required
-def telas(request):
-    """Tela para exibição em telão como um dashboard da produção"""
-    # Busca a data selecionada ou usar hoje
-    data_selecionada = request.GET.get('data')
-    modo = request.GET.get('modo', 'lista')
-    
+
+def _data_telao(data_selecionada):
+    """Converte o parâmetro ?data= do telão (padrão: hoje)"""
     if data_selecionada:
         try:
-            data_obj = datetime.strptime(data_selecionada, '%Y-%m-%d').date()
-        except:
-            data_obj = date.today()
-    else:
-        data_obj = date.today()
-    
-    # Buscar fichas do dia
-    fichas = Ficha.objects.filter(
-        data=data_obj,
-        excluido=False
-    ).select_related('operador').prefetch_related('registros__parte')
+            return datetime.strptime(data_selecionada, '%Y-%m-%d').date()
+        except ValueError:
+            return date.today()
+    return date.today()
+
+
+def _parse_desde(valor):
+    try:
+        return max(int(valor), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _agregar_telao(data_obj):
+    """
+    Cards do telão na data: (último evento, dados por ficha, total do dia).
+
+    A sequência e a agregação vêm do mesmo retrato do banco (os eventos são
+    gravados na transação da quantidade), então o retrato pode ser servido do
+    cache: a tela aplica exatamente os deltas posteriores a ele.
+    """
+    with retrato_consistente():
+        return _agregar_retrato(data_obj)
+
+
+def _agregar_retrato(data_obj):
+    ultimo_evento = ultima_sequencia()
+
+    # Fichas do dia (sem registros): define os cards e o operador de cada um
+    fichas = (
+        Ficha.objects.filter(data=data_obj, excluido=False)
+        .values('nome_ficha', 'operador__username', 'operador__first_name', 'operador__last_name')
+    )
     
     # Agrupar por nome da ficha
     dados_telao = {}
     
     for ficha in fichas:
-        nome_ficha = ficha.nome_ficha
-        operador_nome = ficha.operador.get_full_name() or ficha.operador.username
-        
+        nome_ficha = ficha['nome_ficha']
         if nome_ficha not in dados_telao:
+            operador_nome = f"{ficha['operador__first_name']} {ficha['operador__last_name']}".strip()
             dados_telao[nome_ficha] = {
                 'nome': nome_ficha,
-                'operador': operador_nome,
+                'operador': operador_nome or ficha['operador__username'],
                 'partes': {},
                 'total': 0
             }
-        
-        # Buscar registros
-        for registro in ficha.registros.all():
-            parte_nome = registro.parte.nome
-            total_parte = registro.total()
-            
-            if parte_nome not in dados_telao[nome_ficha]['partes']:
-                dados_telao[nome_ficha]['partes'][parte_nome] = 0
-            
-            dados_telao[nome_ficha]['partes'][parte_nome] += total_parte
-            dados_telao[nome_ficha]['total'] += total_parte
+
+    # Totais por ficha/parte lidos do rollup diário
+    producao = (
+        ProducaoDiaria.objects.filter(data=data_obj)
+        .values('nome_ficha', 'parte__nome')
+        .annotate(quantidade=Sum('quantidade'))
+        .order_by('nome_ficha', 'parte__nome')
+    )
+
+    for linha in producao:
+        dados = dados_telao.get(linha['nome_ficha'])
+        if dados is None:
+            continue
+        dados['partes'][linha['parte__nome']] = linha['quantidade']
+        dados['total'] += linha['quantidade']
     
     # Calcular total geral do dia
     total_dia = sum(item['total'] for item in dados_telao.values())
+    return ultimo_evento, dados_telao, total_dia
+
+
+@login_required
+def telas(request):
+    """Tela para exibição em telão como um dashboard da produção"""
+    # Busca a data selecionada ou usar hoje
+    data_selecionada = request.GET.get('data')
+    modo = request.GET.get('modo', 'lista')
+    
+    data_obj = _data_telao(data_selecionada)
+    
+    ultimo_evento, dados_telao, total_dia = cache.obter(
+        'telao', (data_obj.isoformat(),), lambda: _agregar_telao(data_obj), TELAO_CACHE_SEGUNDOS
+    )
     
     context = {
         'dados_telao': dados_telao,
@@ -65,5 +118,51 @@ def telas(request):
         'total_dia': total_dia,
         'data_hoje': date.today(),
         'modo': modo,
+        'ultimo_evento': ultimo_evento,
     }
-    return render(request, 'qualidade/telas.html', context)
\ No newline at end of file
+    return render(request, 'qualidade/telas.html', context)
+
+
+@login_required
+async def telas_stream(request):
+    """Stream SSE com os deltas de produção do dia (somente sob ASGI)"""
+    # Sob WSGI a conexão prenderia uma thread do gunicorn: o telão usa o polling de telas_eventos
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    data_obj = _data_telao(request.GET.get('data'))
+    desde = _parse_desde(request.headers.get('Last-Event-ID') or request.GET.get('desde'))
+
+    async def eventos():
+        ultimo = desde
+        ultimo_envio = time.monotonic()
+        yield 'retry: 3000\n\n'
+        while True:
+            novos = await sync_to_async(quadro.eventos)(data_obj, ultimo)
+            for evento in novos:
+                ultimo = evento['id']
+                yield f"id: {ultimo}\nevent: delta\ndata: {json.dumps(evento)}\n\n"
+                ultimo_envio = time.monotonic()
+            if time.monotonic() - ultimo_envio > TELAO_HEARTBEAT:
+                yield ': ping\n\n'
+                ultimo_envio = time.monotonic()
+            await asyncio.sleep(TELAO_INTERVALO)
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def telas_eventos(request):
+    """Deltas de produção do dia posteriores a ?desde= (polling para WSGI; responde na hora)"""
+    data_obj = _data_telao(request.GET.get('data'))
+    desde = _parse_desde(request.GET.get('desde'))
+
+    novos = quadro.eventos(data_obj, desde)
+    return JsonResponse({
+        'eventos': novos,
+        'ultimo': novos[-1]['id'] if novos else desde,
+        'retry_after': TELAO_RETRY_AFTER,
+    })
\ No newline at end of file
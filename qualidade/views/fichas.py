@@ -6,21 +6,22 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.db import transaction
 from django.utils import timezone
-from django.core.paginator import Paginator
 from datetime import date
 
 from ..models import Ficha, ParteCalcado, NomeOperador, FichaInventario
+from ..paginacao import paginar, paginar_uniao
+from .lixeira import ORDEM_LIXEIRA_FICHAS, aplicar_acao, consultas_lixeira_fichas, descrever, ids_fichas_selecionadas
 
 
 @login_required
 def home(request):
-    perfil = request.user.perfil
+    perfil = request.qualidade_ctx.perfil
     data_filtro = request.GET.get('data')
 
     # Grupo do usuário
-    grupo_usuario = request.user.groups.first()
-    grupo_nome = grupo_usuario.name if grupo_usuario else None
+    grupo_nome = request.qualidade_ctx.grupo
 
     # ----- FICHAS NORMAIS -----
     fichas = Ficha.objects.filter(excluido=False).select_related(
@@ -44,27 +45,28 @@ def home(request):
     if data_filtro:
         fichas = fichas.filter(data=data_filtro)
 
-    # Paginação
-    paginator = Paginator(fichas, 12)
-    page = request.GET.get("page")
-    fichas = paginator.get_page(page)
+    # Paginação por cursor: custo constante mesmo com muito histórico
+    fichas = paginar(request, fichas, 12)
 
     # ----- FICHAS DE INVENTÁRIO -----
     if grupo_nome in ["Injetora", "Qualidade"]:
         if perfil.tipo == "operador":
             fichas_inventario = FichaInventario.objects.filter(
                 operador=request.user,excluido=False
-            ).order_by("-data")
+            )
         else:
             fichas_inventario = FichaInventario.objects.filter(
                 excluido=False
-            ).order_by("-data")
+            )
+        fichas_inventario = fichas_inventario.select_related('operador')
     else:
         fichas_inventario = None  # não mostra inventário
     #--Filtro de Data--#    
     if data_filtro:
         if fichas_inventario is not None:
             fichas_inventario = fichas_inventario.filter(data=data_filtro)
+    if fichas_inventario is not None:
+        fichas_inventario = paginar(request, fichas_inventario, 12, prefixo='inv_')
 
     context = {
         "perfil": perfil,
@@ -81,12 +83,12 @@ def home(request):
 def criar_ficha(request):
 
     # Apenas operadores podem criar ficha
-    if request.user.perfil.tipo != 'operador':
+    if request.qualidade_ctx.tipo != 'operador':
         messages.error(request, 'Apenas operadores podem criar fichas')
         return redirect('home')
 
     # --- SE FOR INJETORA ---
-    if request.user.groups.filter(name='Injetora').exists():
+    if request.qualidade_ctx.no_grupo('Injetora'):
 
         if request.method == 'POST':
             nome_ficha = request.POST.get('nome_ficha')
@@ -119,11 +121,12 @@ def criar_ficha(request):
         nome_ficha = request.POST.get('nome_ficha')
         
         if data and nome_ficha:
-            ficha = Ficha.objects.create(
+            ficha = Ficha(
                 operador=request.user,
                 data=data,
                 nome_ficha=nome_ficha,
             )
+            ficha.save(setor_operador=request.qualidade_ctx.setor)
             messages.success(request, 'Ficha criada com sucesso!')
             return redirect('editar_ficha', ficha_id=ficha.id)
         else:
@@ -143,7 +146,7 @@ def editar_ficha(request, ficha_id):
     ficha = get_object_or_404(Ficha, id=ficha_id)
     
     # Verificar permissão
-    if request.user.perfil.tipo == 'operador' and ficha.operador != request.user:
+    if request.qualidade_ctx.tipo == 'operador' and ficha.operador != request.user:
         messages.error(request, 'Você não tem permissão para editar esta ficha')
         return redirect('home')
     
@@ -151,7 +154,7 @@ def editar_ficha(request, ficha_id):
     partes_disponiveis = ParteCalcado.objects.filter(ativo=True, excluido=False).order_by('ordem', 'nome')
     
     # Buscar registros existentes desta ficha
-    registros_existentes = ficha.registros.all().select_related('parte')
+    registros_existentes = ficha.registros.all().select_related('parte').prefetch_related('lancamentos')
     
     # IDs das partes já adicionadas
     partes_adicionadas_ids = list(registros_existentes.values_list('parte_id', flat=True))
@@ -161,7 +164,7 @@ def editar_ficha(request, ficha_id):
     for registro in registros_existentes:
         registros[registro.parte.id] = {
             'registro': registro,
-            'quantidades': registro.quantidades or [],
+            'quantidades': registro.quantidades_lancadas,
             'parte_nome': registro.parte.nome
         }
     
@@ -171,7 +174,7 @@ def editar_ficha(request, ficha_id):
         'registros': registros,
         'registros_existentes': registros_existentes,
         'partes_adicionadas_ids': partes_adicionadas_ids,
-        'pode_editar': request.user.perfil.tipo == 'operador' and ficha.operador == request.user,
+        'pode_editar': request.qualidade_ctx.tipo == 'operador' and ficha.operador == request.user,
     }
     return render(request, 'qualidade/editar_ficha.html', context)
 
@@ -182,22 +185,19 @@ def visualizar_ficha(request, ficha_id):
     ficha = get_object_or_404(Ficha, id=ficha_id)
     
     # Buscar todos os registros
-    registros = ficha.registros.all().select_related('parte')
-    
-    # Calcular total geral
-    total_geral = sum(registro.total() for registro in registros)
+    registros = ficha.registros.all().select_related('parte').prefetch_related('lancamentos')
     
     context = {
         'ficha': ficha,
         'registros': registros,
-        'total_geral': total_geral,
+        'total_geral': ficha.total_geral,
     }
     return render(request, 'qualidade/visualizar_ficha.html', context)
 
 
 @login_required
 def excluir_ficha(request, ficha_id):
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem excluir fichas')
         return redirect('home')
 
@@ -215,45 +215,31 @@ def excluir_ficha(request, ficha_id):
 @login_required
 def lixeira_fichas(request):
     """Lixeira de fichas (Ficha e FichaInventario)"""
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem acessar a lixeira')
         return redirect('home')
 
     if request.method == 'POST':
         acao = request.POST.get('acao')
-        ficha_id = request.POST.get('ficha_id')
-        tipo = request.POST.get('tipo')
-
-        try:
-            if tipo == 'Inventario':
-                ficha = FichaInventario.objects.get(id=ficha_id, excluido=True)
-            else:
-                ficha = Ficha.objects.get(id=ficha_id, excluido=True)
-
-            if acao == 'restaurar':
-                ficha.excluido = False
-                ficha.excluido_em = None
-                ficha.excluido_por = None
-                ficha.save()
-                messages.success(request, f'{ficha.tipo_ficha} "{ficha.nome_ficha}" restaurada com sucesso!')
-
-            elif acao == 'excluir_permanente':
-                nome = ficha.nome_ficha
-                ficha.delete()
-                messages.success(request, f'{ficha.tipo_ficha} "{nome}" excluída permanentemente!')
-
-        except (Ficha.DoesNotExist, FichaInventario.DoesNotExist):
+        nomes = []
+        rotulo = 'Ficha'
+        with transaction.atomic():
+            # Ficha: restaurar devolve a produção ao rollup (FichaQuerySet)
+            for modelo, ids in ids_fichas_selecionadas(request).items():
+                nomes += aplicar_acao(acao, modelo, ids, campo_nome='nome_ficha')
+                rotulo = 'Inventario' if modelo is FichaInventario else 'Ficha'
+
+        if not nomes:
             messages.error(request, 'Ficha não encontrada na lixeira')
+        elif acao == 'restaurar':
+            messages.success(request, descrever(nomes, rotulo + ' "{}" restaurada', 'fichas restauradas') + ' com sucesso!')
+        else:
+            messages.success(request, descrever(nomes, rotulo + ' "{}" excluída', 'fichas excluídas') + ' permanentemente!')
 
         return redirect('lixeira_fichas')
 
-    # GET → listar fichas excluídas
-    fichas_excluidas = list(Ficha.objects.filter(excluido=True)) + list(
-        FichaInventario.objects.filter(excluido=True)
-    )
-
-    # Ordenar pela data de exclusão (mais recente primeiro)
-    fichas_excluidas.sort(key=lambda f: f.excluido_em or 0, reverse=True)
+    # GET → UNION ALL das duas lixeiras, ordenado e paginado no banco
+    fichas_excluidas = paginar_uniao(request, consultas_lixeira_fichas(), 24, ORDEM_LIXEIRA_FICHAS)
 
     context = {
         'fichas': fichas_excluidas,
@@ -9,25 +9,27 @@ from django.http import JsonResponse
 from django.utils import timezone
 from datetime import date
 from django.db import models
-from django.core.paginator import Paginator
-from django.db.models import F
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q
 
 
 from ..models import (
     FichaInventario, ItemInventario, ModeloCalcado, 
     Cor, TamanhoModelo
 )
+from .. import catalogo, facetas, grade
+from ..paginacao import PaginadorComTotal, paginar
+from .lixeira import aplicar_acao_lixeira, descrever
 
 
 @login_required
 def criar_ficha_inventario(request):
     """Criar nova ficha de inventário (apenas INJETORA)"""
     # Verificar se é operador do setor INJETORA
-    if request.user.perfil.tipo != 'operador':
+    if request.qualidade_ctx.tipo != 'operador':
         messages.error(request, 'Apenas operadores podem criar fichas')
         return redirect('home')
     
-    if not request.user.groups.filter(name='INJETORA').exists():
+    if not request.qualidade_ctx.no_grupo('INJETORA'):
         messages.error(request, 'Esta funcionalidade é exclusiva do setor INJETORA')
         return redirect('home')
     
@@ -38,11 +40,12 @@ def criar_ficha_inventario(request):
         data = request.POST.get('data')
         
         if nome_ficha and data:
-            ficha = FichaInventario.objects.create(
+            ficha = FichaInventario(
                 operador=request.user,
                 data=data,
                 nome_ficha=nome_ficha
             )
+            ficha.save(setor_operador=request.qualidade_ctx.setor)
             messages.success(request, 'Ficha de inventário criada com sucesso!')
             return redirect('editar_ficha_inventario', ficha_id=ficha.id)
         else:
@@ -61,7 +64,7 @@ def editar_ficha_inventario(request, ficha_id):
     ficha = get_object_or_404(FichaInventario, id=ficha_id)
 
     # Permissão
-    pode_editar = request.user.perfil.tipo == "operador"
+    pode_editar = request.qualidade_ctx.tipo == "operador"
     if not pode_editar:
         messages.error(request, "Você não tem permissão para editar esta ficha")
         return redirect("home")
@@ -125,98 +128,45 @@ def editar_ficha_inventario(request, ficha_id):
     # -------------------------
     modelos = ModeloCalcado.objects.filter(excluido=False)
 
-    # Todos os itens da ficha (antes de filtrar)
-    itens_totais = ficha.itens.all().select_related("modelo", "cor", "tamanho")
-    
-    # Itens que serão filtrados
-    itens = itens_totais
-
     # ======================
     # FILTROS (via GET)
     # ======================
-    modelo_id = request.GET.get('modelo')
-    cor_id = request.GET.get('cor')
-    numero = request.GET.get('numero')
-
-    if modelo_id:
-        itens = itens.filter(modelo_id=modelo_id)
-
-    if cor_id:
-        itens = itens.filter(cor_id=cor_id)
-
-    if numero:
-        itens = itens.filter(tamanho__numero=numero)
+    filtros = facetas.ler_filtros(request.GET)
+    itens = facetas.filtrar_itens(ficha.itens.select_related("modelo", "cor", "tamanho"), filtros)
 
     # ======================
-    # STATS (sobre itens filtrados)
+    # OPÇÕES DOS FILTROS E STATS: uma consulta agrupada (em cache pela versão da ficha)
     # ======================
-    total_itens = itens.count()
-    total_pares = sum(
-        min(item.quantidade_pe_direito, item.quantidade_pe_esquerdo)
-        for item in itens
-    )
+    resumo = facetas.calcular(ficha, filtros)
 
     # ======================
-    # OPÇÕES PARA OS FILTROS (baseado nos filtros já aplicados)
+    # PAGINAÇÃO (total já conhecido pelas facetas)
     # ======================
-    
-    # Modelos: sempre mostra os que existem na ficha
-    modelos_na_ficha = ModeloCalcado.objects.filter(
-        id__in=itens_totais.values_list('modelo_id', flat=True).distinct()
-    ).order_by('nome')
-    
-    # Cores: se modelo foi selecionado, mostra apenas cores desse modelo
-    if modelo_id:
-        cores_na_ficha = Cor.objects.filter(
-            id__in=itens_totais.filter(modelo_id=modelo_id).values_list('cor_id', flat=True).distinct()
-        ).order_by('nome')
-    else:
-        cores_na_ficha = Cor.objects.filter(
-            id__in=itens_totais.values_list('cor_id', flat=True).distinct()
-        ).order_by('nome')
-    
-    # Números: ajusta baseado nos filtros de modelo e cor
-    itens_para_numeros = itens_totais
-    if modelo_id:
-        itens_para_numeros = itens_para_numeros.filter(modelo_id=modelo_id)
-    if cor_id:
-        itens_para_numeros = itens_para_numeros.filter(cor_id=cor_id)
-    
-    # Pega números únicos (sem repetir)
-    numeros_na_ficha = (
-        itens_para_numeros
-        .values_list('tamanho__numero', flat=True)
-        .distinct()
-        .order_by('tamanho__numero')
-    )
-
-    # ======================
-    # PAGINAÇÃO
-    # ======================
-    paginator = Paginator(itens, 15)
+    paginator = PaginadorComTotal(itens, 15, resumo['total_itens'])
     page_number = request.GET.get("page")
     itens_paginados = paginator.get_page(page_number)
 
     context = {
         "ficha": ficha,
         "modelos": modelos,  # Para o formulário de adicionar
+        "catalogo_versao": catalogo.versao(),  # Cores/tamanhos do formulário vêm do catálogo
         "itens": itens,      # Queryset filtrado
         "itens_paginados": itens_paginados,
         "pode_editar": pode_editar,
         
         # Filtros selecionados
-        'modelo_selecionado': modelo_id,
-        'cor_selecionada': cor_id,
-        'numero_selecionado': numero,
+        'modelo_selecionado': filtros['modelo'],
+        'cor_selecionada': filtros['cor'],
+        'numero_selecionado': filtros['numero'],
         
         # Opções para os filtros
-        'modelos_filtro': modelos_na_ficha,
-        'cores_filtro': cores_na_ficha,
-        'numeros_filtro': numeros_na_ficha,
+        'modelos_filtro': resumo['modelos'],
+        'cores_filtro': resumo['cores'],
+        'numeros_filtro': resumo['numeros'],
         
         # Stats
-        'total_itens': total_itens,
-        'total_pares': total_pares,
+        'total_itens': resumo['total_itens'],
+        'total_pares': resumo['total_pares'],
     }
 
     return render(request, "qualidade/editar_ficha_inventario.html", context)
@@ -230,7 +180,7 @@ def remover_item_inventario(request, item_id):
     item = get_object_or_404(ItemInventario, id=item_id)
 
     # Permissão
-    if request.user.perfil.tipo != "operador":
+    if request.qualidade_ctx.tipo != "operador":
         messages.error(request, "Você não tem permissão para excluir itens.")
         return redirect("editar_ficha_inventario", ficha_id=item.ficha.id)
 
@@ -240,15 +190,16 @@ def remover_item_inventario(request, item_id):
 
 @login_required
 def atualizar_quantidade_item(request, item_id):
+    """Botões +/- sem JavaScript; a tela usa a versão JSON (api_atualizar_item)"""
     if request.method != "POST":
         return redirect("home")
 
     item = get_object_or_404(ItemInventario, id=item_id)
 
     # Permissão
-    if request.user.perfil.tipo != "operador":
+    if request.qualidade_ctx.tipo != "operador":
         messages.error(request, "Você não tem permissão para alterar quantidades.")
-        return redirect("editar_ficha_inventario", ficha_id=item.ficha.id)
+        return redirect("editar_ficha_inventario", ficha_id=item.ficha_id)
 
     acao = request.POST.get("acao")
     lado = request.POST.get("lado")
@@ -261,53 +212,31 @@ def atualizar_quantidade_item(request, item_id):
             raise ValueError()
     except:
         messages.error(request, "Quantidade inválida.")
-        return redirect("editar_ficha_inventario", ficha_id=item.ficha.id)
+        return redirect("editar_ficha_inventario", ficha_id=item.ficha_id)
 
     # Seleciona o campo correto
-    if lado == "PD":
-        campo = "quantidade_pe_direito"
-        nome_lado = "Pé Direito"
-    elif lado == "PE":
-        campo = "quantidade_pe_esquerdo"
-        nome_lado = "Pé Esquerdo"
-    else:
+    campo = ItemInventario.CAMPOS_LADO.get(lado)
+    if campo is None:
         messages.error(request, "Lado inválido.")
-        return redirect("editar_ficha_inventario", ficha_id=item.ficha.id)
-
-    # Pega o valor atual APENAS para validar (não usa para salvar)
-    quantidade_atual = getattr(item, campo)
+        return redirect("editar_ficha_inventario", ficha_id=item.ficha_id)
+    nome_lado = "Pé Direito" if lado == "PD" else "Pé Esquerdo"
 
     if acao == "adicionar":
-        # Usa F() para somar direto no banco
-        if lado == "PD":
-            item.quantidade_pe_direito = F('quantidade_pe_direito') + valor
-        else:
-            item.quantidade_pe_esquerdo = F('quantidade_pe_esquerdo') + valor
-            
+        delta = valor
         mensagem = f"{valor} unidade(s) adicionada(s) ao {nome_lado}!"
-
     elif acao == "subtrair":
-        # Verifica se a subtração vai deixar negativo ANTES de mandar pro banco
-        if quantidade_atual - valor < 0:
-            messages.error(request, "A quantidade não pode ficar negativa.")
-            return redirect("editar_ficha_inventario", ficha_id=item.ficha.id)
-
-        # Se passou na validação, usamos F() para subtrair
-        if lado == "PD":
-            item.quantidade_pe_direito = F('quantidade_pe_direito') - valor
-        else:
-            item.quantidade_pe_esquerdo = F('quantidade_pe_esquerdo') - valor
-            
+        delta = -valor
         mensagem = f"{valor} unidade(s) removida(s) do {nome_lado}!"
-
     else:
         messages.error(request, "Ação inválida.")
-        return redirect("editar_ficha_inventario", ficha_id=item.ficha.id)
-
-    item.save()
+        return redirect("editar_ficha_inventario", ficha_id=item.ficha_id)
 
-    messages.success(request, mensagem)
-    return redirect("editar_ficha_inventario", ficha_id=item.ficha.id)
+    # A checagem de negativo vai no próprio UPDATE (ver ItemInventario.ajustar_quantidade)
+    if ItemInventario.ajustar_quantidade(item.id, campo, delta) is None:
+        messages.error(request, "A quantidade não pode ficar negativa.")
+    else:
+        messages.success(request, mensagem)
+    return redirect("editar_ficha_inventario", ficha_id=item.ficha_id)
 
 
 ## VIEWS DE GERENCIAMENTO SÓ PRA QUALIDADE ##
@@ -316,7 +245,7 @@ def gerenciar_modelos(request):
     """Gerenciar modelos de calçados (apenas qualidade)"""
     
     # Verificar permissão
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem gerenciar modelos.')
         return redirect('home')
 
@@ -354,23 +283,18 @@ def gerenciar_modelos(request):
                     )
                 return redirect('gerenciar_modelos')
 
-            # Criar modelo
-            modelo = ModeloCalcado.objects.create(
-                nome=nome_modelo,
-                criado_por=request.user
-            )
+            with transaction.atomic():
+                # Criar modelo
+                modelo = ModeloCalcado.objects.create(
+                    nome=nome_modelo,
+                    criado_por=request.user
+                )
 
-            # Adicionar cores selecionadas ao modelo (ManyToMany)
-            modelo.cores.set(cores_ids)
+                # Adicionar cores selecionadas ao modelo (ManyToMany)
+                modelo.cores.set(cores_ids)
 
-            # Criar combinações (cor x tamanho)
-            for numero in tamanhos:
-                for cor_id in cores_ids:
-                    TamanhoModelo.objects.get_or_create(
-                        modelo=modelo,
-                        cor_id=cor_id,
-                        numero=numero
-                    )
+                # Criar combinações (cor x tamanho) de uma vez
+                grade.provisionar(modelo, cores_ids, tamanhos)
 
             messages.success(request, f'Modelo "{nome_modelo}" criado com sucesso!')
             return redirect('gerenciar_modelos')
@@ -418,36 +342,21 @@ def gerenciar_modelos(request):
                 messages.error(request, 'Nenhuma cor válida selecionada.')
                 return redirect('gerenciar_modelos')
 
-            added = []
-            already = []
-            for cor in cores_para_adicionar:
-                if modelo.cores.filter(id=cor.id).exists():
-                    already.append(cor.nome)
-                    continue
-
-                modelo.cores.add(cor)
-                added.append(cor.nome)
-
-                # Criar tamanhos existentes para a nova cor (evita duplicatas)
-                tamanhos_existentes = (
-                    TamanhoModelo.objects.filter(modelo=modelo, excluido=False)
-                    .values_list('numero', flat=True)
-                    .distinct()
-                )
-                for numero in tamanhos_existentes:
-                    obj, created = TamanhoModelo.objects.get_or_create(
-                        modelo=modelo,
-                        cor=cor,
-                        numero=numero,
-                        defaults={"ativo": True, "excluido": False}
-                    )
+            vinculadas = set(modelo.cores.values_list('id', flat=True))
+            novas = [cor for cor in cores_para_adicionar if cor.id not in vinculadas]
+            added = [cor.nome for cor in novas]
+            already = [cor.nome for cor in cores_para_adicionar if cor.id in vinculadas]
 
-                    if not created and obj.excluido:
-                        obj.excluido = False
-                        obj.ativo = True
-                        obj.save()
+            if novas:
+                with transaction.atomic():
+                    modelo.cores.add(*novas)
 
-                    
+                    # As cores novas recebem os números que o modelo já tem
+                    tamanhos_existentes = set(
+                        TamanhoModelo.objects.filter(modelo=modelo, excluido=False)
+                        .values_list('numero', flat=True)
+                    )
+                    grade.provisionar(modelo, [cor.id for cor in novas], tamanhos_existentes)
 
             # Mensagens amigáveis
             if added:
@@ -491,27 +400,19 @@ def gerenciar_modelos(request):
             tamanhos_limpos = sorted(set(tamanhos_limpos))  # remove duplicatas e ordena
 
             # todas as cores vinculadas ao modelo
-            cores = modelo.cores.filter(excluido=False)
+            cores = dict(modelo.cores.filter(excluido=False).values_list('id', 'nome'))
 
-            if not cores.exists():
+            if not cores:
                 messages.error(request, "O modelo não possui cores. Adicione cores antes de adicionar tamanhos.")
                 return redirect('gerenciar_modelos')
 
-            adicionados = []
-            ja_existiam = []
-
             # gerar combinações (cor × tamanho)
-            for numero in tamanhos_limpos:
-                for cor in cores:
-                    obj, created = TamanhoModelo.objects.get_or_create(
-                        modelo=modelo,
-                        cor=cor,
-                        numero=numero
-                    )
-                    if created:
-                        adicionados.append(f"{numero} ({cor.nome})")
-                    else:
-                        ja_existiam.append(f"{numero} ({cor.nome})")
+            resultado = grade.provisionar(modelo, cores, tamanhos_limpos)
+            adicionados = resultado['adicionados'] | resultado['reativados']
+            ja_existiam = [
+                f"{numero} ({cores[cor_id]})"
+                for cor_id, numero in sorted(resultado['existentes'], key=lambda par: (int(par[1]), cores[par[0]]))
+            ]
 
             # mensagens
             if adicionados:
@@ -534,20 +435,11 @@ def gerenciar_modelos(request):
         elif acao == 'mover_lixeira':
             modelo_id = request.POST.get('modelo_id')
             
-            try:
-                with transaction.atomic():
-                    modelo = ModeloCalcado.objects.get(id=modelo_id, excluido=False)
-                    modelo.excluido = True
-                    modelo.excluido_em = timezone.now()
-                    modelo.excluido_por = request.user
-                    modelo.save()
-
-                    modelo.tamanhos.update(
-                        excluido=True,
-                        ativo=False
-                    )
+            # Os tamanhos vão junto (ModeloCalcadoQuerySet)
+            modelo = ModeloCalcado.ativos.filter(id=modelo_id).first()
+            if modelo and ModeloCalcado.objects.filter(id=modelo.id).mover_para_lixeira(request.user):
                 messages.success(request, f'Modelo "{modelo.nome}" movido para a lixeira!')
-            except ModeloCalcado.DoesNotExist:
+            else:
                 messages.error(request, 'Modelo não encontrado.')
             
             return redirect('gerenciar_modelos')
@@ -556,12 +448,28 @@ def gerenciar_modelos(request):
     # GET - Exibir página
     # --------------------
 
-    # Buscar modelos ativos
-    modelos = (
-        ModeloCalcado.objects.filter(excluido=False)
-        .prefetch_related('cores', 'tamanhos')
-        .order_by('nome')
+    # Buscar modelos ativos: contagem e listas vêm de 1 consulta + 2 prefetches,
+    # qualquer que seja o tamanho do catálogo
+    busca = request.GET.get('q', '').strip()
+    modelos = ModeloCalcado.ativos.annotate(
+        tamanho_count=Count('tamanhos__numero', filter=Q(tamanhos__excluido=False), distinct=True),
+    ).prefetch_related(
+        Prefetch('cores', queryset=Cor.ativos.order_by('nome'), to_attr='cores_ativas'),
+        # Um TamanhoModelo por número (o de menor id), não um por cor
+        Prefetch(
+            'tamanhos',
+            queryset=TamanhoModelo.ativos.filter(
+                ~Exists(TamanhoModelo.ativos.filter(
+                    modelo=OuterRef('modelo'), numero=OuterRef('numero'), id__lt=OuterRef('id'),
+                ))
+            ).order_by('numero').only('id', 'modelo_id', 'numero'),
+            to_attr='tamanhos_distintos',
+        ),
     )
+    if busca:
+        modelos = modelos.filter(nome__icontains=busca)
+    modelos = paginar(request, modelos, 20, ordem=('nome', 'id'))
+
     # Verificar duplicação de nome (incluindo excluídos)
     cores_disponiveis = Cor.objects.filter(excluido=False, ativo=True).order_by('nome')
 
@@ -569,34 +477,16 @@ def gerenciar_modelos(request):
     tamanhos_infantil_completo = list(range(26, 37))  # 26 até 36
     tamanhos_adulto_completo = list(range(34, 46))    # 34 até 45
 
-    # Processar cada modelo para calcular tamanhos disponíveis
+    # Processar cada modelo para calcular tamanhos disponíveis (sem consultas: tudo já prefetchado)
     for modelo in modelos:
-        # Contar tamanhos distintos
-        modelo.tamanho_count = (
-            modelo.tamanhos.filter(excluido=False)
-            .values('numero')
-            .distinct()
-            .count()
-        )
-        
-        # Pegar tamanhos que o modelo JÁ possui
-        tamanhos_existentes = set(
-            modelo.tamanhos.filter(excluido=False)
-            .values_list('numero', flat=True)
-            .distinct()
-        )
-        
+        modelo.tamanhos_unicos = [tamanho.numero for tamanho in modelo.tamanhos_distintos]
+        tamanhos_existentes = set(modelo.tamanhos_unicos)
+
         # Calcular tamanhos disponíveis para adicionar (que NÃO existem ainda)
         modelo.tamanhos_infantil_disponiveis = [
             str(t) for t in tamanhos_infantil_completo 
             if str(t) not in tamanhos_existentes
         ]
-        modelo.tamanhos_unicos = (
-            modelo.tamanhos.filter(excluido=False)
-            .values_list('numero', flat=True)
-            .distinct()
-            .order_by('numero')
-        )
         modelo.tamanhos_adulto_disponiveis = [
             str(t) for t in tamanhos_adulto_completo 
             if str(t) not in tamanhos_existentes
@@ -604,6 +494,7 @@ def gerenciar_modelos(request):
 
     context = {
         'modelos': modelos,
+        'busca': busca,
         'cores': cores_disponiveis,
         'tamanhos_infantil': tamanhos_infantil_completo,
         'tamanhos_adulto': tamanhos_adulto_completo,
@@ -617,96 +508,42 @@ def gerenciar_modelos(request):
 def visualizar_ficha_inventario(request, ficha_id):
     ficha = get_object_or_404(FichaInventario, id=ficha_id)
 
-    # Todos os itens da ficha (antes de filtrar)
-    itens_totais = ficha.itens.all().select_related('modelo', 'cor', 'tamanho')
-    
-    # Itens que serão filtrados
-    itens = itens_totais
-
     # ======================
     # FILTROS (via GET)
     # ======================
-    modelo_id = request.GET.get('modelo')
-    cor_id = request.GET.get('cor')
-    numero = request.GET.get('numero')  # Mudei de tamanho_id para numero
-
-    if modelo_id:
-        itens = itens.filter(modelo_id=modelo_id)
-
-    if cor_id:
-        itens = itens.filter(cor_id=cor_id)
-
-    if numero:
-        itens = itens.filter(tamanho__numero=numero)
+    filtros = facetas.ler_filtros(request.GET)
+    itens = facetas.filtrar_itens(ficha.itens.select_related('modelo', 'cor', 'tamanho'), filtros)
 
     # ======================
-    # STATS (sobre itens filtrados)
+    # OPÇÕES DOS FILTROS E STATS: as mesmas facetas da tela de edição
     # ======================
-    total_pares = sum(
-        min(item.quantidade_pe_direito, item.quantidade_pe_esquerdo)
-        for item in itens
-    )
-
-    modelos_diferentes = itens.values("modelo__nome").distinct().count()
+    resumo = facetas.calcular(ficha, filtros)
 
     # ======================
     # PAGINAÇÃO
     # ======================
-    paginator = Paginator(itens, 15)
+    paginator = PaginadorComTotal(itens, 15, resumo['total_itens'])
     page_number = request.GET.get('page')
     itens_paginados = paginator.get_page(page_number)
 
-    # ======================
-    # OPÇÕES PARA OS FILTROS (baseado nos filtros já aplicados)
-    # ======================
-    
-    # Modelos: sempre mostra os que existem na ficha (sem filtro aplicado ainda)
-    modelos_na_ficha = ModeloCalcado.objects.filter(
-        id__in=itens_totais.values_list('modelo_id', flat=True).distinct()
-    ).order_by('nome')
-    
-    # Cores: se modelo foi selecionado, mostra apenas cores desse modelo
-    if modelo_id:
-        cores_na_ficha = Cor.objects.filter(
-            id__in=itens_totais.filter(modelo_id=modelo_id).values_list('cor_id', flat=True).distinct()
-        ).order_by('nome')
-    else:
-        cores_na_ficha = Cor.objects.filter(
-            id__in=itens_totais.values_list('cor_id', flat=True).distinct()
-        ).order_by('nome')
-    
-    # Números: ajusta baseado nos filtros de modelo e cor
-    itens_para_numeros = itens_totais
-    if modelo_id:
-        itens_para_numeros = itens_para_numeros.filter(modelo_id=modelo_id)
-    if cor_id:
-        itens_para_numeros = itens_para_numeros.filter(cor_id=cor_id)
-    
-    # Pega números únicos (sem repetir)
-    numeros_na_ficha = (
-        itens_para_numeros
-        .values_list('tamanho__numero', flat=True)
-        .distinct()
-        .order_by('tamanho__numero')
-    )
-
     context = {
         'ficha': ficha,
         'itens': itens,  # queryset filtrado
         'itens_paginados': itens_paginados,
 
         # filtros selecionados
-        'modelo_selecionado': modelo_id,
-        'cor_selecionada': cor_id,
-        'numero_selecionado': numero,
+        'modelo_selecionado': filtros['modelo'],
+        'cor_selecionada': filtros['cor'],
+        'numero_selecionado': filtros['numero'],
 
         # dados para os selects
-        'modelos': modelos_na_ficha,
-        'cores': cores_na_ficha,
-        'numeros': numeros_na_ficha,
+        'modelos': resumo['modelos'],
+        'cores': resumo['cores'],
+        'numeros': resumo['numeros'],
 
-        'total_pares': total_pares,
-        'modelos_diferentes': modelos_diferentes,
+        'total_itens': resumo['total_itens'],
+        'total_pares': resumo['total_pares'],
+        'modelos_diferentes': resumo['modelos_diferentes'],
     }
 
     return render(request, 'qualidade/visualizar_ficha_inventario.html', context)
@@ -715,47 +552,25 @@ def visualizar_ficha_inventario(request, ficha_id):
 def lixeira_modelos(request):
     """Lixeira dos modelos de calçado (apenas qualidade)."""
 
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem acessar a lixeira.')
         return redirect('home')
 
     if request.method == 'POST':
-        acao = request.POST.get('acao')
-        modelo_id = request.POST.get('modelo_id')
-
-        # 1) Restaurar da lixeira
-        if acao == 'restaurar':
-            try:
-                with transaction.atomic():
-                    modelo = ModeloCalcado.objects.get(id=modelo_id, excluido=True)
-
-                    modelo.excluido = False
-                    modelo.excluido_em = None
-                    modelo.excluido_por = None
-                    modelo.save()
+        # Restaurar também devolve os tamanhos do modelo (ModeloCalcadoQuerySet)
+        acao, nomes = aplicar_acao_lixeira(request, ModeloCalcado, 'modelo_id')
 
-                    modelo.tamanhos.update(
-                        excluido=False,
-                        ativo=True
-                    )
-                    messages.success(request, f'Modelo "{modelo.nome}" restaurado com sucesso!')
-            except ModeloCalcado.DoesNotExist:
-                messages.error(request, 'Modelo não encontrado na lixeira.')
-
-        # 2) Excluir permanentemente
-        elif acao == 'excluir_permanente':
-            try:
-                modelo = ModeloCalcado.objects.get(id=modelo_id, excluido=True)
-                nome_modelo = modelo.nome
-                modelo.delete()
-                messages.success(request, f'Modelo "{nome_modelo}" excluído permanentemente!')
-            except ModeloCalcado.DoesNotExist:
-                messages.error(request, 'Modelo não encontrado na lixeira.')
+        if not nomes:
+            messages.error(request, 'Modelo não encontrado na lixeira.')
+        elif acao == 'restaurar':
+            messages.success(request, descrever(nomes, 'Modelo "{}" restaurado', 'modelos restaurados') + ' com sucesso!')
+        else:
+            messages.success(request, descrever(nomes, 'Modelo "{}" excluído', 'modelos excluídos') + ' permanentemente!')
 
         return redirect('lixeira_modelos')
 
     # Listar somente excluídos
-    modelos_excluidos = ModeloCalcado.objects.filter(excluido=True).order_by('-criado_em')
+    modelos_excluidos = ModeloCalcado.lixeira.select_related('excluido_por').order_by('-criado_em')
 
     context = {
         'modelos': modelos_excluidos,
@@ -766,7 +581,7 @@ def lixeira_modelos(request):
 def gerenciar_cores(request):
     """Gerenciar cores do calçado (apenas qualidade)"""
     # Verificar se é usuário da qualidade
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem gerenciar partes')
         return redirect('home')
     
@@ -789,13 +604,10 @@ def gerenciar_cores(request):
         
         elif acao == 'mover_lixeira':
             cor_id = request.POST.get('cor_id')
-            try:
-                cor = Cor.objects.get(id=cor_id, excluido=False)
-                cor.excluido = True
-                cor.excluido_em = timezone.now()
-                cor.save()
+            cor = Cor.ativos.filter(id=cor_id).first()
+            if cor and Cor.objects.filter(id=cor.id).mover_para_lixeira(request.user):
                 messages.success(request, f'Cor "{cor.nome}" movida para a lixeira!')
-            except Cor.DoesNotExist:
+            else:
                 messages.error(request, 'Cor não encontrada')
         
         elif acao == 'ativar_desativar':
@@ -822,37 +634,24 @@ def gerenciar_cores(request):
 @login_required
 def lixeira_cores(request):
     """Lixeira de nomes de cores (apenas qualidade)"""
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem acessar a lixeira')
         return redirect('home')
     
     if request.method == 'POST':
-        acao = request.POST.get('acao')
-        cor_id = request.POST.get('cor_id')
+        acao, nomes = aplicar_acao_lixeira(request, Cor, 'cor_id')
         
-        if acao == 'restaurar':
-            try:
-                cor = Cor.objects.get(id=cor_id, excluido=True)
-                cor.excluido = False
-                cor.excluido_em = None
-                cor.save()
-                messages.success(request, f'Registro de cor "{cor.nome}" restaurada com sucesso!')
-            except Cor.DoesNotExist:
-                messages.error(request, 'Nome da cor não encontrada na lixeira')
-        
-        elif acao == 'excluir_permanente':
-            try:
-                cor = Cor.objects.get(id=cor_id, excluido=True)
-                nome_cor = cor.nome
-                cor.delete()
-                messages.success(request, f'Registro de cor "{nome_cor}" excluído permanentemente!')
-            except Cor.DoesNotExist:
-                messages.error(request, 'Nome de cor não encontrada na lixeira')
+        if not nomes:
+            messages.error(request, 'Nome da cor não encontrada na lixeira')
+        elif acao == 'restaurar':
+            messages.success(request, descrever(nomes, 'Registro de cor "{}" restaurada', 'cores restauradas') + ' com sucesso!')
+        else:
+            messages.success(request, descrever(nomes, 'Registro de cor "{}" excluído', 'cores excluídas') + ' permanentemente!')
         
         return redirect('lixeira_cores')
     
     # Listar apenas partes EXCLUÍDAS
-    cores_excluidas = Cor.objects.filter(excluido=True).order_by('-excluido_em')
+    cores_excluidas = Cor.lixeira.order_by('-excluido_em')
     
     context = {
         'cores': cores_excluidas,
@@ -861,7 +660,7 @@ def lixeira_cores(request):
 
 @login_required
 def excluir_ficha_inventario(request, ficha_id):
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem excluir fichas')
         return redirect('home')
 
@@ -0,0 +1,86 @@
+# qualidade/views/lixeira.py
+"""
+Ações das telas de lixeira sobre um item (botão da linha) ou vários (seleção)
+"""
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
+
+from ..models import Ficha, FichaInventario
+
+# Lixeira de fichas: mais recentes primeiro; tipo e id desempatam
+ORDEM_LIXEIRA_FICHAS = ('-excluido_em', 'tipo', '-id')
+# Valor do campo "tipo" nos formulários → modelo
+MODELOS_FICHA = {'Ficha': Ficha, 'Inventario': FichaInventario}
+
+
+def aplicar_acao(acao, modelo, ids, campo_nome='nome'):
+    """
+    Restaura ou exclui de vez os itens `ids` que estão na lixeira de `modelo`.
+
+    Restaurar é um único UPDATE (LixeiraQuerySet.restaurar) para a seleção
+    inteira. Devolve os nomes dos itens afetados; lista vazia quando nada
+    foi encontrado na lixeira.
+    """
+    selecionados = modelo.lixeira.filter(id__in=ids)
+    nomes = list(selecionados.values_list(campo_nome, flat=True))
+    if not nomes:
+        return []
+
+    if acao == 'restaurar':
+        selecionados.restaurar()
+    elif acao == 'excluir_permanente':
+        selecionados.delete()
+    else:
+        return []
+    return nomes
+
+
+def aplicar_acao_lixeira(request, modelo, campo_id, campo_nome='nome'):
+    """aplicar_acao() com a ação e os ids (um ou vários `campo_id`) do POST; devolve (ação, nomes)"""
+    acao = request.POST.get('acao')
+    ids = [valor for valor in request.POST.getlist(campo_id) if valor.isdigit()]
+    return acao, aplicar_acao(acao, modelo, ids, campo_nome)
+
+
+def ids_fichas_selecionadas(request):
+    """
+    {modelo: [ids]} das fichas do POST: seleção em lote ("Ficha:12",
+    "Inventario:7") ou o par ficha_id/tipo do botão da linha.
+    """
+    pares = [valor.partition(':')[::2] for valor in request.POST.getlist('selecao')]
+    if not pares:
+        pares = [(request.POST.get('tipo', 'Ficha'), request.POST.get('ficha_id', ''))]
+
+    selecionadas = {}
+    for tipo, ficha_id in pares:
+        if ficha_id.isdigit():
+            selecionadas.setdefault(MODELOS_FICHA.get(tipo, Ficha), []).append(ficha_id)
+    return selecionadas
+
+
+def _nome_usuario(relacao):
+    """Nome completo do usuário em SQL (o mesmo de get_full_name), ou o username quando vazio"""
+    nome_completo = Trim(Concat(f'{relacao}__first_name', Value(' '), f'{relacao}__last_name'))
+    return Coalesce(NullIf(nome_completo, Value('')), F(f'{relacao}__username'), output_field=CharField())
+
+
+def consultas_lixeira_fichas():
+    """
+    Fichas e fichas de inventário na lixeira, no mesmo formato de colunas,
+    para o UNION ALL de paginacao.paginar_uniao (nomes de usuário já no JOIN).
+    """
+    return [
+        modelo.lixeira.annotate(
+            tipo=Value(tipo, output_field=CharField()),
+            operador_nome=_nome_usuario('operador'),
+            excluido_por_nome=_nome_usuario('excluido_por'),
+        ).values('id', 'tipo', 'nome_ficha', 'data', 'excluido_em', 'operador_nome', 'excluido_por_nome')
+        for tipo, modelo in MODELOS_FICHA.items()
+    ]
+
+
+def descrever(nomes, um, varios):
+    """'Parte "Sola" restaurada' para um item, '3 partes restauradas' para vários"""
+    if len(nomes) == 1:
+        return um.format(nomes[0])
+    return f'{len(nomes)} {varios}'
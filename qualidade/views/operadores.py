@@ -9,13 +9,14 @@ from django.utils import timezone
 from django.db import models
 
 from ..models import NomeOperador
+from .lixeira import aplicar_acao_lixeira, descrever
 
 
 @login_required
 def gerenciar_operadores(request):
     """Gerenciar operadores (apenas qualidade)"""
     # Verificar se é usuário da qualidade
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem gerenciar operadores')
         return redirect('home')
     
@@ -38,13 +39,10 @@ def gerenciar_operadores(request):
         
         elif acao == 'mover_lixeira':
             operador_id = request.POST.get('operador_id')
-            try:
-                operador = NomeOperador.objects.get(id=operador_id, excluido=False)
-                operador.excluido = True
-                operador.excluido_em = timezone.now()
-                operador.save()
+            operador = NomeOperador.ativos.filter(id=operador_id).first()
+            if operador and NomeOperador.objects.filter(id=operador.id).mover_para_lixeira(request.user):
                 messages.success(request, f'Parte "{operador.nome}" movida para a lixeira!')
-            except NomeOperador.DoesNotExist:
+            else:
                 messages.error(request, 'Operador não encontrado')
         
         elif acao == 'ativar_desativar':
@@ -72,37 +70,24 @@ def gerenciar_operadores(request):
 @login_required
 def lixeira_operadores(request):
     """Lixeira de nomes de operadores (apenas qualidade)"""
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem acessar a lixeira')
         return redirect('home')
     
     if request.method == 'POST':
-        acao = request.POST.get('acao')
-        operador_id = request.POST.get('operador_id')
+        acao, nomes = aplicar_acao_lixeira(request, NomeOperador, 'operador_id')
         
-        if acao == 'restaurar':
-            try:
-                operador = NomeOperador.objects.get(id=operador_id, excluido=True)
-                operador.excluido = False
-                operador.excluido_em = None
-                operador.save()
-                messages.success(request, f'Registro do nome "{operador.nome}" restaurado com sucesso!')
-            except NomeOperador.DoesNotExist:
-                messages.error(request, 'Nome do operador não encontrada na lixeira')
-        
-        elif acao == 'excluir_permanente':
-            try:
-                operador = NomeOperador.objects.get(id=operador_id, excluido=True)
-                nome_operador = operador.nome
-                operador.delete()
-                messages.success(request, f'Registro do nome "{nome_operador}" excluído permanentemente!')
-            except NomeOperador.DoesNotExist:
-                messages.error(request, 'Nome do operador não encontrada na lixeira')
+        if not nomes:
+            messages.error(request, 'Nome do operador não encontrada na lixeira')
+        elif acao == 'restaurar':
+            messages.success(request, descrever(nomes, 'Registro do nome "{}" restaurado', 'registros restaurados') + ' com sucesso!')
+        else:
+            messages.success(request, descrever(nomes, 'Registro do nome "{}" excluído', 'registros excluídos') + ' permanentemente!')
         
         return redirect('lixeira_operadores')
     
     # Listar apenas partes EXCLUÍDAS
-    operadores_excluidos = NomeOperador.objects.filter(excluido=True).order_by('-excluido_em')
+    operadores_excluidos = NomeOperador.lixeira.order_by('-excluido_em')
     
     context = {
         'operadores': operadores_excluidos,
@@ -9,13 +9,14 @@ from django.utils import timezone
 from django.db import models
 
 from ..models import ParteCalcado
+from .lixeira import aplicar_acao_lixeira, descrever
 
 
 @login_required
 def gerenciar_partes(request):
     """Gerenciar partes do calçado (apenas qualidade)"""
     # Verificar se é usuário da qualidade
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem gerenciar partes')
         return redirect('home')
     
@@ -38,13 +39,10 @@ def gerenciar_partes(request):
         
         elif acao == 'mover_lixeira':
             parte_id = request.POST.get('parte_id')
-            try:
-                parte = ParteCalcado.objects.get(id=parte_id, excluido=False)
-                parte.excluido = True
-                parte.excluido_em = timezone.now()
-                parte.save()
+            parte = ParteCalcado.ativos.filter(id=parte_id).first()
+            if parte and ParteCalcado.objects.filter(id=parte.id).mover_para_lixeira(request.user):
                 messages.success(request, f'Parte "{parte.nome}" movida para a lixeira!')
-            except ParteCalcado.DoesNotExist:
+            else:
                 messages.error(request, 'Parte não encontrada')
         
         elif acao == 'ativar_desativar':
@@ -72,37 +70,24 @@ def gerenciar_partes(request):
 @login_required
 def lixeira_partes(request):
     """Lixeira de partes (apenas qualidade)"""
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem acessar a lixeira')
         return redirect('home')
     
     if request.method == 'POST':
-        acao = request.POST.get('acao')
-        parte_id = request.POST.get('parte_id')
+        acao, nomes = aplicar_acao_lixeira(request, ParteCalcado, 'parte_id')
         
-        if acao == 'restaurar':
-            try:
-                parte = ParteCalcado.objects.get(id=parte_id, excluido=True)
-                parte.excluido = False
-                parte.excluido_em = None
-                parte.save()
-                messages.success(request, f'Parte "{parte.nome}" restaurada com sucesso!')
-            except ParteCalcado.DoesNotExist:
-                messages.error(request, 'Parte não encontrada na lixeira')
-        
-        elif acao == 'excluir_permanente':
-            try:
-                parte = ParteCalcado.objects.get(id=parte_id, excluido=True)
-                nome_parte = parte.nome
-                parte.delete()
-                messages.success(request, f'Parte "{nome_parte}" excluída permanentemente!')
-            except ParteCalcado.DoesNotExist:
-                messages.error(request, 'Parte não encontrada na lixeira')
+        if not nomes:
+            messages.error(request, 'Parte não encontrada na lixeira')
+        elif acao == 'restaurar':
+            messages.success(request, descrever(nomes, 'Parte "{}" restaurada', 'partes restauradas') + ' com sucesso!')
+        else:
+            messages.success(request, descrever(nomes, 'Parte "{}" excluída', 'partes excluídas') + ' permanentemente!')
         
         return redirect('lixeira_partes')
     
     # Listar apenas partes EXCLUÍDAS
-    partes_excluidas = ParteCalcado.objects.filter(excluido=True).order_by('-excluido_em')
+    partes_excluidas = ParteCalcado.lixeira.order_by('-excluido_em')
     
     context = {
         'partes': partes_excluidas,
@@ -5,21 +5,48 @@ Views de relatórios e geração de PDFs
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.contrib.auth.models import User
-from django.db.models import Sum
+from django.core.paginator import Paginator
+import csv
 from datetime import datetime
-from io import BytesIO
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.pdfgen import canvas
 
-from ..models import Ficha, ParteCalcado, FichaInventario
+from ..models import Ficha, ParteCalcado, FichaInventario, RelatorioJob
+from .. import agregacoes, cache, comparacao, consolidacao, facetas, pdf_cache
+from ..paginacao import paginar
+from ..jobs import enfileirar_relatorio_periodo
+from ..pdfs import (
+    desenhar_relatorio_ficha,
+    desenhar_relatorio_ficha_inventario,
+    desenhar_relatorio_periodo,
+    nome_arquivo_periodo,
+)
+
+# Opções dos filtros: invalidadas por signals quando partes, operadores ou fichas mudam
+TEMPO_CACHE_FILTROS = 600
+# O que a tela recebe quando um job falha (o traceback fica no job e no log do worker)
+MENSAGEM_ERRO_JOB = 'Não foi possível gerar o relatório. Tente novamente ou avise a qualidade.'
+
+
+def _opcoes_filtros():
+    """Partes, operadores e nomes de fichas dos selects de filtro"""
+    return {
+        'partes': list(ParteCalcado.objects.filter(ativo=True, excluido=False).order_by('nome')),
+        'operadores': list(User.objects.filter(perfil__tipo='operador').order_by('username')),
+        'nomes_fichas': list(
+            Ficha.objects.filter(excluido=False)
+            .order_by('nome_ficha')
+            .values_list('nome_ficha', flat=True)
+            .distinct()
+        ),
+    }
 
 
 @login_required
 def relatorios(request):
     """Página de relatórios detalhados (apenas qualidade)"""
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem acessar relatórios')
         return redirect('home')
     
@@ -31,14 +58,7 @@ def relatorios(request):
     nome_ficha = request.GET.get('nome_ficha')
     
     # Buscar todas as partes e operadores para os filtros
-    partes = ParteCalcado.objects.filter(ativo=True, excluido=False).order_by('nome')
-    operadores = User.objects.filter(perfil__tipo='operador').order_by('username')
-    nomes_fichas = (
-        Ficha.objects.filter(excluido=False)
-        .order_by('nome_ficha')
-        .values_list('nome_ficha', flat=True)
-        .distinct()
-    )
+    filtros = cache.obter('filtros_relatorio', (), _opcoes_filtros, TEMPO_CACHE_FILTROS)
     
     # Inicializar dados
     dados_relatorio = None
@@ -49,63 +69,20 @@ def relatorios(request):
         data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d').date()
         data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d').date()
         
-        fichas = Ficha.objects.filter(
-            data__gte=data_inicio_obj,
-            data__lte=data_fim_obj,
-            excluido=False
-        ).prefetch_related('registros__parte', 'operador')
-        
-        if nome_ficha:
-            fichas = fichas.filter(nome_ficha=nome_ficha)
-
-        if operador_id:
-            fichas = fichas.filter(operador_id=operador_id)
-        
-        # Agrupar dados por operador
-        dados_por_operador = {}
-        
-        for ficha in fichas:
-            operador_nome = ficha.operador.get_full_name() or ficha.operador.username
-            
-            if operador_nome not in dados_por_operador:
-                dados_por_operador[operador_nome] = {
-                    'fichas': {},  # nome da ficha -> partes
-                    'totais_partes': {}  # total geral por parte do operador
-                }
-
-            registros = ficha.registros.all().select_related('parte')
-            if parte_id:
-                registros = ficha.registros.all()
-
-            for registro in registros:
-                parte_nome = registro.parte.nome
-                valor = registro.total()
-
-                # --- Dentro da ficha específica ---
-                if ficha.nome_ficha not in dados_por_operador[operador_nome]['fichas']:
-                    dados_por_operador[operador_nome]['fichas'][ficha.nome_ficha] = {}
-                if parte_nome not in dados_por_operador[operador_nome]['fichas'][ficha.nome_ficha]:
-                    dados_por_operador[operador_nome]['fichas'][ficha.nome_ficha][parte_nome] = 0
-                dados_por_operador[operador_nome]['fichas'][ficha.nome_ficha][parte_nome] += valor
-
-                # --- Totais por parte (somando tudo do operador) ---
-                if parte_nome not in dados_por_operador[operador_nome]['totais_partes']:
-                    dados_por_operador[operador_nome]['totais_partes'][parte_nome] = 0
-                dados_por_operador[operador_nome]['totais_partes'][parte_nome] += valor
-
-                # --- Total geral ---
-                total_geral += valor
-
-        dados_relatorio = dados_por_operador
+        dados_relatorio, total_geral = agregacoes.dados_por_operador(
+            data_inicio_obj,
+            data_fim_obj,
+            operador_id=operador_id,
+            nome_ficha=nome_ficha,
+            parte_id=parte_id,
+        )
 
     context = {
         'dados_relatorio': dados_relatorio,
         'total_geral': total_geral,
         'data_inicio': data_inicio_obj if data_inicio and data_fim else None,
         'data_fim': data_fim_obj if data_inicio and data_fim else None,
-        'partes': partes,
-        'operadores': operadores,
-        'nomes_fichas': nomes_fichas,
+        **filtros,
     }
     
     return render(request, 'qualidade/relatorios.html', context)
@@ -117,148 +94,40 @@ def relatorios(request):
 @login_required
 def gerar_relatorio(request, ficha_id):
     """Gerar relatório PDF de uma ficha específica"""
-    ficha = get_object_or_404(Ficha, id=ficha_id)
-    
-    # Criar PDF
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    
-    # Título
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, height - 50, f"Relatório - {ficha.nome_ficha}")
-    
-    p.setFont("Helvetica", 12)
-    p.drawString(50, height - 70, f"Data: {ficha.data.strftime('%d/%m/%Y')}")
-    p.drawString(50, height - 90, f"Operador: {ficha.operador.get_full_name() or ficha.operador.username}")
-    
-    # Tabela
-    y = height - 130
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "Parte")
-    p.drawString(200, y, "Quantidades")
-    p.drawString(450, y, "Total")
-    
-    y -= 20
-    p.setFont("Helvetica", 10)
-    
-    for registro in ficha.registros.all():
-        if y < 50:  # Nova página se necessário
-            p.showPage()
-            y = height - 50
-        
-        p.drawString(50, y, registro.parte.nome)
-        quantidades_str = ', '.join(map(str, registro.quantidades))
-        p.drawString(200, y, quantidades_str[:40])  # Limitar tamanho
-        p.drawString(450, y, str(registro.total()))
-        y -= 20
-    
-    # Total geral
-    y -= 10
-    p.setFont("Helvetica-Bold", 12)
-    total_geral = sum(r.total() for r in ficha.registros.all())
-    p.drawString(50, y, f"TOTAL GERAL: {total_geral}")
-    
-    p.save()
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="relatorio_{ficha.id}.pdf"'
-    
-    return response
+    ficha = get_object_or_404(Ficha.objects.select_related('operador'), id=ficha_id)
+
+    return pdf_cache.resposta_pdf(
+        request,
+        'ficha',
+        {'ficha_id': ficha.id},
+        ficha.atualizada_em.isoformat(),
+        ficha.atualizada_em,
+        f'relatorio_{ficha.id}.pdf',
+        lambda saida: desenhar_relatorio_ficha(saida, ficha),
+    )
 
 @login_required
 def gerar_relatorio_ficha_inventario(request, ficha_id):
     """Gerar relatório PDF de uma ficha de inventário"""
-    ficha = get_object_or_404(FichaInventario, id=ficha_id)
-
-    itens = ficha.itens.select_related("modelo", "cor", "tamanho")
-
-    # Totais
-    totais = itens.aggregate(
-        total_pd=Sum("quantidade_pe_direito"),
-        total_pe=Sum("quantidade_pe_esquerdo"),
-    )
-
-    total_pd = totais["total_pd"] or 0
-    total_pe = totais["total_pe"] or 0
-    total_pares = sum(
-    min(item.quantidade_pe_direito, item.quantidade_pe_esquerdo)
-    for item in itens
+    ficha = get_object_or_404(FichaInventario.objects.select_related('operador'), id=ficha_id)
+
+    # Itens novos, editados ou removidos avançam ficha.atualizada_em
+    return pdf_cache.resposta_pdf(
+        request,
+        'ficha_inventario',
+        {'ficha_id': ficha.id},
+        ficha.atualizada_em.isoformat(),
+        ficha.atualizada_em,
+        f'relatorio_ficha_inventario_{ficha.id}.pdf',
+        lambda saida: desenhar_relatorio_ficha_inventario(saida, ficha),
     )
 
 
-    # Criar PDF
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    # Cabeçalho
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, height - 50, "Relatório de Ficha de Inventário")
-
-    p.setFont("Helvetica", 11)
-    p.drawString(50, height - 75, f"Ficha nº: {ficha.id}")
-    p.drawString(50, height - 95, f"Data da ficha: {ficha.data.strftime('%d/%m/%Y')}")
-    p.drawString(
-        50,
-        height - 115,
-        f"Operador: {ficha.operador.get_full_name() or ficha.operador.username}"
-    )
-    p.drawString(50,height - 135,f"Nome na ficha: {ficha.nome_ficha}")  # ou ficha.nome_ficha
-    # Totais gerais
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height - 170, f"Total Pé Direito: {total_pd}")
-    p.drawString(250, height - 170, f"Total Pé Esquerdo: {total_pe}")
-    p.drawString(450, height - 170, f"Total Pares: {total_pares}")
-
-
-    # Cabeçalho da tabela
-    y = height - 205
-    p.setFont("Helvetica-Bold", 11)
-    p.drawString(50, y, "Modelo")
-    p.drawString(180, y, "Cor")
-    p.drawString(280, y, "Tam.")
-    p.drawString(340, y, "PD")
-    p.drawString(390, y, "PE")
-    p.drawString(440, y, "Total")
-
-    y -= 20
-    p.setFont("Helvetica", 10)
-
-    # Itens
-    for item in itens:
-        if y < 50:
-            p.showPage()
-            y = height - 50
-            p.setFont("Helvetica", 10)
-
-        total_item = item.quantidade_pe_direito + item.quantidade_pe_esquerdo
-
-        p.drawString(50, y, item.modelo.nome[:20])
-        p.drawString(180, y, item.cor.nome[:15])
-        p.drawString(280, y, str(item.tamanho.numero))
-        p.drawString(340, y, str(item.quantidade_pe_direito))
-        p.drawString(390, y, str(item.quantidade_pe_esquerdo))
-        p.drawString(440, y, str(total_item))
-
-        y -= 18
-
-    p.save()
-    buffer.seek(0)
-
-    response = HttpResponse(buffer, content_type="application/pdf")
-    response["Content-Disposition"] = (
-        f'attachment; filename="relatorio_ficha_inventario_{ficha.id}.pdf"'
-    )
-    return response
-
-
 
 @login_required
 def gerar_relatorio_periodo(request):
     """Gerar relatório PDF de período (MESMA ESTRUTURA da view relatorios)"""
-    if request.user.perfil.tipo != 'qualidade':
+    if request.qualidade_ctx.tipo != 'qualidade':
         messages.error(request, 'Apenas usuários da qualidade podem gerar relatórios')
         return redirect('home')
     
@@ -277,205 +146,261 @@ def gerar_relatorio_periodo(request):
     data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d').date()
     data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d').date()
 
-    # Buscar fichas no período (IGUAL à view relatorios)
-    fichas = Ficha.objects.filter(
-        data__gte=data_inicio_obj,
-        data__lte=data_fim_obj,
-        excluido=False
+    # Modo job: o PDF é gerado pelo worker e baixado depois, sem prender o gunicorn
+    if request.GET.get('modo') == 'job':
+        job = enfileirar_relatorio_periodo(request.user, {
+            'data_inicio': data_inicio,
+            'data_fim': data_fim,
+            'parte_id': parte_id,
+            'operador_id': operador_id,
+            'nome_ficha': nome_ficha,
+        })
+        return JsonResponse(_job_json(job), status=202)
+
+    ultima_atualizacao, quantidade_fichas = agregacoes.versao_periodo(
+        data_inicio_obj, data_fim_obj, operador_id=operador_id, nome_ficha=nome_ficha
+    )
+    filtros = {
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'parte_id': parte_id or None,
+        'operador_id': operador_id or None,
+        'nome_ficha': nome_ficha or None,
+        'usuario': request.user.username,  # aparece no rodapé
+    }
+    versao = [ultima_atualizacao.isoformat() if ultima_atualizacao else None, quantidade_fichas]
+
+    return pdf_cache.resposta_pdf(
+        request,
+        'periodo',
+        filtros,
+        versao,
+        ultima_atualizacao,
+        nome_arquivo_periodo(data_inicio_obj, data_fim_obj, operador_id, nome_ficha),
+        lambda saida: desenhar_relatorio_periodo(
+            saida,
+            data_inicio_obj,
+            data_fim_obj,
+            request.user.username,
+            parte_id=parte_id,
+            operador_id=operador_id,
+            nome_ficha=nome_ficha,
+        ),
     )
-    
-    if nome_ficha:
-        fichas = fichas.filter(nome_ficha=nome_ficha)
-    if operador_id:
-        fichas = fichas.filter(operador_id=operador_id)
 
-    # Agrupar dados por operador (IGUAL à view relatorios)
-    dados_por_operador = {}
-    total_geral = 0
-    
-    for ficha in fichas:
-        operador_nome = ficha.operador.get_full_name() or ficha.operador.username
-        
-        if operador_nome not in dados_por_operador:
-            dados_por_operador[operador_nome] = {
-                'fichas': {},  # nome da ficha -> partes
-                'totais_partes': {}  # total geral por parte do operador
-            }
-
-        registros = ficha.registros.all().select_related('parte')
-        if parte_id:
-            registros = registros.filter(parte_id=parte_id)
-
-        for registro in registros:
-            parte_nome = registro.parte.nome
-            valor = registro.total()
-
-            # Dentro da ficha específica
-            if ficha.nome_ficha not in dados_por_operador[operador_nome]['fichas']:
-                dados_por_operador[operador_nome]['fichas'][ficha.nome_ficha] = {}
-            if parte_nome not in dados_por_operador[operador_nome]['fichas'][ficha.nome_ficha]:
-                dados_por_operador[operador_nome]['fichas'][ficha.nome_ficha][parte_nome] = 0
-            dados_por_operador[operador_nome]['fichas'][ficha.nome_ficha][parte_nome] += valor
-
-            # Totais por parte (somando tudo do operador)
-            if parte_nome not in dados_por_operador[operador_nome]['totais_partes']:
-                dados_por_operador[operador_nome]['totais_partes'][parte_nome] = 0
-            dados_por_operador[operador_nome]['totais_partes'][parte_nome] += valor
-
-            # Total geral
-            total_geral += valor
-
-    # === GERAR O PDF COM A MESMA ESTRUTURA ===
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=landscape(A4))
-    width, height = landscape(A4)
-    
-    # Cabeçalho
-    p.setFont("Helvetica-Bold", 18)
-    p.drawString(50, height - 50, "Relatório de Produção por Período")
-    
-    p.setFont("Helvetica", 11)
-    periodo_texto = f"Período: {data_inicio_obj.strftime('%d/%m/%Y')} a {data_fim_obj.strftime('%d/%m/%Y')}"
-    p.drawString(50, height - 75, periodo_texto)
-    
-    # Filtros aplicados
-    y = height - 95
-    p.setFont("Helvetica", 9)
-    
-    if operador_id:
-        operador = User.objects.filter(id=operador_id).first()
-        if operador:
-            p.drawString(50, y, f"Filtro: Operador {operador.get_full_name() or operador.username}")
-            y -= 12
-    
-    if parte_id:
-        parte = ParteCalcado.objects.filter(id=parte_id).first()
-        if parte:
-            p.drawString(50, y, f"Filtro: Parte {parte.nome}")
-            y -= 12
-    
-    if nome_ficha:
-        p.drawString(50, y, f"Filtro: Ficha {nome_ficha}")
-        y -= 12
-    
-    p.line(50, y, width - 50, y)
-    y -= 25
-    
-    # === DADOS POR OPERADOR ===
-    for operador_nome, dados in sorted(dados_por_operador.items()):
-        # Verificar espaço
-        if y < 200:
-            p.showPage()
-            y = height - 50
-        
-        # Nome do Operador
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(50, y, f"👤 {operador_nome}")
-        y -= 25
-        
-        # === FICHAS DO OPERADOR ===
-        for nome_ficha_key, partes_ficha in sorted(dados['fichas'].items()):
-            if y < 100:
-                p.showPage()
-                y = height - 50
-            
-            # Nome da Ficha
-            p.setFont("Helvetica-Bold", 11)
-            p.drawString(70, y, f"📋 Nome: {nome_ficha_key}")
-            y -= 18
-            
-            # Cabeçalho da tabela de partes
-            p.setFont("Helvetica-Bold", 9)
-            p.drawString(90, y, "Peças")
-            p.drawRightString(width - 100, y, "Quantidade de Pares")
-            y -= 2
-            p.line(90, y, width - 100, y)
-            y -= 12
-            
-            # Partes da ficha
-            p.setFont("Helvetica", 9)
-            for parte_nome, quantidade in sorted(partes_ficha.items()):
-                if y < 50:
-                    p.showPage()
-                    y = height - 50
-                
-                p.drawString(90, y, parte_nome)
-                p.drawRightString(width - 100, y, str(quantidade))
-                y -= 14
-            
-            y -= 8  # Espaço entre fichas
-        
-        # === TOTAIS DO OPERADOR (por parte) ===
-        if dados['totais_partes']:
-            if y < 120:
-                p.showPage()
-                y = height - 50
-            
-            y -= 10
-            p.line(70, y, width - 100, y)
-            y -= 15
-            
-            p.setFont("Helvetica-Bold", 11)
-            p.drawString(70, y, "Totais do Perfil:")
-            y -= 18
-            
-            # Cabeçalho
-            p.setFont("Helvetica-Bold", 9)
-            p.drawString(90, y, "Parte")
-            p.drawRightString(width - 100, y, "Total")
-            y -= 2
-            p.line(90, y, width - 100, y)
-            y -= 12
-            
-            # Totais por parte
-            p.setFont("Helvetica", 9)
-            for parte_nome, total_parte in sorted(dados['totais_partes'].items()):
-                if y < 50:
-                    p.showPage()
-                    y = height - 50
-                
-                p.drawString(90, y, parte_nome)
-                p.drawRightString(width - 100, y, str(total_parte))
-                y -= 14
-        
-        y -= 20  # Espaço entre operadores
-    
-    # === TOTAL GERAL ===
-    if y < 80:
-        p.showPage()
-        y = height - 50
-    
-    y -= 10
-    p.line(50, y, width - 50, y)
-    y -= 30
-    
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, y, "TOTAL GERAL:")
-    p.drawRightString(width - 100, y, str(total_geral))
-    
-    y -= 10
-    p.setFont("Helvetica", 10)
-    p.drawCentredString(width / 2, y, "peças produzidas no período")
-    
-    # Rodapé
-    p.setFont("Helvetica", 8)
-    p.drawString(50, 30, f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}")
-    p.drawRightString(width - 50, 30, f"Usuário: {request.user.username}")
-    
-    p.save()
-    buffer.seek(0)
-    
-    # Resposta HTTP
-    response = HttpResponse(buffer, content_type='application/pdf')
-    
-    # Nome do arquivo
-    nome_arquivo = f'relatorio_{data_inicio_obj.strftime("%Y%m%d")}_{data_fim_obj.strftime("%Y%m%d")}'
-    if operador_id:
-        nome_arquivo += f'_op{operador_id}'
-    if nome_ficha:
-        nome_ficha_limpo = nome_ficha.replace(' ', '_')[:15]
-        nome_arquivo += f'_{nome_ficha_limpo}'
-    nome_arquivo += '.pdf'
-    
+
+class _Eco:
+    """Pseudo-arquivo para o csv.writer: devolve a linha em vez de guardá-la"""
+
+    def write(self, valor):
+        return valor
+
+
+def _linhas_csv(data_inicio, data_fim, operador_id, nome_ficha, parte_id):
+    escritor = csv.writer(_Eco(), delimiter=';')
+    yield '\ufeff'  # BOM: o Excel abre o UTF-8 com acentos corretos
+    yield escritor.writerow(['Operador', 'Ficha', 'Parte', 'Pares'])
+
+    linhas = agregacoes.linhas_producao(data_inicio, data_fim, operador_id, nome_ficha, parte_id)
+    for linha in linhas.iterator(chunk_size=2000):
+        yield escritor.writerow([
+            agregacoes.nome_operador(linha),
+            linha['nome_ficha'],
+            linha['parte__nome'],
+            linha['quantidade'] or 0,
+        ])
+
+
+@login_required
+def exportar_relatorio_periodo_csv(request):
+    """Exporta em CSV (abre no Excel) os mesmos dados da view relatorios, linha a linha"""
+    if request.qualidade_ctx.tipo != 'qualidade':
+        messages.error(request, 'Apenas usuários da qualidade podem gerar relatórios')
+        return redirect('home')
+
+    data_inicio = request.GET.get('data_inicio')
+    data_fim = request.GET.get('data_fim')
+    parte_id = request.GET.get('parte_id')
+    operador_id = request.GET.get('operador_id')
+    nome_ficha = request.GET.get('nome_ficha')
+
+    if not data_inicio or not data_fim:
+        messages.error(request, 'Selecione o período')
+        return redirect('relatorios')
+
+    data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+    data_fim_obj = datetime.strptime(data_fim, '%Y-%m-%d').date()
+
+    # Gerador: nada é montado em memória, as linhas saem do cursor direto para a resposta
+    response = StreamingHttpResponse(
+        _linhas_csv(data_inicio_obj, data_fim_obj, operador_id, nome_ficha, parte_id),
+        content_type='text/csv; charset=utf-8',
+    )
+    nome_arquivo = nome_arquivo_periodo(data_inicio_obj, data_fim_obj, operador_id, nome_ficha)
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo[:-4]}.csv"'
+    return response
+
+
+def _sem_pagina(request):
+    """Query string atual sem o número da página (links de paginação e de exportação)"""
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+    return parametros.urlencode()
+
+
+@login_required
+def inventario_consolidado(request):
+    """Estoque por modelo → cor → tamanho somando as fichas de inventário do período (apenas qualidade)"""
+    if request.qualidade_ctx.tipo != 'qualidade':
+        messages.error(request, 'Apenas usuários da qualidade podem ver o inventário consolidado')
+        return redirect('home')
+
+    parametros = consolidacao.ler_parametros(request.GET)
+    # Uma consulta; a árvore e os totais saem da lista em memória, e a página também
+    modelos, totais = consolidacao.arvore(consolidacao.linhas(**parametros))
+    pagina = Paginator(modelos, 20).get_page(request.GET.get('page'))
+
+    return render(request, 'qualidade/inventario_consolidado.html', {
+        **parametros,
+        'modelos': pagina,
+        'totais': totais,
+        'setores': consolidacao.setores(),
+        'modos': consolidacao.MODOS,
+        'query_filtros': _sem_pagina(request),
+    })
+
+
+def _linhas_consolidado_csv(parametros):
+    escritor = csv.writer(_Eco(), delimiter=';')
+    yield '\ufeff'
+    yield escritor.writerow(['Modelo', 'Cor', 'Tamanho', 'Fichas', 'Última contagem', 'PD', 'PE', 'Pares'])
+
+    for linha in consolidacao.linhas(**parametros).iterator(chunk_size=2000):
+        yield escritor.writerow([
+            linha['modelo__nome'],
+            linha['cor__nome'],
+            linha['tamanho__numero'],
+            linha['fichas'],
+            linha['ultima_data'].strftime('%d/%m/%Y') if linha['ultima_data'] else '',
+            linha['pd'] or 0,
+            linha['pe'] or 0,
+            linha['pares'] or 0,
+        ])
+
+
+@login_required
+def exportar_inventario_consolidado_csv(request):
+    """CSV do inventário consolidado, com os mesmos filtros da tela, linha a linha"""
+    if request.qualidade_ctx.tipo != 'qualidade':
+        messages.error(request, 'Apenas usuários da qualidade podem ver o inventário consolidado')
+        return redirect('home')
+
+    parametros = consolidacao.ler_parametros(request.GET)
+    response = StreamingHttpResponse(_linhas_consolidado_csv(parametros), content_type='text/csv; charset=utf-8')
+    nome_arquivo = (
+        f"inventario_consolidado_{parametros['data_inicio']:%Y%m%d}_{parametros['data_fim']:%Y%m%d}"
+        f"_{parametros['modo']}.csv"
+    )
     response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
-    return response
\ No newline at end of file
+    return response
+
+
+@login_required
+def comparar_fichas_inventario(request, ficha_id):
+    """Diferenças entre duas fichas de inventário, com os filtros da tela da ficha"""
+    ficha = get_object_or_404(FichaInventario, id=ficha_id)
+    outra = comparacao.segunda_ficha(ficha, request.GET)
+    context = {
+        'ficha': ficha,
+        'outra': outra,
+        'fichas_opcoes': comparacao.fichas_para_comparar(ficha),
+        'situacoes': comparacao.SITUACOES,
+    }
+
+    if outra is not None:
+        filtros = facetas.ler_filtros(request.GET)
+        situacao = comparacao.ler_situacao(request.GET)
+        opcoes = comparacao.opcoes_filtros(ficha, outra, filtros)
+        context.update({
+            # Uma consulta por página: agrupamento, situação e cursor no mesmo SQL
+            'linhas': paginar(request, comparacao.linhas(ficha, outra, filtros, situacao), 50, ordem=comparacao.ORDEM),
+            'situacao': situacao,
+            'modelo_selecionado': filtros['modelo'],
+            'cor_selecionada': filtros['cor'],
+            'numero_selecionado': filtros['numero'],
+            'modelos_filtro': opcoes['modelos'],
+            'cores_filtro': opcoes['cores'],
+            'numeros_filtro': opcoes['numeros'],
+            'query_filtros': _sem_pagina(request),
+        })
+
+    return render(request, 'qualidade/comparar_fichas_inventario.html', context)
+
+
+def _linhas_comparacao_csv(linhas):
+    escritor = csv.writer(_Eco(), delimiter=';')
+    yield '\ufeff'
+    yield escritor.writerow([
+        'Modelo', 'Cor', 'Tamanho', 'Situação',
+        'PD antes', 'PE antes', 'PD depois', 'PE depois',
+        'Diferença PD', 'Diferença PE', 'Diferença pares', 'Sem par antes', 'Sem par depois',
+    ])
+
+    for linha in linhas.iterator(chunk_size=2000):
+        yield escritor.writerow([
+            linha['modelo__nome'], linha['cor__nome'], linha['tamanho__numero'], linha['situacao'],
+            linha['pd_a'], linha['pe_a'], linha['pd_b'], linha['pe_b'],
+            linha['delta_pd'], linha['delta_pe'], linha['delta_pares'], linha['avulsos_a'], linha['avulsos_b'],
+        ])
+
+
+@login_required
+def exportar_comparacao_inventario_csv(request, ficha_id):
+    """CSV da comparação, com os mesmos filtros da tela, linha a linha"""
+    ficha = get_object_or_404(FichaInventario, id=ficha_id)
+    outra = comparacao.segunda_ficha(ficha, request.GET)
+    if outra is None:
+        messages.error(request, 'Selecione a ficha para comparar')
+        return redirect('comparar_fichas_inventario', ficha_id=ficha.id)
+
+    linhas = comparacao.linhas(
+        ficha, outra, facetas.ler_filtros(request.GET), comparacao.ler_situacao(request.GET)
+    )
+    response = StreamingHttpResponse(_linhas_comparacao_csv(linhas), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="comparacao_inventario_{ficha.id}_{outra.id}.csv"'
+    return response
+
+
+def _job_json(job):
+    dados = {
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': reverse('status_relatorio_job', args=[job.id]),
+    }
+    if job.status == 'concluido':
+        dados['download_url'] = reverse('baixar_relatorio_job', args=[job.id])
+    if job.status == 'erro':
+        dados['erro'] = MENSAGEM_ERRO_JOB
+    return dados
+
+
+def _job_do_usuario(request, job_id):
+    job = get_object_or_404(RelatorioJob, id=job_id)
+    if job.solicitado_por_id != request.user.id and request.qualidade_ctx.tipo != 'qualidade':
+        raise Http404
+    return job
+
+
+@login_required
+def status_relatorio_job(request, job_id):
+    """Status de um relatório gerado em segundo plano"""
+    return JsonResponse(_job_json(_job_do_usuario(request, job_id)))
+
+
+@login_required
+def baixar_relatorio_job(request, job_id):
+    """Download do PDF gerado pelo worker"""
+    job = _job_do_usuario(request, job_id)
+    if job.status != 'concluido' or not job.arquivo:
+        raise Http404
+    return FileResponse(job.arquivo.open('rb'), as_attachment=True, filename=job.nome_arquivo, content_type='application/pdf')